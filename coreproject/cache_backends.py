@@ -0,0 +1,173 @@
+"""
+Cache backends that count hits and misses.
+
+Each backend here is the Django backend of the same name with StatsMixin in
+front. Lookups are tallied per key namespace (the leading alphabetic words of
+the key, e.g. ``analysis_result`` or ``user_role``) in process memory, and
+every CACHE_STATS_FLUSH_INTERVAL seconds the deltas are added to counters in
+the cache itself, so ``shared_stats()`` reports totals across all processes.
+"""
+import atexit
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends import db, filebased, locmem, memcached, redis
+
+CACHE_STATS_FLUSH_INTERVAL = 30
+
+_STATS_PREFIX = 'cache_stats'
+_NAMESPACES_KEY = f'{_STATS_PREFIX}:namespaces'
+_MISSING = object()
+
+
+def key_namespace(key):
+    words = list(itertools.takewhile(str.isalpha, str(key).split('_')))[:2]
+    return '_'.join(words) or 'other'
+
+
+class CacheStats:
+    """Per-process hit/miss counters, pushed to the shared cache periodically."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, namespace, hits, misses):
+        with self._lock:
+            for counts in (self._totals, self._pending):
+                entry = counts.setdefault(namespace, [0, 0])
+                entry[0] += hits
+                entry[1] += misses
+
+    def flush_due(self):
+        return time.monotonic() - self._last_flush >= CACHE_STATS_FLUSH_INTERVAL
+
+    def take_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        return pending
+
+    def snapshot(self):
+        """{namespace: {'hits': n, 'misses': n}} seen by this process since start."""
+        with self._lock:
+            return {ns: {'hits': h, 'misses': m} for ns, (h, m) in self._totals.items()}
+
+
+stats = CacheStats()
+
+
+class StatsMixin:
+    _local = threading.local()
+
+    @contextmanager
+    def _untracked(self):
+        # Backends implement get() via get_many() or vice versa; only the
+        # outermost call is counted
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        try:
+            yield depth == 0
+        finally:
+            self._local.depth = depth
+
+    def _record(self, keys_hit, keys_missed):
+        counts = {}
+        for key in keys_hit:
+            counts.setdefault(key_namespace(key), [0, 0])[0] += 1
+        for key in keys_missed:
+            counts.setdefault(key_namespace(key), [0, 0])[1] += 1
+        for namespace, (hits, misses) in counts.items():
+            stats.record(namespace, hits, misses)
+        if stats.flush_due():
+            self.flush_stats()
+
+    def get(self, key, default=None, version=None):
+        with self._untracked() as outermost:
+            value = super().get(key, _MISSING, version=version)
+        hit = value is not _MISSING
+        if outermost:
+            self._record([key] if hit else [], [] if hit else [key])
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with self._untracked() as outermost:
+            found = super().get_many(keys, version=version)
+        if outermost:
+            self._record([k for k in keys if k in found], [k for k in keys if k not in found])
+        return found
+
+    def flush_stats(self):
+        """Add this process's counts since the last flush to the shared counters."""
+        pending = stats.take_pending()
+        if not pending:
+            return
+        with self._untracked():
+            try:
+                namespaces = set(super().get(_NAMESPACES_KEY) or ())
+                if not namespaces.issuperset(pending):
+                    super().set(_NAMESPACES_KEY, sorted(namespaces | set(pending)), timeout=None)
+                for namespace, (hits, misses) in pending.items():
+                    for suffix, delta in (('hits', hits), ('misses', misses)):
+                        key = f'{_STATS_PREFIX}:{namespace}:{suffix}'
+                        if delta and not super().add(key, delta, timeout=None):
+                            super().incr(key, delta)
+            except Exception:
+                # Statistics must never break a cache read
+                pass
+
+    def shared_stats(self):
+        """{namespace: {'hits': n, 'misses': n}} summed over every process."""
+        self.flush_stats()
+        with self._untracked():
+            namespaces = super().get(_NAMESPACES_KEY) or []
+            keys = [f'{_STATS_PREFIX}:{ns}:{suffix}' for ns in namespaces for suffix in ('hits', 'misses')]
+            values = super().get_many(keys)
+        return {
+            ns: {suffix: values.get(f'{_STATS_PREFIX}:{ns}:{suffix}', 0) for suffix in ('hits', 'misses')}
+            for ns in namespaces
+        }
+
+    def reset_stats(self):
+        with self._untracked():
+            namespaces = super().get(_NAMESPACES_KEY) or []
+            super().delete_many(
+                [f'{_STATS_PREFIX}:{ns}:{suffix}' for ns in namespaces for suffix in ('hits', 'misses')]
+                + [_NAMESPACES_KEY])
+        stats.take_pending()
+
+
+class FileBasedCache(StatsMixin, filebased.FileBasedCache):
+    pass
+
+
+class DatabaseCache(StatsMixin, db.DatabaseCache):
+    pass
+
+
+class RedisCache(StatsMixin, redis.RedisCache):
+    pass
+
+
+class PyMemcacheCache(StatsMixin, memcached.PyMemcacheCache):
+    pass
+
+
+class LocMemCache(StatsMixin, locmem.LocMemCache):
+    pass
+
+
+def _flush_at_exit():
+    from django.core.cache import caches
+
+    for cache in caches.all(initialized_only=True):
+        if isinstance(cache, StatsMixin):
+            cache.flush_stats()
+
+
+atexit.register(_flush_at_exit)
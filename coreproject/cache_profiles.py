@@ -0,0 +1,71 @@
+"""
+Shared cache profiles.
+
+Django's default LocMemCache is private to each process, so results cached by
+the process_llm_jobs worker were invisible to the gunicorn workers serving
+the polls, and every worker kept its own copy of roles and catalog data. The
+CACHE_BACKEND environment variable picks a backend all processes share:
+
+- ``file`` (default): FileBasedCache under CACHE_LOCATION (``.django_cache``
+  in the project root). Works out of the box on a single host.
+- ``database``: DatabaseCache in the ``django_cache`` table; run
+  ``python manage.py createcachetable`` once.
+- ``redis``: RedisCache at CACHE_URL. Requires ``redis``, which is not in
+  requirements.txt; install it on hosts that use this backend.
+- ``memcached``: PyMemcacheCache at CACHE_URL. Requires ``pymemcache``.
+- ``locmem``: per-process LocMemCache, for tests and one-off scripts.
+
+Every backend counts hits and misses per key namespace; see
+coreproject.cache_backends and the ``cache_stats`` management command.
+
+This module is imported from settings, so it must not import anything that
+needs configured settings.
+"""
+import os
+
+FILE = 'file'
+DATABASE = 'database'
+REDIS = 'redis'
+MEMCACHED = 'memcached'
+LOCMEM = 'locmem'
+BACKENDS = (FILE, DATABASE, REDIS, MEMCACHED, LOCMEM)
+
+_BACKEND_CLASSES = {
+    FILE: 'coreproject.cache_backends.FileBasedCache',
+    DATABASE: 'coreproject.cache_backends.DatabaseCache',
+    REDIS: 'coreproject.cache_backends.RedisCache',
+    MEMCACHED: 'coreproject.cache_backends.PyMemcacheCache',
+    LOCMEM: 'coreproject.cache_backends.LocMemCache',
+}
+
+_DEFAULT_URLS = {
+    REDIS: 'redis://127.0.0.1:6379/1',
+    MEMCACHED: '127.0.0.1:11211',
+}
+
+
+def current_backend():
+    backend = os.environ.get('CACHE_BACKEND', FILE).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def cache_settings(base_dir, backend=None):
+    """Return the CACHES dict for the given (or current) backend."""
+    backend = backend or current_backend()
+    default = {
+        'BACKEND': _BACKEND_CLASSES[backend],
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', ''),
+        'TIMEOUT': 300,
+    }
+    if backend == FILE:
+        default['LOCATION'] = os.environ.get('CACHE_LOCATION') or os.path.join(base_dir, '.django_cache')
+        # FileBasedCache culls a third of its entries past MAX_ENTRIES (default 300)
+        default['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '20000'))}
+    elif backend == DATABASE:
+        default['LOCATION'] = os.environ.get('CACHE_LOCATION') or 'django_cache'
+        default['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '20000'))}
+    elif backend in (REDIS, MEMCACHED):
+        default['LOCATION'] = os.environ.get('CACHE_URL') or _DEFAULT_URLS[backend]
+    return {'default': default}
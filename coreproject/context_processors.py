@@ -1,33 +1,20 @@
-from eval.models import StreamAndSubject, UserPreference
+from django.utils.functional import SimpleLazyObject
+
+from eval import catalog
+from eval.roles import resolve_user_role
 
 def streams_and_subjects(request):
-    context = {
-        'streams_and_subjects': StreamAndSubject.objects.all().order_by('name')
+    # Lazy, so renders that never show the stream picker skip both lookups
+    return {
+        'streams_and_subjects': SimpleLazyObject(catalog.streams_and_subjects),
+        'preferred_streams': SimpleLazyObject(lambda: catalog.preferred_stream_ids(request.user)),
     }
-    if request.user.is_authenticated:
-        try:
-            prefs = request.user.preference
-            context['preferred_streams'] = list(prefs.streams_and_subjects.values_list('id', flat=True))
-        except UserPreference.DoesNotExist:
-            context['preferred_streams'] = []
-    else:
-        context['preferred_streams'] = []
-    return context
 
 def user_group(request):
     """
     Adds 'user_group' to context: 'admin', 'pod_lead', 'trainer', or None.
     """
-    group = None
-    if request.user.is_authenticated:
-        user_groups = list(request.user.groups.values_list('name', flat=True))
-        if request.user.is_superuser or request.user.is_staff or 'admin' in user_groups:
-            group = 'admin'
-        elif 'pod_lead' in user_groups:
-            group = 'pod_lead'
-        elif 'trainer' in user_groups:
-            group = 'trainer'
-    return {'user_group': group}
+    return {'user_group': resolve_user_role(request.user)}
 
 def websocket_url(request):
     """
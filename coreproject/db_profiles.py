@@ -0,0 +1,100 @@
+"""
+Database tuning profiles.
+
+The DB_PROFILE environment variable picks one of:
+
+- ``sqlite`` (default): the local db_v2.sqlite3 file with persistent
+  connections. PRAGMAs are applied to every new connection by
+  apply_sqlite_pragmas(), connected to ``connection_created`` below, so
+  they apply whenever these settings are loaded, whatever apps are installed.
+- ``postgres``: PostgreSQL through psycopg 3 with a server-side connection
+  pool (Django 5.1+). Requires ``psycopg[binary,pool]``, which is not in
+  requirements.txt; install it on hosts that use this profile.
+
+This module is imported from settings, so it must not import anything that
+needs configured settings.
+"""
+import os
+
+from django.db.backends.signals import connection_created
+
+SQLITE = 'sqlite'
+POSTGRES = 'postgres'
+PROFILES = (SQLITE, POSTGRES)
+
+# Applied in order to every new SQLite connection. synchronous=NORMAL is only
+# safe under WAL and is skipped when journal_mode could not be switched
+# (in-memory test databases stay in 'memory' mode).
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('temp_store', 'MEMORY'),
+    ('mmap_size', os.environ.get('SQLITE_MMAP_SIZE', '268435456')),
+    ('cache_size', os.environ.get('SQLITE_CACHE_SIZE', '10000')),
+    ('busy_timeout', '30000'),
+)
+
+
+def _int_env(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def current_profile():
+    profile = os.environ.get('DB_PROFILE', SQLITE).strip().lower()
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}; expected one of {', '.join(PROFILES)}")
+    return profile
+
+
+def database_settings(base_dir, profile=None):
+    """Return the DATABASES['default'] dict for the given (or current) profile."""
+    profile = profile or current_profile()
+    if profile == POSTGRES:
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'cot_generation'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # The pool owns connection lifetime; Django must close (return) them per request
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': _int_env('DB_POOL_MIN_SIZE', 2),
+                    'max_size': _int_env('DB_POOL_MAX_SIZE', 20),
+                    'timeout': _int_env('DB_POOL_TIMEOUT', 30),
+                },
+            },
+        }
+
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME') or os.path.join(base_dir, 'db_v2.sqlite3'),
+        # Keep connections open between requests; health checks drop broken ones
+        'CONN_MAX_AGE': _int_env('DB_CONN_MAX_AGE', 600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 30,  # 30 second timeout for database operations
+        },
+    }
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver that tunes each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        wal = False
+        for name, value in SQLITE_PRAGMAS:
+            if name == 'synchronous' and not wal:
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+            if name == 'journal_mode':
+                row = cursor.fetchone()
+                wal = bool(row) and str(row[0]).lower() == 'wal'
+
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='apply_sqlite_pragmas')
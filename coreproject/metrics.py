@@ -0,0 +1,424 @@
+"""
+Prometheus-compatible metrics.
+
+Counters, gauges and histograms live in process memory: recording a value is
+a dictionary update under a lock, with no I/O and no database access.
+collect() also reads the per-process counters other modules already keep
+(cache hits and misses, and whatever is registered with expose_counts()), and
+render() writes it all in the Prometheus text format.
+
+Where metrics are scraped:
+
+- The web app serves ``/metrics`` (metrics_view). Gunicorn runs several
+  workers, so each writes its metrics to METRICS_DIR every
+  METRICS_SHARE_INTERVAL seconds; /metrics writes the answering worker's file
+  first and adds up the files of every live worker. MetricsMiddleware counts requests, their duration and their DB
+  queries per view.
+- process_llm_jobs (``--metrics-port``) and run_sync_daemon.py (METRICS_PORT)
+  are single processes and serve their own metrics on a sidecar port, see
+  serve(). It binds METRICS_ADDR, loopback by default.
+
+When METRICS_TOKEN is set, scrapes must send ``Authorization: Bearer <token>``;
+without it, only scrapes from loopback are answered.
+
+prometheus_client is not a dependency; the exposition format is small enough
+to write here.
+"""
+import atexit
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+METRICS_DIR = getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, '.metrics'))
+# Address of the sidecar ports; set to 0.0.0.0 for a scraper on another host
+METRICS_ADDR = getattr(settings, 'METRICS_ADDR', '127.0.0.1')
+# Seconds between two writes of a web worker's metrics; 0 turns sharing off
+METRICS_SHARE_INTERVAL = getattr(settings, 'METRICS_SHARE_INTERVAL', 15)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# LLM requests and background jobs take seconds to minutes
+SLOW_BUCKETS = (.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector):
+        """collector() returns a list of families, as collect() does, read when scraped."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self):
+        """[{'name', 'type', 'help', 'samples': [[sample name, {label: value}, value], ...]}, ...]"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [metric.family() for metric in metrics]
+        for collector in collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                # A broken collector must not take the other metrics down
+                logger.warning(f'Metrics collector {collector!r} failed: {e}')
+        return families
+
+
+registry = Registry()
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} takes labels {self.labels}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def family(self):
+        return {'name': self.name, 'type': self.type, 'help': self.help, 'samples': self.samples()}
+
+    def samples(self):
+        with self._lock:
+            return [[self.name, dict(zip(self.labels, key)), value] for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per bucket (the last one is +Inf), then the sum
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(entry)) for key, entry in self._values.items()]
+        samples = []
+        for key, entry in values:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                samples.append([f'{self.name}_bucket', dict(labels, le=_format_value(bound)), cumulative])
+            samples.append([f'{self.name}_sum', labels, entry[-1]])
+            samples.append([f'{self.name}_count', labels, cumulative])
+        return samples
+
+
+def expose_counts(name, help, snapshot, label):
+    """
+    Export a per-process stats object's snapshot() ({key: count}) as the
+    counter name, one sample per key under label.
+    """
+    def collect():
+        counts = snapshot()
+        return [{'name': name, 'type': 'counter', 'help': help,
+                 'samples': [[name, {label: key}, value] for key, value in counts.items()]}]
+
+    registry.add_collector(collect)
+
+
+def _cache_requests():
+    from coreproject.cache_backends import stats
+
+    samples = []
+    for namespace, counts in stats.snapshot().items():
+        samples.append(['cache_requests_total', {'namespace': namespace, 'result': 'hit'}, counts['hits']])
+        samples.append(['cache_requests_total', {'namespace': namespace, 'result': 'miss'}, counts['misses']])
+    return [{'name': 'cache_requests_total', 'type': 'counter', 'samples': samples,
+             'help': 'Cache lookups by key namespace and result, in this process'}]
+
+
+registry.add_collector(_cache_requests)
+
+
+def collect():
+    return registry.collect()
+
+
+def merge(family_lists):
+    """Add up the samples of several processes' collect() results."""
+    merged = {}
+    for families in family_lists:
+        for family in families:
+            entry = merged.setdefault(family['name'], dict(family, samples={}))
+            for sample_name, labels, value in family['samples']:
+                key = (sample_name, tuple(sorted(labels.items())))
+                if key in entry['samples']:
+                    entry['samples'][key][2] += value
+                else:
+                    entry['samples'][key] = [sample_name, labels, value]
+    return [dict(family, samples=list(family['samples'].values())) for family in merged.values()]
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(families=None):
+    """The families (default: this process's) in the Prometheus text exposition format."""
+    lines = []
+    for family in families if families is not None else collect():
+        lines.append(f"# HELP {family['name']} {_escape(family['help'])}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for sample_name, labels, value in family['samples']:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f'{sample_name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+LOOPBACK_ADDRS = ('127.0.0.1', '::1', '::ffff:127.0.0.1')
+
+
+def authorized(authorization_header, remote_addr):
+    if METRICS_TOKEN:
+        return authorization_header == f'Bearer {METRICS_TOKEN}'
+    return remote_addr in LOOPBACK_ADDRS
+
+
+# --- Web workers: sharing metrics between gunicorn processes ---
+
+_share_lock = threading.Lock()
+_sharing_pid = None
+
+
+def _share_path(pid):
+    return os.path.join(METRICS_DIR, f'web-{pid}.json')
+
+
+def share_metrics():
+    """Write this process's metrics where /metrics in every web worker reads them; True on success."""
+    path = _share_path(os.getpid())
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(collect(), f)
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        logger.warning(f'Could not write metrics to {path}: {e}')
+        return False
+
+
+def _share_loop():
+    while True:
+        time.sleep(METRICS_SHARE_INTERVAL)
+        share_metrics()
+
+
+def _remove_share_file():
+    try:
+        os.remove(_share_path(os.getpid()))
+    except OSError:
+        pass
+
+
+def start_sharing():
+    """Start writing this web worker's metrics periodically; safe to call on every request."""
+    global _sharing_pid
+    if not METRICS_SHARE_INTERVAL or _sharing_pid == os.getpid():
+        return
+    with _share_lock:
+        # Checked per process: a worker forked from a preloaded app has no thread
+        if _sharing_pid == os.getpid():
+            return
+        _sharing_pid = os.getpid()
+        threading.Thread(target=_share_loop, name='metrics-share', daemon=True).start()
+        atexit.register(_remove_share_file)
+
+
+def shared_families(include_own=True):
+    """Metrics of the live web workers, from their last write."""
+    own = _share_path(os.getpid())
+    stale_before = time.time() - 3 * METRICS_SHARE_INTERVAL
+    families = []
+    for path in glob.glob(os.path.join(METRICS_DIR, 'web-*.json')):
+        if path == own and not include_own:
+            continue
+        try:
+            if os.path.getmtime(path) < stale_before:
+                # Left behind by a worker that was killed
+                os.remove(path)
+                continue
+            with open(path) as f:
+                families.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return families
+
+
+def metrics_view(request):
+    """Metrics of every web worker, in the Prometheus text format."""
+    if not authorized(request.headers.get('Authorization'), request.META.get('REMOTE_ADDR')):
+        return HttpResponseForbidden()
+    if not METRICS_SHARE_INTERVAL:
+        families = collect()
+    elif share_metrics():
+        # Every worker is counted from its file, this one included, so each is counted once
+        families = merge(shared_families())
+    else:
+        families = merge([collect()] + shared_families(include_own=False))
+    return HttpResponse(render(families), content_type=CONTENT_TYPE)
+
+
+http_requests = Counter(
+    'http_requests_total', 'Requests by view, method and status code', ['view', 'method', 'status'])
+http_request_seconds = Histogram(
+    'http_request_duration_seconds', 'Time to build a response, by view', ['view'])
+http_request_queries = Histogram(
+    'http_request_db_queries', 'Database queries made by one request, by view', ['view'], buckets=COUNT_BUCKETS)
+
+
+class MetricsMiddleware:
+    """Counts requests, their duration and their database queries per view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_sharing()
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.monotonic()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.monotonic() - started
+        match = getattr(request, 'resolver_match', None)
+        # Views, not paths: paths carry ids and would make a series per object
+        view = match.view_name if match and match.view_name else 'unmatched'
+        http_requests.inc(view=view, method=request.method, status=response.status_code)
+        http_request_seconds.observe(elapsed, view=view)
+        http_request_queries.observe(queries[0], view=view)
+        return response
+
+
+# --- Sidecar port for the worker and the sync daemon ---
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        if not authorized(self.headers.get('Authorization'), self.client_address[0]):
+            self.send_error(403)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the worker's output
+        pass
+
+
+def serve(port, addr=METRICS_ADDR):
+    """Serve this process's metrics at http://addr:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((addr, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f'Serving metrics on {addr}:{server.server_address[1]}/metrics')
+    return server
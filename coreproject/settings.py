@@ -22,6 +22,9 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+from coreproject.db_profiles import database_settings
+from coreproject.cache_profiles import cache_settings
+
 # Removed dotenv and .env dependency. All config should be fetched from DB or hardcoded as needed.
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -75,6 +78,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise middleware
+    'coreproject.metrics.MetricsMiddleware',  # Per-view metrics; static files are served before it
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -117,26 +121,29 @@ ASGI_APPLICATION = 'coreproject.asgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DB_PROFILE selects sqlite (default) or postgres; see coreproject/db_profiles.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        # 'NAME': BASE_DIR / 'db.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db_v2.sqlite3'),
-        'OPTIONS': {
-            'timeout': 30,  # 30 second timeout for database operations
-            'init_command': '''
-                PRAGMA journal_mode=WAL;
-                PRAGMA synchronous=NORMAL;
-                PRAGMA temp_store=memory;
-                PRAGMA mmap_size=268435456;
-                PRAGMA cache_size=10000;
-                PRAGMA busy_timeout=30000;
-            ''',
-        },
-    }
+    'default': database_settings(BASE_DIR),
 }
 
 
+# Cache
+# CACHE_BACKEND selects file (default), database, redis, memcached or locmem;
+# see coreproject/cache_profiles.py
+
+CACHES = cache_settings(BASE_DIR)
+
+
+# Metrics
+# /metrics and the worker/sync daemon sidecar ports; see coreproject/metrics.py.
+# When METRICS_TOKEN is set, scrapes must send it as a bearer token; without
+# it only scrapes from loopback are answered. The sidecar ports bind METRICS_ADDR.
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, '.metrics'))
+METRICS_ADDR = os.environ.get('METRICS_ADDR', '127.0.0.1')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -3,9 +3,11 @@ from django.urls import path
 from django.urls import include
 from django.conf import settings
 from django.conf.urls.static import static
+from coreproject.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('eval.urls')),
     path('processor/', include('processor.urls')),
     path('accounts/', include('allauth.urls')),  # django-allauth URLs
@@ -51,8 +51,9 @@ class TrainerTaskAdmin(admin.ModelAdmin):
     list_display = ("question_id", "title", "developer", "reviewer", "completed", "problem_link")
     search_fields = ("question_id", "title", "developer", "reviewer")
     list_filter = ("completed", "developer", "reviewer")
-from eval.models import Prompt, Validation, Coherence, ModelEvaluationHistory, LLMModel, LLMJob
+from eval.models import Prompt, Validation, Coherence, ModelEvaluationHistory, LLMModel, LLMJob, LLMUsageStats
 from .models import SystemMessage, StreamAndSubject, UserPreference
+from eval.utils.deadlines import restart_job_deadline
 
 admin.site.register(Prompt)
 
@@ -69,13 +70,17 @@ class LLMModelAdmin(admin.ModelAdmin):
             'fields': ('api_key', 'temperature', 'max_tokens', 'use_streaming'),
             'description': 'Model configuration settings. Leave max_tokens blank to use provider defaults. Anthropic models require this field.'
         }),
+        ('Pricing', {
+            'fields': ('input_token_price', 'output_token_price', 'cached_input_token_price'),
+            'description': 'USD per million tokens, used for LLM cost accounting. Leave blank if unknown.'
+        }),
     )
 
 from .models import ProjectLLMModel
 
 @admin.register(ProjectLLMModel)
 class ProjectLLMModelAdmin(admin.ModelAdmin):
-    list_display = ('project', 'llm_model', 'is_active', 'temperature', 'max_tokens', 'api_key', 'use_streaming')
+    list_display = ('project', 'llm_model', 'is_active', 'temperature', 'max_tokens', 'api_key', 'use_streaming', 'backup_model')
     fieldsets = (
         ('Assignment', {
             'fields': ('project', 'llm_model', 'is_active')
@@ -83,10 +88,13 @@ class ProjectLLMModelAdmin(admin.ModelAdmin):
         ('Overrides', {
             'fields': ('temperature', 'max_tokens', 'api_key', 'use_streaming', 'description')
         }),
+        ('Hedging', {
+            'fields': ('backup_model',)
+        }),
     )
     list_filter = ('project', 'is_active', 'llm_model__provider', 'use_streaming')
     search_fields = ('project__code', 'llm_model__name')
-    autocomplete_fields = ('project', 'llm_model')
+    autocomplete_fields = ('project', 'llm_model', 'backup_model')
 
 class ValidationAdmin(admin.ModelAdmin):
     list_display = ('name', 'validation_id', 'is_active', 'created_at')
@@ -115,6 +123,9 @@ class ModelEvaluationHistoryAdmin(admin.ModelAdmin):
         ('Results', {
             'fields': ('evaluation_metrics', 'response')
         }),
+        ('Usage', {
+            'fields': LLMUsageStats.USAGE_FIELDS
+        }),
         ('Timestamps', {
             'fields': ('created_at',)
         }),
@@ -152,8 +163,8 @@ from .models import ProjectCriteria, Project
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     search_fields = ('code', 'name')
-    list_display = ('code', 'name', 'is_active', 'created_at', 'updated_at')
-    list_filter = ('is_active',)
+    list_display = ('code', 'name', 'is_active', 'review_mode', 'created_at', 'updated_at')
+    list_filter = ('is_active', 'review_mode')
     ordering = ('code',)
 
 @admin.register(ProjectCriteria)
@@ -184,13 +195,14 @@ class LLMJobAdmin(admin.ModelAdmin):
     list_display = ('job_id_short', 'job_type', 'status_colored', 'user', 'model', 'question_id', 'created_at', 'processing_time_formatted', 'actions_column')
     list_filter = ('job_type', 'status', 'model__provider', 'model', 'created_at', 'user')
     search_fields = ('job_id', 'question_id', 'user__username', 'model__name', 'error_message')
-    readonly_fields = ('job_id', 'created_at', 'started_at', 'completed_at', 'processing_time_formatted', 'job_age')
+    readonly_fields = ('job_id', 'created_at', 'started_at', 'completed_at', 'processing_time_formatted', 'job_age', 'result_preview') + LLMUsageStats.USAGE_FIELDS
     list_per_page = 50
     date_hierarchy = 'created_at'
     actions = ['retry_failed_jobs', 'cancel_stuck_jobs', 'mark_as_failed']
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'model')
+        # Results are only read on the change page, through result_preview
+        return super().get_queryset(request).select_related('user', 'model').defer('result_data')
     
     def job_id_short(self, obj):
         return str(obj.job_id)[:8] + "..."
@@ -228,7 +240,16 @@ class LLMJobAdmin(admin.ModelAdmin):
         else:
             return f"{age.seconds//60}m {age.seconds%60}s"
     job_age.short_description = 'Age'
-    
+
+    def result_preview(self, obj):
+        import json
+        from django.utils.html import format_html
+        if not obj.result:
+            return '-'
+        return format_html('<pre style="max-height: 400px; overflow: auto;">{}</pre>',
+                           json.dumps(obj.result, indent=2, ensure_ascii=False, default=str))
+    result_preview.short_description = 'Result data'
+
     def actions_column(self, obj):
         from django.utils.safestring import mark_safe
         actions = []
@@ -243,14 +264,15 @@ class LLMJobAdmin(admin.ModelAdmin):
         failed_jobs = queryset.filter(status='failed')
         count = 0
         for job in failed_jobs:
-            # Reset job status to pending for retry
+            # Reset job status to pending for retry; its original deadline has likely passed
+            restart_job_deadline(job)
             job.status = 'pending'
             job.started_at = None
             job.completed_at = None
             job.error_message = None
             job.save()
             count += 1
-        self.message_user(request, f"Successfully queued {count} jobs for retry.")
+        self.message_user(request, f"Successfully queued {count} jobs for retry, each with a fresh time budget.")
     retry_failed_jobs.short_description = "Retry selected failed jobs"
     
     def cancel_stuck_jobs(self, request, queryset):
@@ -283,7 +305,7 @@ class LLMJobAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Results', {
-            'fields': ('result_data', 'error_message'),
+            'fields': ('result_preview', 'error_message'),
             'classes': ('collapse',)
         }),
     )
@@ -302,7 +324,7 @@ class LLMJobAdmin(admin.ModelAdmin):
         from django.shortcuts import render
         from django.db.models import Count, Q
         from django.utils import timezone
-        from datetime import timedelta
+        from datetime import datetime, timedelta
         
         # Get statistics
         total_jobs = LLMJob.objects.count()
@@ -317,16 +339,22 @@ class LLMJobAdmin(admin.ModelAdmin):
         type_counts = LLMJob.objects.values('job_type').annotate(count=Count('job_type'))
         
         # Failed jobs with errors
-        failed_jobs = LLMJob.objects.filter(status='failed').order_by('-created_at')[:10]
+        failed_jobs = LLMJob.objects.filter(status='failed').defer('input_data', 'result_data').order_by('-created_at')[:10]
         
         # Long running jobs (processing for more than 10 minutes)
         long_running = LLMJob.objects.filter(
             status='processing',
             started_at__lt=timezone.now() - timedelta(minutes=10)
-        ).order_by('started_at')
+        ).defer('input_data', 'result_data').order_by('started_at')
+        
+        from eval.utils import circuit_breaker
+        open_circuits = [b for b in circuit_breaker.states() if b['state'] != circuit_breaker.CLOSED]
+        for b in open_circuits:
+            b['opened_at'] = datetime.fromtimestamp(b['opened_at'], tz=timezone.get_current_timezone())
         
         context = {
             'title': 'LLM Job Dashboard',
+            'open_circuits': open_circuits,
             'total_jobs': total_jobs,
             'status_counts': {item['status']: item['count'] for item in status_counts},
             'recent_jobs': recent_jobs,
@@ -343,6 +371,7 @@ class LLMJobAdmin(admin.ModelAdmin):
         
         job = get_object_or_404(LLMJob, job_id=job_id)
         if job.status == 'failed':
+            restart_job_deadline(job)
             job.status = 'pending'
             job.started_at = None
             job.completed_at = None
@@ -366,3 +395,25 @@ class LLMJobAdmin(admin.ModelAdmin):
             messages.error(request, f"Job {job_id} cannot be cancelled (current status: {job.status}).")
         
         return redirect('admin:eval_llmjob_changelist')
+
+
+from .models import LLMUsageDaily
+
+@admin.register(LLMUsageDaily)
+class LLMUsageDailyAdmin(admin.ModelAdmin):
+    list_display = ('date', 'model_name', 'provider', 'project', 'source', 'records', 'errors', 'llm_calls',
+                    'input_tokens', 'output_tokens', 'cache_read_tokens', 'avg_latency', 'llm_cost')
+    list_filter = ('source', 'provider', 'model_name', 'project')
+    date_hierarchy = 'date'
+    list_select_related = ('project',)
+
+    def avg_latency(self, obj):
+        return f"{obj.llm_latency / obj.records:.1f}s" if obj.records else "-"
+    avg_latency.short_description = 'Avg latency'
+
+    # Written by eval.utils.usage_accounting only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -30,12 +30,15 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import ensure_csrf_cookie
 import json
 import logging
-from openai import OpenAI
+from openai import OpenAI, Timeout
 from django.conf import settings
 import time
 
 logger = logging.getLogger(__name__)
 
+# Anthropic max_tokens for a structured (response_schema) reply when the model sets none
+ANTHROPIC_STRUCTURED_MAX_TOKENS = getattr(settings, 'ANTHROPIC_STRUCTURED_MAX_TOKENS', 4096)
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_llm_models(request):
@@ -46,8 +49,8 @@ def get_llm_models(request):
         # Log the request for debugging
         logger.info("Get LLM models request received")
         
-        from eval.models import LLMModel
-        models = LLMModel.objects.filter(is_active=True).order_by('name')
+        from eval import catalog
+        models = catalog.active_llm_models()
         
         model_data = [
             {
@@ -164,11 +167,17 @@ def validate_with_llm(request):
         logger.error(f"Error validating with LLM: {str(e)}")
         return JsonResponse({"error": str(e)}, status=500)
 
-def perform_llm_validation(model, ground_truth, model_reply):
+def perform_llm_validation(model, ground_truth, model_reply, deadline=None):
     """
     Use an LLM to validate how well a model reply matches the ground truth
     Returns a structured validation result
+
+    The provider request gets explicit timeouts, cut down to what is left of
+    deadline (by default LLM_DEFAULT_JOB_DEADLINE from now).
     """
+    from eval.utils import deadlines
+    if deadline is None:
+        deadline = deadlines.default_deadline('LLM validation')
     try:
         # Determine if model is a LLMModel instance or a string
         if hasattr(model, 'name'):
@@ -225,7 +234,8 @@ Your response should be ONLY the JSON object, nothing else.
                 }
             client = OpenAI(
                 api_key=api_key,
-                base_url=getattr(settings, "OPENAI_API_URL", "https://api.openai.com/v1")
+                base_url=getattr(settings, "OPENAI_API_URL", "https://api.openai.com/v1"),
+                **deadlines.sdk_options(Timeout, deadline)
             )
             response = client.chat.completions.create(
                 model=model_name,
@@ -250,7 +260,7 @@ Your response should be ONLY the JSON object, nothing else.
                         "similarity_score": 0,
                         "reasoning": "Could not validate due to missing Anthropic API key"
                     }
-                claude_client = anthropic.Anthropic(api_key=api_key)
+                claude_client = anthropic.Anthropic(api_key=api_key, **deadlines.sdk_options(anthropic.Timeout, deadline))
                 
                 response = claude_client.messages.create(
                     model=model_name,
@@ -286,7 +296,8 @@ Your response should be ONLY the JSON object, nothing else.
                 genai.configure(api_key=api_key)
                 
                 genai_model = genai.GenerativeModel(model_name)
-                response = genai_model.generate_content(validation_prompt)
+                response = genai_model.generate_content(
+                    validation_prompt, request_options={"timeout": deadlines.request_seconds(deadline)})
                 validation_text = response.text
             except Exception as e:
                 if "API_KEY_SERVICE_BLOCKED" in str(e):
@@ -305,7 +316,7 @@ Your response should be ONLY the JSON object, nothing else.
         # Other models - use the same pattern as in call_llm_api
         else:
             # Use the existing call_llm_api function with a single reply
-            validation_text = call_llm_api(model, validation_prompt, 1)[0]
+            validation_text = call_llm_api(model, validation_prompt, 1, deadline=deadline)[0]
         
         elapsed_time = round(time.time() - start_time, 2)
         
@@ -375,9 +386,12 @@ def review_colab(request):
             return JsonResponse({"success": False, "error": "Missing colab_content or models."}, status=400)
 
         from .utils.pubsub import publish_message
+        from .utils.notebooks import store_notebook_artifact
         import uuid
         
         job_id = str(uuid.uuid4())
+        # Extract once here; each model's message only carries the content hash
+        content_hash = store_notebook_artifact(colab_content)["content_hash"]
         
         # For each model, publish a separate job to the queue
         for model_id in models:
@@ -386,7 +400,7 @@ def review_colab(request):
                 "job_id": job_id,
                 "question_id": str(question_id),
                 "user_id": request.user.id,
-                "colab_content": colab_content,
+                "content_hash": content_hash,
                 "model_id": model_id,
             }
             publish_message(data_to_publish)
@@ -421,14 +435,19 @@ def get_review_results(request, job_id):
     from django.core.cache import cache
     from eval.models import LLMModel
 
-    for model_id in model_ids:
-        cache_key = f"analysis_result_{job_id}_{model_id}"
-        result = cache.get(cache_key)
-        if result:
-            model = LLMModel.objects.get(id=model_id)
+    # One cache round-trip and one model query for every requested model
+    cache_keys = {model_id: f"analysis_result_{job_id}_{model_id}" for model_id in model_ids}
+    cached = cache.get_many(list(cache_keys.values()))
+    ready = [model_id for model_id in model_ids if cached.get(cache_keys[model_id])]
+    model_names = {
+        str(pk): name for pk, name in LLMModel.objects.filter(id__in=[m for m in ready if m.isdigit()]).values_list('id', 'name')
+    } if ready else {}
+
+    for model_id in ready:
+        if model_id in model_names:
             results[model_id] = {
-                "model_name": model.name,
-                "result": result
+                "model_name": model_names[model_id],
+                "result": cached[cache_keys[model_id]]
             }
             completed_models.append(model_id)
 
@@ -440,13 +459,69 @@ def get_review_results(request, job_id):
         "is_complete": len(completed_models) == len(model_ids)
     })
 
-def call_llm_api(model, prompt, num_replies):
+def call_llm_api(model, prompt, num_replies, response_schema=None, prefix=None, deadline=None):
+    """
+    Call the appropriate LLM API based on the model; see _call_llm_api.
+    Identical calls already in flight here or in another worker share one
+    provider request. With a job deadline (eval.utils.deadlines), raises
+    DeadlineExceeded instead of starting a call once it has passed.
+    """
+    from eval.utils import circuit_breaker, single_flight
+    if deadline is not None:
+        deadline.check(f"a call to {getattr(model, 'name', model)}")
+    model_name = getattr(model, "name", str(model))
+    key = single_flight.request_key(
+        "call_llm_api", getattr(model, "id", None), model_name, prompt, num_replies, response_schema, prefix)
+    # Raises CircuitOpenError while the provider is failing
+    return single_flight.do(key, lambda: circuit_breaker.call(
+        getattr(model, "provider", None), model_name,
+        lambda: _call_llm_api(model, prompt, num_replies, response_schema, prefix, deadline),
+        is_failure=_error_reply,
+    ), deadline=deadline)
+
+
+# Replies _call_llm_api returns in place of an answer when the provider call fails
+_ERROR_REPLY_PREFIXES = (
+    "Error generating response:", "Error with Anthropic API:", "Error with DeepSeek API:", "Error with Fireworks API:",
+)
+
+
+def is_error_reply(reply):
+    """Whether reply is _call_llm_api's report of a failed provider call rather than the model's answer."""
+    return reply.startswith(_ERROR_REPLY_PREFIXES)
+
+
+def _error_reply(responses):
+    from eval.utils import circuit_breaker
+    # Only provider trouble counts for the breaker, not e.g. a rejected key or prompt
+    return next(
+        (r for r in responses if is_error_reply(r) and circuit_breaker.is_transient_message(r)), "")
+
+
+def _call_llm_api(model, prompt, num_replies, response_schema=None, prefix=None, deadline=None):
     """
     Call the appropriate LLM API based on the model
     Similar to evaluate_with_llm in processor/utils.py
+
+    With response_schema (a JSON schema dict), providers that support it are
+    asked for JSON output: OpenAI enforces the schema, DeepSeek, Fireworks and
+    Gemini return a JSON object, others rely on the prompt. Callers must still
+    validate the text they get back.
+
+    prefix is content shared by several calls (e.g. the notebook under review),
+    sent ahead of prompt so the provider can reuse its cached prefix: Anthropic
+    gets an explicit cache breakpoint after it, OpenAI-compatible APIs cache
+    identical prefixes automatically.
+
+    Every request has explicit connect/read timeouts, cut down to what is left
+    of deadline if one is given; no further replies are requested after it.
     """
     from django.conf import settings  # Ensure settings is always available
+    from eval.utils import deadlines
+    from eval.utils.llm_usage import record_usage, usage_from_anthropic, usage_from_gemini, usage_from_openai
     responses = []
+    json_object_format = {"response_format": {"type": "json_object"}} if response_schema else {}
+    full_prompt = f"{prefix}\n\n{prompt}" if prefix else prompt
     
     try:
         # Determine if model is a LLMModel instance or a string
@@ -460,6 +535,16 @@ def call_llm_api(model, prompt, num_replies):
             model_provider = "Unknown"
         
         logger.info(f"Processing model: {model_name} (ID: {model_id}, Provider: {model_provider})")
+
+        timeouts = deadlines.request_timeouts(deadline)
+
+        def sdk_options(timeout_type):
+            return deadlines.sdk_options(timeout_type, deadline)
+
+        def next_reply():
+            # Raises DeadlineExceeded once the job's budget is spent
+            if deadline is not None:
+                deadline.check(f"another reply from {model_name}")
         
         # OpenAI models
         if "gpt" in model_name.lower():
@@ -469,18 +554,28 @@ def call_llm_api(model, prompt, num_replies):
                 raise Exception("OpenAI API key not found in model object.")
             client = OpenAI(
                 api_key=api_key,
-                base_url=getattr(settings, "OPENAI_API_URL", "https://api.openai.com/v1")
+                base_url=getattr(settings, "OPENAI_API_URL", "https://api.openai.com/v1"),
+                **sdk_options(Timeout)
             )
             
+            schema_format = {}
+            if response_schema:
+                schema_format = {"response_format": {
+                    "type": "json_schema",
+                    "json_schema": {"name": "structured_response", "schema": response_schema, "strict": True},
+                }}
             for _ in range(num_replies):
+                next_reply()
                 response = client.chat.completions.create(
                     model=model_name,
                     messages=[
                         {"role": "system", "content": "You are a helpful assistant."},
-                        {"role": "user", "content": prompt}
+                        {"role": "user", "content": full_prompt}
                     ],
                     temperature=0.7,
+                    **schema_format,
                 )
+                record_usage(usage_from_openai(response.usage), "openai", model_name)
                 responses.append(response.choices[0].message.content.strip())
         
         # Anthropic models
@@ -492,16 +587,30 @@ def call_llm_api(model, prompt, num_replies):
                 api_key = getattr(model, "api_key", None)
                 if not api_key:
                     raise Exception("Anthropic API key not found in model object.")
-                claude_client = anthropic.Anthropic(api_key=api_key)
+                claude_client = anthropic.Anthropic(api_key=api_key, **sdk_options(anthropic.Timeout))
+                content = prompt
+                if prefix:
+                    content = [
+                        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                        {"type": "text", "text": prompt},
+                    ]
                 
+                max_tokens = 1000
+                if response_schema:
+                    # A structured answer holds a whole reply per field; cut off, it isn't valid JSON
+                    max_tokens = getattr(model, "max_tokens", None) or ANTHROPIC_STRUCTURED_MAX_TOKENS
                 for _ in range(num_replies):
+                    next_reply()
                     response = claude_client.messages.create(
                         model=model_name,
-                        max_tokens=1000,
+                        max_tokens=max_tokens,
                         messages=[
-                            {"role": "user", "content": prompt}
+                            {"role": "user", "content": content}
                         ]
                     )
+                    record_usage(usage_from_anthropic(response.usage), "anthropic", model_name)
+                    if response.stop_reason == "max_tokens":
+                        logger.warning(f"Anthropic reply from {model_name} was cut off at {max_tokens} tokens")
                     responses.append(response.content[0].text)
             except ImportError:
                 # Fallback to mock responses if Anthropic SDK is not available
@@ -520,8 +629,13 @@ def call_llm_api(model, prompt, num_replies):
                 genai.configure(api_key=api_key)
                 
                 genai_model = genai.GenerativeModel(model_name)
+                generation_config = {"response_mime_type": "application/json"} if response_schema else None
                 for _ in range(num_replies):
-                    response = genai_model.generate_content(prompt)
+                    next_reply()
+                    response = genai_model.generate_content(
+                        full_prompt, generation_config=generation_config,
+                        request_options={"timeout": deadlines.request_seconds(deadline)})
+                    record_usage(usage_from_gemini(getattr(response, "usage_metadata", None)), "gemini", model_name)
                     responses.append(response.text)
             except ImportError:
                 # Fallback to mock responses if Google SDK is not available
@@ -538,18 +652,22 @@ def call_llm_api(model, prompt, num_replies):
                 # Create DeepSeek client
                 deepseek_client = OpenAI(
                     api_key=deepseek_key,
-                    base_url=settings.DEEPSEEK_API_URL
+                    base_url=settings.DEEPSEEK_API_URL,
+                    **sdk_options(Timeout)
                 )
                 
                 for _ in range(num_replies):
+                    next_reply()
                     response = deepseek_client.chat.completions.create(
                         model=model_name,
                         messages=[
                             {"role": "system", "content": "You are a helpful assistant."},
-                            {"role": "user", "content": prompt}
+                            {"role": "user", "content": full_prompt}
                         ],
                         temperature=0.7,
+                        **json_object_format,
                     )
+                    record_usage(usage_from_openai(response.usage), "deepseek", model_name)
                     responses.append(response.choices[0].message.content.strip())
                     logger.info(f"DeepSeek response received, length: {len(responses[-1])}")
             except Exception as e:
@@ -568,10 +686,11 @@ def call_llm_api(model, prompt, num_replies):
                 # Create Fireworks client
                 # If Fireworks supports base_url, use it; otherwise, fallback to default
                 try:
-                    fireworks_client = Fireworks(api_key=fireworks_api_key, base_url=settings.FIREWORKS_API_URL)
+                    fireworks_client = Fireworks(
+                        api_key=fireworks_api_key, base_url=settings.FIREWORKS_API_URL, timeout=timeouts["read"])
                 except TypeError:
                     # If base_url is not supported, fallback to default constructor
-                    fireworks_client = Fireworks(api_key=fireworks_api_key)
+                    fireworks_client = Fireworks(api_key=fireworks_api_key, timeout=timeouts["read"])
                 
                 # Use the standard model name format for Fireworks
                 # If the model name already contains the full path, use it as is
@@ -586,13 +705,15 @@ def call_llm_api(model, prompt, num_replies):
                 logger.info(f"Using Fireworks model: {fireworks_model_name}")
                 
                 for _ in range(num_replies):
+                    next_reply()
                     response = fireworks_client.chat.completions.create(
                         model=fireworks_model_name,
                         messages=[
                             {"role": "system", "content": "You are a helpful assistant."},
-                            {"role": "user", "content": prompt}
+                            {"role": "user", "content": full_prompt}
                         ],
                         temperature=0.7,
+                        **json_object_format,
                     )
                     responses.append(response.choices[0].message.content.strip())
                     logger.info(f"Fireworks response received, length: {len(responses[-1])}")
@@ -618,13 +739,13 @@ def call_llm_api(model, prompt, num_replies):
                 json_result = {
                     "messages": [
                         {},
-                        {"reasoning": {"process": [{"summary": prompt}]}}
+                        {"reasoning": {"process": [{"summary": full_prompt}]}}
                     ]
                 }
 
                 # Call the existing evaluation function
                 for _ in range(num_replies):
-                    response = evaluate_with_llm(json_result, api_key, model, dummy_prompt)
+                    response = evaluate_with_llm(json_result, api_key, model, dummy_prompt, deadline=deadline)
                     responses.append(response)
 
                 logger.info(f"Used evaluate_with_llm for model {model_name}")
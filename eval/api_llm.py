@@ -1,16 +1,33 @@
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponseNotModified, JsonResponse
 from django.views.decorators.http import require_http_methods
+import hashlib
 import json
 import logging
+import time
 from django.contrib.auth.models import User
-from eval.models import LLMModel, LLMJob, ProjectLLMModel, TrainerTask
+from eval.models import LLMModel, LLMJob
 from eval.utils.pubsub import publish_message
+from eval.model_config import project_id_for_question, resolve_model_config
+from eval.utils.notebooks import get_notebook_artifact, store_notebook_artifact
+from eval.utils.pagination import KeysetPaginator
 import uuid
 from eval.utils.logger import log
 
 logger = logging.getLogger(__name__)
 
+# Long-polling parks a request for up to LLM_JOB_LONG_POLL_TIMEOUT seconds. That
+# is only affordable with async gunicorn workers (gevent/eventlet), where the
+# sleep yields; a sync worker would be pinned by every open tab, and under ASGI
+# sync views share one thread. Off by default: wait is ignored, the request is
+# answered at once and the client polls on an interval.
+LLM_JOB_LONG_POLL = getattr(settings, 'LLM_JOB_LONG_POLL', False)
+# Longest a batch status request may wait for a change before answering 304
+LLM_JOB_LONG_POLL_TIMEOUT = getattr(settings, 'LLM_JOB_LONG_POLL_TIMEOUT', 25) if LLM_JOB_LONG_POLL else 0
+LLM_JOB_LONG_POLL_INTERVAL = 0.5
+MAX_STATUS_BATCH = 100
+
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -36,12 +53,8 @@ def submit_llm_job(request):
         input_data = data.get('input_data', {})
         question_id = data.get('question_id')
 
-        task = TrainerTask.objects.filter(question_id=question_id).first()
-        # If task and project found then look for associated project llm model
-        if task and task.project:
-            project_models = ProjectLLMModel.objects.filter(project_id=task.project)
-        else:
-            project_models = ProjectLLMModel.objects.none()
+        # Project of the question decides which models may be used (see eval.model_config)
+        project_id = project_id_for_question(question_id)
         
         if not job_type or not model_id:
             return JsonResponse({
@@ -50,7 +63,8 @@ def submit_llm_job(request):
             }, status=400)
         
         # Validate job_type
-        valid_job_types = [choice[0] for choice in LLMJob.JOB_TYPE_CHOICES]
+        # CSV pipeline runs are started from the processor's upload page only
+        valid_job_types = [choice[0] for choice in LLMJob.JOB_TYPE_CHOICES if choice[0] != 'csv_pipeline']
         if job_type not in valid_job_types:
             return JsonResponse({
                 "success": False,
@@ -59,29 +73,31 @@ def submit_llm_job(request):
         
         # Validate model exists
         try:
-            model = None
-            if project_models.exists():
-                project_model_instance = project_models.filter(llm_model_id=model_id, is_active=True).select_related('llm_model').first()
-                if not project_model_instance:
-                    raise LLMModel.DoesNotExist
-                model = project_model_instance.llm_model
-            else:
-                # No overrides defined for project — fallback to global model
-                model = LLMModel.objects.get(id=model_id, is_active=True) 
-            if model is None:
+            config = resolve_model_config(model_id, project_id)
+            if not config.selectable:
                 raise LLMModel.DoesNotExist
-                
-        except LLMModel.DoesNotExist:
+        except (LLMModel.DoesNotExist, ValueError):
             return JsonResponse({
                 "success": False,
                 "error": f"LLM model with id {model_id} not found or inactive"
             }, status=400)
         
+        # Review jobs reference the normalized notebook by hash instead of carrying its text
+        if job_type == 'review_colab' and input_data.get('colab_content'):
+            input_data = dict(input_data)
+            artifact = store_notebook_artifact(input_data.pop('colab_content'))
+            input_data['content_hash'] = artifact['content_hash']
+        elif job_type == 'review_colab' and get_notebook_artifact(input_data.get('content_hash') or '') is None:
+            return JsonResponse({
+                "success": False,
+                "error": "Unknown notebook content_hash; fetch the notebook again"
+            }, status=400)
+
         # Create job record in database
         job = LLMJob.objects.create(
             job_type=job_type,
             user=request.user if request.user.is_authenticated else None,
-            model=model,
+            model_id=config.model_id,
             input_data=input_data,
             question_id=question_id
         )
@@ -99,7 +115,7 @@ def submit_llm_job(request):
         # Publish to Pub/Sub
         publish_message(pubsub_data)
         
-        logger.info(f"Submitted {job_type} job {job.job_id} for model {model.name}")
+        logger.info(f"Submitted {job_type} job {job.job_id} for model {config.name}")
         
         return JsonResponse({
             "success": True,
@@ -121,6 +137,48 @@ def submit_llm_job(request):
         }, status=500)
 
 
+def _job_status_payload(job):
+    """Status body shared by the single and batch status endpoints."""
+    response_data = {
+        "success": True,
+        "job_id": str(job.job_id),
+        "job_type": job.job_type,
+        "status": job.status,
+        "is_complete": job.is_complete,
+        "created_at": job.created_at.isoformat(),
+    }
+    
+    # Add model information
+    if job.model:
+        response_data["model"] = {
+            "id": str(job.model.id),
+            "name": job.model.name,
+            "provider": job.model.provider
+        }
+    
+    # Add timing information
+    if job.started_at:
+        response_data["started_at"] = job.started_at.isoformat()
+    if job.completed_at:
+        response_data["completed_at"] = job.completed_at.isoformat()
+    if job.processing_time:
+        response_data["processing_time"] = job.processing_time
+    
+    # Add results if completed
+    if job.status == 'completed':
+        response_data["result_data"] = job.result
+    
+    # Add error message if failed
+    if job.status == 'failed':
+        response_data["error_message"] = job.error_message
+
+    return response_data
+
+
+def _can_view_job(user, job_user_id):
+    return job_user_id is None or (user.is_authenticated and (user.pk == job_user_id or user.is_staff))
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def poll_job_status(request, job_id):
@@ -157,40 +215,7 @@ def poll_job_status(request, job_id):
                 "error": "Permission denied"
             }, status=403)
         
-        response_data = {
-            "success": True,
-            "job_id": str(job.job_id),
-            "job_type": job.job_type,
-            "status": job.status,
-            "is_complete": job.is_complete,
-            "created_at": job.created_at.isoformat(),
-        }
-        
-        # Add model information
-        if job.model:
-            response_data["model"] = {
-                "id": str(job.model.id),
-                "name": job.model.name,
-                "provider": job.model.provider
-            }
-        
-        # Add timing information
-        if job.started_at:
-            response_data["started_at"] = job.started_at.isoformat()
-        if job.completed_at:
-            response_data["completed_at"] = job.completed_at.isoformat()
-        if job.processing_time:
-            response_data["processing_time"] = job.processing_time
-        
-        # Add results if completed
-        if job.status == 'completed':
-            response_data["result_data"] = job.result_data
-        
-        # Add error message if failed
-        if job.status == 'failed':
-            response_data["error_message"] = job.error_message
-        
-        return JsonResponse(response_data)
+        return JsonResponse(_job_status_payload(job))
         
     except Exception as e:
         logger.error(f"Error polling job status: {str(e)}")
@@ -200,6 +225,111 @@ def poll_job_status(request, job_id):
         }, status=500)
 
 
+def _status_versions(job_ids):
+    """Cheap (job_id, status, started_at, completed_at) rows used to detect changes."""
+    return sorted(
+        (str(job_id), status, started_at, completed_at, user_id)
+        for job_id, status, started_at, completed_at, user_id in LLMJob.objects.filter(job_id__in=job_ids).values_list(
+            'job_id', 'status', 'started_at', 'completed_at', 'user_id')
+    )
+
+
+def _status_etag(versions):
+    digest = hashlib.sha1(repr(versions).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def poll_job_statuses(request):
+    """
+    Batch status endpoint: one request for many jobs, with ETag and long-poll.
+    
+    GET /api/llm/jobs/status/?ids=<uuid>,<uuid>&wait=25
+    
+    With If-None-Match set to the previous ETag and wait > 0, the request
+    blocks until any of the jobs changes state (200) or the wait expires (304).
+    wait is capped at the X-Long-Poll-Timeout response header, which is 0
+    unless LLM_JOB_LONG_POLL is on; clients then poll on an interval.
+    
+    Returns:
+    {
+        "success": true,
+        "jobs": {"<uuid>": {...same body as /api/llm/jobs/<uuid>/status/...}},
+        "all_complete": boolean
+    }
+    """
+    try:
+        requested = [job_id.strip() for job_id in request.GET.get('ids', '').split(',') if job_id.strip()]
+        if not requested:
+            return JsonResponse({"success": False, "error": "Missing 'ids' parameter"}, status=400)
+        if len(requested) > MAX_STATUS_BATCH:
+            return JsonResponse({
+                "success": False,
+                "error": f"At most {MAX_STATUS_BATCH} job ids per request"
+            }, status=400)
+
+        canonical = {}
+        for job_id in requested:
+            try:
+                canonical[job_id] = str(uuid.UUID(job_id))
+            except ValueError:
+                canonical[job_id] = None
+        job_ids = [job_id for job_id in canonical.values() if job_id]
+
+        try:
+            wait = max(0.0, min(float(request.GET.get('wait', 0)), LLM_JOB_LONG_POLL_TIMEOUT))
+        except ValueError:
+            wait = 0.0
+        if_none_match = request.headers.get('If-None-Match', '').strip()
+        if if_none_match.startswith('W/'):
+            if_none_match = if_none_match[2:]
+
+        # Long-poll on the small version rows; result_data is only read once something changed
+        deadline = time.monotonic() + wait
+        etag = _status_etag(_status_versions(job_ids))
+        while etag == if_none_match and time.monotonic() < deadline:
+            time.sleep(LLM_JOB_LONG_POLL_INTERVAL)
+            etag = _status_etag(_status_versions(job_ids))
+
+        if etag == if_none_match:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            response['X-Long-Poll-Timeout'] = str(LLM_JOB_LONG_POLL_TIMEOUT)
+            return response
+
+        jobs = {str(job.job_id): job for job in LLMJob.objects.filter(job_id__in=job_ids).select_related('model', 'result_blob').defer('input_data')}
+        payloads = {}
+        for job_id in requested:
+            job = jobs.get(canonical[job_id])
+            if job is None:
+                payloads[job_id] = {"success": False, "error": f"Job with id {job_id} not found"}
+            elif not _can_view_job(request.user, job.user_id):
+                payloads[job_id] = {"success": False, "error": "Permission denied"}
+            else:
+                payloads[job_id] = _job_status_payload(job)
+
+        # The ETag describes exactly the rows serialized here
+        versions = sorted(
+            (str(job.job_id), job.status, job.started_at, job.completed_at, job.user_id) for job in jobs.values())
+        response = JsonResponse({
+            "success": True,
+            "jobs": payloads,
+            "all_complete": all(payload.get("is_complete", True) for payload in payloads.values()),
+        })
+        response['ETag'] = _status_etag(versions)
+        response['Cache-Control'] = 'no-cache'
+        response['X-Long-Poll-Timeout'] = str(LLM_JOB_LONG_POLL_TIMEOUT)
+        return response
+
+    except Exception as e:
+        logger.error(f"Error polling job statuses: {str(e)}")
+        return JsonResponse({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_job_result(request, job_id):
@@ -250,7 +380,7 @@ def get_job_result(request, job_id):
             "job_id": str(job.job_id),
             "job_type": job.job_type,
             "status": job.status,
-            "result_data": job.result_data,
+            "result_data": job.result,
             "created_at": job.created_at.isoformat(),
             "completed_at": job.completed_at.isoformat(),
             "processing_time": job.processing_time
@@ -290,7 +420,7 @@ def list_user_jobs(request):
     - status: Filter by status (optional)
     - job_type: Filter by job type (optional)
     - limit: Number of results to return (default: 20, max: 100)
-    - offset: Offset for pagination (default: 0)
+    - cursor: next_cursor/previous_cursor from a previous response (default: first page)
     """
     try:
         if not request.user.is_authenticated:
@@ -302,22 +432,19 @@ def list_user_jobs(request):
         # Get query parameters
         status_filter = request.GET.get('status')
         job_type_filter = request.GET.get('job_type')
-        limit = min(int(request.GET.get('limit', 20)), 100)
-        offset = int(request.GET.get('offset', 0))
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
         
         # Build query
-        queryset = LLMJob.objects.filter(user=request.user)
+        queryset = LLMJob.objects.filter(user=request.user).select_related('model').defer('input_data', 'result_data')
         
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         if job_type_filter:
             queryset = queryset.filter(job_type=job_type_filter)
         
-        # Get total count
-        total_count = queryset.count()
-        
-        # Apply pagination
-        jobs = queryset[offset:offset + limit]
+        # Keyset pagination; total_count is cached and may lag by a minute
+        page = KeysetPaginator(queryset, ('-created_at', '-job_id'), per_page=limit).page(request.GET.get('cursor'))
+        jobs = page.items
         
         # Serialize jobs
         jobs_data = []
@@ -348,10 +475,12 @@ def list_user_jobs(request):
             "success": True,
             "jobs": jobs_data,
             "pagination": {
-                "total_count": total_count,
+                "total_count": page.total,
                 "limit": limit,
-                "offset": offset,
-                "has_next": offset + limit < total_count
+                "has_next": page.has_next,
+                "has_previous": page.has_previous,
+                "next_cursor": page.next_cursor,
+                "previous_cursor": page.previous_cursor
             }
         })
         
@@ -401,21 +530,11 @@ def submit_trainer_question_analysis(request):
         
         # Create the job using the generic endpoint logic
         try:
-            model = None
-            # Check if project has any tied models at all
-            project_models = ProjectLLMModel.objects.filter(project_id=project_id) if project_id else ProjectLLMModel.objects.none()
-
-            if project_models.exists():
-                # Must use a model from ProjectLLMModel — filter by id and active status
-                project_model_instance = project_models.filter(llm_model_id=model_id, is_active=True).select_related('llm_model').first()
-                if not project_model_instance:
-                    raise LLMModel.DoesNotExist
-                model = project_model_instance.llm_model
-            else:
-                # No overrides defined for project — fallback to global model
-                model = LLMModel.objects.get(id=model_id, is_active=True)
-
-        except LLMModel.DoesNotExist:
+            # Projects with tied models only allow those; otherwise any active model
+            config = resolve_model_config(model_id, project_id)
+            if not config.selectable:
+                raise LLMModel.DoesNotExist
+        except (LLMModel.DoesNotExist, ValueError):
             return JsonResponse({
                 "success": False,
                 "error": f"LLM model with id {model_id} not found or inactive for this project"
@@ -426,7 +545,7 @@ def submit_trainer_question_analysis(request):
         job = LLMJob.objects.create(
             job_type='trainer_question_analysis',
             user=request.user if request.user.is_authenticated else None,
-            model=model,
+            model_id=config.model_id,
             input_data=input_data,
             question_id=question_id
         )
@@ -438,6 +557,7 @@ def submit_trainer_question_analysis(request):
             "model_id": model_id,
             "user_id": request.user.id if request.user.is_authenticated else None,
             "question_id": question_id,
+            "project_id": project_id,
             "system_message": system_message,
             "full_input": full_input
         }
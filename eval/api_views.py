@@ -3,6 +3,8 @@ from django.http import JsonResponse
 import json
 from django.core.cache import cache
 from eval.models import LLMModel
+from eval.utils.notebooks import store_notebook_artifact
+from eval.utils.drive import download_file, fetch_notebook_content, get_drive_service, service_account_available
 
 @csrf_exempt
 def fetch_colab_content(request):
@@ -11,8 +13,6 @@ def fetch_colab_content(request):
     Expects a JSON payload with:
     - file_id: The Google Drive file ID of the Colab notebook
     """
-    import os, io, json as pyjson
-    from django.conf import settings
     try:
         if request.method != "POST":
             return JsonResponse({"success": False, "error": "Invalid request method."})
@@ -23,53 +23,30 @@ def fetch_colab_content(request):
                 'success': False,
                 'error': 'Missing required parameter: file_id'
             }, status=400)
-        SERVICE_ACCOUNT_FILE = os.path.join(settings.BASE_DIR, 'service_account.json')
-        if not os.path.exists(SERVICE_ACCOUNT_FILE):
+        if not service_account_available():
             return JsonResponse({
                 'success': False,
                 'error': 'Service account file not found. Please ensure service_account.json is in the project root directory.'
             }, status=500)
-        from google.oauth2 import service_account
-        from googleapiclient.discovery import build
-        from googleapiclient.http import MediaIoBaseDownload
-        import nbformat
-        SCOPES = ['https://www.googleapis.com/auth/drive']
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        drive_service = build('drive', 'v3', credentials=credentials)
-        # Download the notebook file from Drive
+        # A metadata call decides whether the cached notebook is still current
         try:
-            drive_request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, drive_request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            fh.seek(0)
-            nb_json = pyjson.loads(fh.read().decode('utf-8'))
-        except Exception as e:
+            notebook = fetch_notebook_content(file_id)
+        except ValueError as e:
             return JsonResponse({
                 'success': False,
-                'error': f'Error downloading notebook: {str(e)}'
+                'error': f'Error parsing notebook: {str(e)}'
             }, status=500)
-        # Parse the notebook and extract markdown and code cells
-        try:
-            nb = nbformat.reads(pyjson.dumps(nb_json), as_version=4)
-            content_lines = []
-            for cell in nb['cells']:
-                if cell['cell_type'] == 'markdown':
-                    content_lines.append(cell['source'])
-                elif cell['cell_type'] == 'code':
-                    content_lines.append(f"```python\n{cell['source']}\n```")
-            content = "\n\n".join(content_lines)
         except Exception as e:
             return JsonResponse({
                 'success': False,
-                'error': f'Error parsing notebook: {str(e)}'
+                'error': f'Error downloading notebook: {str(e)}'
             }, status=500)
+        content = notebook['content']
+        artifact = store_notebook_artifact(content)
         return JsonResponse({
             'success': True,
-            'content': content
+            'content': content,
+            'content_hash': artifact['content_hash']
         })
     except json.JSONDecodeError:
         return JsonResponse({
@@ -94,8 +71,7 @@ def transfer_to_colab(request):
     - multiple_cells: Whether to split the content into multiple cells
     - cell_separator: The separator to use when splitting the content
     """
-    import os, io, json as pyjson
-    from django.conf import settings
+    import io
     try:
         if request.method != "POST":
             return JsonResponse({"success": False, "error": "Invalid request method."})
@@ -109,30 +85,17 @@ def transfer_to_colab(request):
                 'success': False,
                 'error': 'Missing required parameters: file_id or markdown_content'
             }, status=400)
-        SERVICE_ACCOUNT_FILE = os.path.join(settings.BASE_DIR, 'service_account.json')
-        if not os.path.exists(SERVICE_ACCOUNT_FILE):
+        if not service_account_available():
             return JsonResponse({
                 'success': False,
                 'error': 'Service account file not found. Please ensure service_account.json is in the project root directory.'
             }, status=500)
-        from google.oauth2 import service_account
-        from googleapiclient.discovery import build
-        from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+        from googleapiclient.http import MediaIoBaseUpload
         import nbformat
-        SCOPES = ['https://www.googleapis.com/auth/drive']
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        drive_service = build('drive', 'v3', credentials=credentials)
+        drive_service = get_drive_service()
         # STEP 1: Download the current notebook file from Drive
         try:
-            drive_request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, drive_request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            fh.seek(0)
-            nb_json = pyjson.loads(fh.read().decode('utf-8'))
+            nb_str = download_file(file_id).decode('utf-8')
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -140,7 +103,7 @@ def transfer_to_colab(request):
             }, status=500)
         # STEP 2: Parse and modify the notebook using nbformat
         try:
-            nb = nbformat.reads(pyjson.dumps(nb_json), as_version=4)
+            nb = nbformat.reads(nb_str, as_version=4)
             updated = False
             if multiple_cells and cell_separator in markdown_content:
                 cell_contents = markdown_content.split(cell_separator)
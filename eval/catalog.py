@@ -0,0 +1,146 @@
+"""
+In-process cache for rarely-changing reference tables.
+
+Streams/subjects, system messages and LLM models are read on almost every page
+but edited only from the admin. Each table is loaded once into an immutable
+tuple and kept until a post_save/post_delete signal bumps its version (see
+eval.signals). The version is also kept in the shared cache, so an edit made
+in one process is picked up by the others; each process reads it at most once
+per CATALOG_VERSION_CHECK_INTERVAL seconds, so a read normally costs no
+cache round trip. The TTL is only a backstop.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+PREFERENCE_CACHE_TIMEOUT = getattr(settings, 'PREFERENCE_CACHE_TIMEOUT', 300)
+# Longest an edit made in another process goes unnoticed here
+CATALOG_VERSION_CHECK_INTERVAL = getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', 2)
+
+STREAMS = 'streams_and_subjects'
+SYSTEM_MESSAGES = 'system_messages'
+LLM_MODELS = 'llm_models'
+
+_versions = {}
+_entries = {}
+# name -> (shared version, monotonic time of the next check)
+_shared_checks = {}
+_lock = threading.Lock()
+
+
+def _shared_version_key(name):
+    return f"catalog_version_{name}"
+
+
+def shared_version(name, now):
+    """
+    Version of name in the shared cache, read at most once per
+    CATALOG_VERSION_CHECK_INTERVAL; now is time.monotonic(). Other in-process
+    caches (e.g. eval.model_config) use it to notice edits made elsewhere.
+    """
+    with _lock:
+        checked = _shared_checks.get(name)
+    if checked and checked[1] > now:
+        return checked[0]
+    version = cache.get_or_set(_shared_version_key(name), time.time_ns, timeout=None)
+    with _lock:
+        _shared_checks[name] = (version, now + CATALOG_VERSION_CHECK_INTERVAL)
+    return version
+
+
+def bump_shared_version(name):
+    """Tell every process that name changed; this one re-reads the version at once."""
+    with _lock:
+        _shared_checks.pop(name, None)
+    try:
+        cache.incr(_shared_version_key(name))
+    except ValueError:
+        cache.set(_shared_version_key(name), time.time_ns(), timeout=None)
+
+
+def invalidate_catalog(name):
+    with _lock:
+        _versions[name] = _versions.get(name, 0) + 1
+        _entries.pop(name, None)
+    bump_shared_version(name)
+
+
+def _get(name, loader):
+    now = time.monotonic()
+    shared = shared_version(name, now)
+    with _lock:
+        version = (_versions.get(name, 0), shared)
+        entry = _entries.get(name)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+    value = tuple(loader())
+    with _lock:
+        # Only store if nothing was invalidated while loading
+        if _versions.get(name, 0) == version[0]:
+            _entries[name] = (version, now + CATALOG_CACHE_TIMEOUT, value)
+    return value
+
+
+def streams_and_subjects():
+    from eval.models import StreamAndSubject
+    return _get(STREAMS, lambda: StreamAndSubject.objects.order_by('name'))
+
+
+def system_messages():
+    from eval.models import SystemMessage
+    return _get(SYSTEM_MESSAGES, lambda: SystemMessage.objects.select_related('category').order_by('name'))
+
+
+def llm_models():
+    """Every LLM model ordered by name, inactive ones included."""
+    from eval.models import LLMModel
+    return _get(LLM_MODELS, lambda: LLMModel.objects.order_by('name'))
+
+
+def active_llm_models():
+    return [model for model in llm_models() if model.is_active]
+
+
+def default_llm_models():
+    """Active default models, or every active model when none is marked default."""
+    active = active_llm_models()
+    return [model for model in active if model.is_default] or active
+
+
+def system_messages_for_streams(stream_ids):
+    stream_ids = set(stream_ids)
+    return [message for message in system_messages() if message.category_id in stream_ids]
+
+
+def coding_system_messages():
+    """System messages in a 'coding' stream, or all of them when there are none."""
+    coding = [
+        message for message in system_messages()
+        if message.category and 'coding' in message.category.name.lower()
+    ]
+    return coding or list(system_messages())
+
+
+def _preference_key(user_id):
+    return f"preferred_streams_{user_id}"
+
+
+def preferred_stream_ids(user):
+    """Stream/subject ids the user picked in their preferences."""
+    if not user.is_authenticated:
+        return []
+    key = _preference_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        from eval.models import UserPreference
+        ids = list(UserPreference.streams_and_subjects.through.objects.filter(
+            userpreference__user_id=user.pk).values_list('streamandsubject_id', flat=True))
+        cache.set(key, ids, timeout=PREFERENCE_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_preferred_streams(user_id):
+    cache.delete(_preference_key(user_id))
@@ -0,0 +1,78 @@
+"""
+Model evaluation session state.
+
+evaluate_models records each model's result here and get_model_results and
+the response editors read it back. The results live in the shared cache
+instead of a module-level dict, so the poll can land on any worker process.
+
+Each result has its own key, numbered by a per-session counter in the
+database (eval.utils.shared_locks; the file cache's incr() can hand two
+processes the same number), so results added by threads of different
+requests or processes never overwrite each other.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils import shared_locks
+
+EVAL_SESSION_TIMEOUT = getattr(settings, 'EVAL_SESSION_TIMEOUT', 3600)
+_COUNTER_PREFIX = 'eval_session:'
+
+
+def _session_key(session_id):
+    return f"eval_session_{session_id}"
+
+
+def _counter(session_id):
+    return f"{_COUNTER_PREFIX}{session_id}"
+
+
+def _result_key(session_id, index):
+    return f"eval_session_{session_id}_{index}"
+
+
+def start(session_id):
+    cache.set(_session_key(session_id), True, timeout=EVAL_SESSION_TIMEOUT)
+    # Counters of sessions that expired since
+    shared_locks.purge_counters(_COUNTER_PREFIX, EVAL_SESSION_TIMEOUT)
+
+
+def _indexed_results(session_id):
+    """(index, result) pairs recorded so far, or None for an unknown or expired session."""
+    if not cache.get(_session_key(session_id)):
+        return None
+    count = shared_locks.counter_value(_counter(session_id))
+    keys = [_result_key(session_id, index) for index in range(1, count + 1)]
+    found = cache.get_many(keys)
+    indexed = []
+    for index, key in enumerate(keys, 1):
+        if key not in found:
+            # Numbered but not stored yet; later results wait so positions stay stable
+            break
+        indexed.append((index, found[key]))
+    return indexed
+
+
+def results(session_id):
+    """Results recorded so far, or None for an unknown or expired session."""
+    indexed = _indexed_results(session_id)
+    return None if indexed is None else [result for _, result in indexed]
+
+
+def add_result(session_id, result):
+    index = shared_locks.increment(_counter(session_id))
+    cache.set(_result_key(session_id, index), result, timeout=EVAL_SESSION_TIMEOUT)
+
+
+def _matches(result, model_id):
+    return str(result.get('model_id')) == str(model_id) or result.get('model_name') == model_id
+
+
+def update_response(session_id, model_id, content):
+    """Replace the response of model_id's result in the session; True if one matched."""
+    for index, result in _indexed_results(session_id) or []:
+        if _matches(result, model_id):
+            result['response'] = content
+            cache.set(_result_key(session_id, index), result, timeout=EVAL_SESSION_TIMEOUT)
+            return True
+    return False
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from eval.models import LLMJob, Project, TaskSyncConfig, TaskSyncHistory, TrainerTask
+
+
+class Command(BaseCommand):
+    help = 'Run the hot dashboard/job queries under EXPLAIN and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Exit with an error if any query does a full table scan',
+        )
+        parser.add_argument(
+            '--show-sql',
+            action='store_true',
+            help='Print the SQL of every audited statement',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query audit supports sqlite and postgresql, not {connection.vendor}.')
+
+        self.stdout.write(self.style.SUCCESS(f'=== Query Plan Audit ({connection.vendor}) ===\n'))
+        flagged = []
+        for label, run in self.hot_queries():
+            for sql, params in self.capture(run):
+                plan = self.explain(sql, params)
+                scans = [line for line in plan if self.is_full_scan(line)]
+                status = self.style.ERROR('✗ FULL SCAN') if scans else self.style.SUCCESS('✓ indexed')
+                self.stdout.write(f'{status}  {label}')
+                if options['show_sql']:
+                    self.stdout.write(f'    {sql}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                if scans:
+                    flagged.append(label)
+
+        self.stdout.write('')
+        if flagged:
+            message = f"{len(flagged)} statement(s) scan a whole table: {', '.join(sorted(set(flagged)))}"
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f'⚠ {message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All audited queries use an index.'))
+
+    def hot_queries(self):
+        """(label, callable) pairs mirroring the queries issued by views and job workers."""
+        now = timezone.now()
+        project_id = Project.objects.values_list('id', flat=True).first() or 0
+        config_id = TaskSyncConfig.objects.values_list('id', flat=True).first() or 0
+        user_id = User.objects.values_list('id', flat=True).first() or 0
+        question_id = TrainerTask.objects.values_list('question_id', flat=True).first() or 'q'
+
+        return [
+            ('trainer_question_analysis: task by question_id + project',
+             lambda: TrainerTask.objects.filter(question_id=question_id, project__id=project_id).first()),
+            ('review / model config: task by question_id',
+             lambda: TrainerTask.objects.filter(question_id=question_id).values_list('project_id', flat=True).first()),
+            ('trainer_dashboard: project tasks by updated_at',
+             lambda: list(TrainerTask.objects.filter(project__id=project_id).order_by('-updated_at')[:50])),
+            ('reviewer_dashboard: assigned reviewers',
+             lambda: list(TrainerTask.objects.filter(
+                 Q(reviewer__isnull=False) & Q(reviewer__gt='')).values_list('reviewer', flat=True).distinct())),
+            ('reviewer_dashboard: tasks by developer',
+             lambda: list(TrainerTask.objects.filter(developer__iexact='trainer')[:50])),
+            ('dashboards: completed count',
+             lambda: TrainerTask.objects.filter(completed__iexact='Completed').count()),
+            ('dashboards: project completed count',
+             lambda: TrainerTask.objects.filter(project__id=project_id, completed__iexact='Completed').count()),
+            ('job processor: pending queue',
+             lambda: list(LLMJob.objects.filter(status='pending').order_by('created_at')[:50])),
+            ('job processor: stuck detection',
+             lambda: list(LLMJob.objects.filter(status='processing', started_at__lt=now - timedelta(minutes=30)))),
+            ('job processor: recent failures',
+             lambda: list(LLMJob.objects.filter(status='failed', created_at__gte=now - timedelta(hours=1)))),
+            ('diagnostics: jobs per type',
+             lambda: list(LLMJob.objects.values('job_type').annotate(count=Count('job_type')))),
+            ('api: user job list',
+             lambda: list(LLMJob.objects.filter(user_id=user_id)[:20])),
+            ('task_sync_config: history per config',
+             lambda: list(TaskSyncHistory.objects.filter(config_id=config_id).order_by('-timestamp')[:20])),
+            ('task_sync_config: latest history',
+             lambda: list(TaskSyncHistory.objects.all().order_by('-timestamp')[:20])),
+        ]
+
+    def capture(self, run):
+        statements = []
+
+        def wrapper(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            run()
+        return statements
+
+    def explain(self, sql, params):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        # SQLite rows are (id, parent, notused, detail); PostgreSQL rows are one text column
+        return [str(row[-1]) for row in rows]
+
+    def is_full_scan(self, line):
+        if connection.vendor == 'sqlite':
+            # "SCAN t USING [COVERING] INDEX" walks an index, not the table
+            return line.startswith('SCAN ') and ' USING ' not in line
+        return 'Seq Scan' in line
@@ -4,6 +4,8 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from eval.models import LLMJob, LLMModel
+from eval.utils import circuit_breaker
+from eval.utils.deadlines import job_deadline
 from eval.utils.pubsub import publish_message
 import json
 
@@ -88,29 +90,44 @@ class Command(BaseCommand):
 
     def process_pending_jobs(self):
         """Automatically process pending jobs by republishing them to Pub/Sub"""
-        pending_jobs = LLMJob.objects.filter(status='pending').order_by('created_at')
+        pending_jobs = LLMJob.objects.filter(status='pending').select_related('user', 'model').defer('result_data').order_by('created_at')
         
         if not pending_jobs.exists():
             return
         
         processed_count = 0
+        held_back = 0
         for job in pending_jobs[:10]:  # Process up to 10 jobs per cycle
             try:
+                # CSV pipeline runs use the processor's own models, checked by the run itself
+                uses_model = job.job_type != 'csv_pipeline'
+
                 # Validate job has required data
-                if not job.model or not job.model.is_active:
+                if uses_model and (not job.model or not job.model.is_active):
                     job.mark_failed("Model not available or inactive")
                     continue
                 
-                if not job.model.api_key:
+                if uses_model and not job.model.api_key:
                     job.mark_failed("Model API key not configured")
                     continue
+
+                # Nothing is gained by sending a job that has no time left
+                deadline = job_deadline(job)
+                if deadline.expired():
+                    job.mark_failed(f"{deadline.label} deadline exceeded while pending")
+                    continue
+
+                # Leave the job pending while its provider is failing fast
+                if uses_model and circuit_breaker.is_open(job.model.provider, job.model.name):
+                    held_back += 1
+                    continue
                 
                 # Republish job to Pub/Sub for processing
                 message_data = {
                     "type": job.job_type,
                     "job_id": str(job.job_id),
                     "user_id": job.user.id if job.user else None,
-                    "model_id": job.model.id,
+                    "model_id": job.model_id,
                     **job.input_data
                 }
                 
@@ -127,6 +144,8 @@ class Command(BaseCommand):
         
         if processed_count > 0:
             self.stdout.write(f'  📤 Processed {processed_count} pending jobs')
+        if held_back > 0:
+            self.stdout.write(f'  ⏸ Held back {held_back} pending jobs for models with an open circuit')
 
     def fix_stuck_jobs(self):
         """Fix jobs that have been processing for too long"""
@@ -134,7 +153,7 @@ class Command(BaseCommand):
         stuck_jobs = LLMJob.objects.filter(
             status='processing',
             started_at__lt=stuck_cutoff
-        )
+        ).only('job_id', 'status', 'started_at')
         
         fixed_count = 0
         for job in stuck_jobs:
@@ -152,12 +171,20 @@ class Command(BaseCommand):
         failed_jobs = LLMJob.objects.filter(
             status='failed',
             completed_at__gte=timezone.now() - timedelta(hours=1)  # Only recent failures
-        )
+        ).select_related('model').defer('result_data')
         
         retried_count = 0
         for job in failed_jobs:
             # Check retry count in input_data
             retry_count = job.input_data.get('retry_count', 0)
+
+            # A retry keeps the job's original deadline; once it's spent the job stays failed
+            if job_deadline(job).expired():
+                continue
+
+            # Retrying into an open circuit would only fail again; wait until it closes
+            if job.model and circuit_breaker.is_open(job.model.provider, job.model.name):
+                continue
             
             if retry_count < max_retries:
                 # Check if failure is retryable
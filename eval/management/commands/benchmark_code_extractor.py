@@ -0,0 +1,70 @@
+import json
+import os
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eval.models import NotebookArtifact
+from eval.utils.code_extractor import extract_implementation, tokenize
+from eval.utils.drive import notebook_to_markdown
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark implementation-code extraction on sample notebooks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='.ipynb or markdown files to benchmark (default: stored notebook artifacts)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of stored notebook artifacts to use when no paths are given',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Extraction runs per sample',
+        )
+
+    def handle(self, *args, **options):
+        samples = self.load_samples(options['paths'], options['limit'])
+        if not samples:
+            raise CommandError('No sample notebooks found; pass .ipynb/.md paths or fetch some notebooks first.')
+
+        iterations = max(1, options['iterations'])
+        self.stdout.write(self.style.SUCCESS(f'=== Code extractor benchmark ({iterations} runs per sample) ===\n'))
+        self.stdout.write(f"{'sample':40} {'chars':>9} {'blocks':>7} {'language':>10} {'mean ms':>9} {'code chars':>11}")
+
+        total_chars = 0
+        total_seconds = 0.0
+        for name, content in samples:
+            _, blocks = tokenize(content)
+            code, language = extract_implementation(content)
+            seconds = timeit.timeit(lambda: extract_implementation(content), number=iterations) / iterations
+            total_chars += len(content)
+            total_seconds += seconds
+            self.stdout.write(
+                f"{name[:40]:40} {len(content):>9} {len(blocks):>7} {language:>10} {seconds * 1000:>9.3f} {len(code):>11}")
+
+        throughput = total_chars / total_seconds / 1_000_000 if total_seconds else 0
+        self.stdout.write(
+            f"\n{len(samples)} samples, mean {total_seconds / len(samples) * 1000:.3f} ms, {throughput:.1f} MB/s")
+
+    def load_samples(self, paths, limit):
+        samples = []
+        for path in paths:
+            if not os.path.exists(path):
+                raise CommandError(f'File not found: {path}')
+            with open(path, encoding='utf-8') as f:
+                raw = f.read()
+            content = notebook_to_markdown(json.loads(raw)) if path.endswith('.ipynb') else raw
+            samples.append((os.path.basename(path), content))
+        if not paths:
+            for artifact in NotebookArtifact.objects.only('content_hash', 'markdown')[:limit]:
+                samples.append((artifact.content_hash[:12], artifact.markdown))
+        return samples
@@ -0,0 +1,150 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, RequestFactory
+
+from coreproject.db_profiles import PROFILES, current_profile
+
+
+class Command(BaseCommand):
+    help = 'Measure request throughput against the active database profile, or compare several profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            choices=PROFILES,
+            help='Run the benchmark once per profile (each in a subprocess with DB_PROFILE set) and compare',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='URL path to request; repeat for several (default: /api/llm-models/ and /reports/)',
+        )
+        parser.add_argument(
+            '--username',
+            help='Log the benchmark requests in as this user (default: first superuser)',
+        )
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent request threads')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        if options['profiles']:
+            self.compare(options)
+            return
+
+        result = self.run_benchmark(options)
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+        self.stdout.write(self.style.SUCCESS(f"=== Database profile benchmark ({result['profile']}) ===\n"))
+        self.write_rows([result])
+
+    def compare(self, options):
+        results = []
+        for profile in options['profiles']:
+            command = [sys.executable, sys.argv[0], 'benchmark_db_profile', '--json',
+                       '--threads', str(options['threads']), '--requests', str(options['requests'])]
+            for path in options['paths'] or []:
+                command += ['--path', path]
+            if options['username']:
+                command += ['--username', options['username']]
+            completed = subprocess.run(
+                command, env={**os.environ, 'DB_PROFILE': profile}, capture_output=True, text=True)
+            if completed.returncode != 0:
+                self.stderr.write(self.style.ERROR(f"{profile}: {completed.stderr.strip().splitlines()[-1:]}"))
+                continue
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        if not results:
+            raise CommandError('No profile completed the benchmark.')
+        self.stdout.write(self.style.SUCCESS('=== Database profile comparison ===\n'))
+        self.write_rows(results)
+
+    def write_rows(self, results):
+        self.stdout.write(
+            f"{'profile':10} {'conn max age':>12} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for r in results:
+            self.stdout.write(
+                f"{r['profile']:10} {str(r['conn_max_age']):>12} {r['requests']:>9} {r['errors']:>7} "
+                f"{r['throughput']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+    def run_benchmark(self, options):
+        paths = options['paths'] or ['/api/llm-models/', '/reports/']
+        cookie = self.session_cookie(options['username'])
+        # Going through WSGIHandler fires request_started/request_finished, so
+        # connections are opened and closed exactly as under gunicorn
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        host = (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.').replace('*', 'localhost')
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            local_latencies = []
+            local_errors = 0
+            for i in range(options['requests']):
+                environ = factory._base_environ(
+                    PATH_INFO=paths[i % len(paths)], REQUEST_METHOD='GET', HTTP_COOKIE=cookie, SERVER_NAME=host,
+                    **{'wsgi.url_scheme': 'https'})
+                started = time.perf_counter()
+                status = []
+                response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+                try:
+                    for _ in response:
+                        pass
+                finally:
+                    response.close()
+                local_latencies.append(time.perf_counter() - started)
+                if not status or not status[0].startswith(('2', '3')):
+                    local_errors += 1
+            with lock:
+                latencies.extend(local_latencies)
+                errors.append(local_errors)
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, options['threads']))]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'profile': current_profile(),
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'requests': len(latencies),
+            'errors': sum(errors),
+            'seconds': elapsed,
+            'throughput': len(latencies) / elapsed if elapsed else 0,
+            'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        }
+
+    def session_cookie(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'User not found: {username}')
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+            if user is None:
+                raise CommandError('No superuser found; pass --username.')
+        client = Client()
+        client.force_login(user)
+        return '; '.join(f'{morsel.key}={morsel.value}' for morsel in client.cookies.values())
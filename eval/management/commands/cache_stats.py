@@ -0,0 +1,48 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from coreproject.cache_backends import StatsMixin
+
+
+class Command(BaseCommand):
+    help = 'Show cache hit/miss statistics per key namespace, summed over all processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the shared counters')
+        parser.add_argument('--json', action='store_true', help='Print the statistics as JSON')
+
+    def handle(self, *args, **options):
+        cache = caches['default']
+        if not isinstance(cache, StatsMixin):
+            raise CommandError(
+                f'{type(cache).__module__}.{type(cache).__name__} does not record statistics; '
+                'configure CACHES with coreproject.cache_profiles.')
+
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Cache statistics reset.'))
+            return
+
+        stats = cache.shared_stats()
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'=== Cache statistics ({type(cache).__name__}) ===\n'))
+        if not stats:
+            self.stdout.write('No cache lookups recorded yet.')
+            return
+
+        self.stdout.write(f"{'namespace':24} {'hits':>10} {'misses':>10} {'hit rate':>9}")
+        total_hits = total_misses = 0
+        for namespace, counts in sorted(stats.items(), key=lambda item: -sum(item[1].values())):
+            hits, misses = counts['hits'], counts['misses']
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(f"{namespace:24} {hits:>10} {misses:>10} {self.rate(hits, misses):>9}")
+        self.stdout.write(f"{'total':24} {total_hits:>10} {total_misses:>10} {self.rate(total_hits, total_misses):>9}")
+
+    def rate(self, hits, misses):
+        return f'{hits / (hits + misses) * 100:.1f}%' if hits + misses else '-'
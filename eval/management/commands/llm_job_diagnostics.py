@@ -2,9 +2,11 @@ import os
 import json
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count, Q
-from eval.models import LLMJob, LLMModel
+from datetime import datetime, timedelta
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Length
+from eval.models import LLMJob, LLMJobResult, LLMModel
+from eval.utils import circuit_breaker
 from django.conf import settings
 
 
@@ -84,9 +86,24 @@ class Command(BaseCommand):
         models_without_keys = LLMModel.objects.filter(is_active=True, api_key='').count()
         if models_without_keys > 0:
             self.stdout.write(self.style.WARNING(f'  ⚠ {models_without_keys} active models without API keys'))
+
+        self.show_circuit_breakers()
         
         self.stdout.write('')
 
+    def show_circuit_breakers(self):
+        breakers = [b for b in circuit_breaker.states() if b['state'] != circuit_breaker.CLOSED]
+        if not breakers:
+            self.stdout.write('  ✓ All provider circuits closed')
+            return
+        for b in breakers:
+            opened = datetime.fromtimestamp(b['opened_at']).strftime('%H:%M:%S')
+            line = (f"  ✗ Circuit {b['state'].replace('_', '-')} for {b['label']} since {opened}: "
+                    f"{b['failures']}/{b['calls']} calls failed")
+            if b['last_error']:
+                line += f" (last error: {b['last_error']})"
+            self.stdout.write(self.style.ERROR(line) if b['state'] == circuit_breaker.OPEN else self.style.WARNING(line))
+
     def show_job_statistics(self):
         self.stdout.write(self.style.HTTP_INFO('Job Statistics:'))
         
@@ -115,6 +132,14 @@ class Command(BaseCommand):
             count = type_data['count']
             self.stdout.write(f'    {job_type}: {count}')
         
+        # Large results stored compressed outside the job rows
+        blobs = LLMJobResult.objects.aggregate(
+            count=Count('job_id'), raw=Sum('raw_size'), stored=Sum(Length('data')))
+        if blobs['count']:
+            self.stdout.write(
+                f"  Stored results: {blobs['count']} "
+                f"({(blobs['stored'] or 0) / 1048576:.1f} MB compressed from {(blobs['raw'] or 0) / 1048576:.1f} MB)")
+        
         self.stdout.write('')
 
     def check_for_issues(self):
@@ -125,7 +150,7 @@ class Command(BaseCommand):
         stuck_jobs = LLMJob.objects.filter(
             status='processing',
             started_at__lt=stuck_cutoff
-        )
+        ).only('job_id', 'job_type', 'status', 'started_at')
         
         if stuck_jobs.exists():
             self.stdout.write(self.style.WARNING(f'  ⚠ {stuck_jobs.count()} jobs stuck in processing state (>30 min)'))
@@ -171,7 +196,7 @@ class Command(BaseCommand):
         recent_failures = LLMJob.objects.filter(
             status='failed',
             completed_at__gte=timezone.now() - timedelta(hours=24)
-        ).order_by('-completed_at')[:10]
+        ).select_related('user', 'model').defer('input_data', 'result_data').order_by('-completed_at')[:10]
         
         if not recent_failures.exists():
             self.stdout.write('  No recent failures found')
@@ -193,7 +218,7 @@ class Command(BaseCommand):
         stuck_jobs = LLMJob.objects.filter(
             status='processing',
             started_at__lt=stuck_cutoff
-        )
+        ).only('job_id', 'job_type', 'status', 'started_at')
         
         count = 0
         for job in stuck_jobs:
@@ -0,0 +1,76 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from eval.models import LLMUsageDaily
+
+SUMMED = ('records', 'errors', 'llm_calls', 'input_tokens', 'output_tokens',
+          'cache_read_tokens', 'cache_write_tokens', 'llm_latency', 'llm_cost')
+
+GROUPINGS = {
+    'model': ('model_name', 'provider'),
+    'project': ('project__code',),
+    'day': ('date',),
+}
+
+
+class Command(BaseCommand):
+    help = 'Show LLM throughput and cost per model, per project and per day from the daily usage totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Days to include, today included (default: 7)')
+        parser.add_argument('--by', choices=sorted(GROUPINGS), action='append',
+                            help='Only show these tables (repeatable; default: all)')
+        parser.add_argument('--source', choices=[c[0] for c in LLMUsageDaily.SOURCE_CHOICES],
+                            help='Only count one kind of work')
+        parser.add_argument('--json', action='store_true', help='Print the tables as JSON')
+
+    def handle(self, *args, **options):
+        since = timezone.localdate() - timedelta(days=options['days'] - 1)
+        rows = LLMUsageDaily.objects.filter(date__gte=since)
+        if options['source']:
+            rows = rows.filter(source=options['source'])
+
+        tables = {}
+        for name in options['by'] or ['model', 'project', 'day']:
+            keys = GROUPINGS[name]
+            tables[name] = list(
+                rows.values(*keys).annotate(**{f: Sum(f) for f in SUMMED}).order_by(*keys))
+
+        if options['json']:
+            self.stdout.write(json.dumps(tables, default=str))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'=== LLM usage since {since} ===\n'))
+        if not rows.exists():
+            self.stdout.write('No LLM usage recorded in this period.')
+            return
+        for name, table in tables.items():
+            self.write_table(name, table)
+
+    def write_table(self, name, table):
+        self.stdout.write(self.style.HTTP_INFO(f'Per {name}:'))
+        self.stdout.write(
+            f"{name:32} {'records':>8} {'errors':>7} {'calls':>7} {'in tok':>11} {'out tok':>11} "
+            f"{'cached':>7} {'avg s':>7} {'out tok/s':>9} {'cost $':>11}")
+        for row in sorted(table, key=lambda r: -(r['llm_cost'] or 0)):
+            label = self.label(name, row)
+            prompt_tokens = row['input_tokens'] + row['cache_read_tokens'] + row['cache_write_tokens']
+            cached = f"{row['cache_read_tokens'] / prompt_tokens * 100:.0f}%" if prompt_tokens else '-'
+            avg_latency = f"{row['llm_latency'] / row['records']:.1f}" if row['records'] else '-'
+            throughput = f"{row['output_tokens'] / row['llm_latency']:.0f}" if row['llm_latency'] else '-'
+            self.stdout.write(
+                f"{label[:32]:32} {row['records']:>8} {row['errors']:>7} {row['llm_calls']:>7} "
+                f"{row['input_tokens']:>11} {row['output_tokens']:>11} {cached:>7} {avg_latency:>7} "
+                f"{throughput:>9} {row['llm_cost']:>11.4f}")
+        self.stdout.write('')
+
+    def label(self, name, row):
+        if name == 'model':
+            return f"{row['model_name']} ({row['provider']})" if row['provider'] else row['model_name']
+        if name == 'project':
+            return row['project__code'] or '(no project)'
+        return str(row['date'])
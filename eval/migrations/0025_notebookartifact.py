@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0024_add_unique_constraint_trainer_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotebookArtifact',
+            fields=[
+                ('content_hash', models.CharField(help_text='SHA-256 of the notebook markdown', max_length=64, primary_key=True, serialize=False)),
+                ('markdown', models.TextField(help_text='Notebook rendered as markdown with fenced code cells')),
+                ('implementation_code', models.TextField(blank=True, default='')),
+                ('language', models.CharField(default='unknown', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
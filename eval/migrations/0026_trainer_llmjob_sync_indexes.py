@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-19 13:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Case-insensitive indexes for the completed__iexact / developer__iexact
+# dashboard filters. Django compiles iexact to LIKE on SQLite (served by a
+# NOCASE index) and to UPPER(col) = UPPER(%s) on PostgreSQL.
+CASE_INSENSITIVE_INDEXES = (
+    ('eval_traine_complet_ci_idx', 'completed'),
+    ('eval_traine_develop_ci_idx', 'developer'),
+)
+
+
+def create_case_insensitive_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name, column in CASE_INSENSITIVE_INDEXES:
+        if vendor == 'sqlite':
+            expression = f'"{column}" COLLATE NOCASE'
+        elif vendor == 'postgresql':
+            expression = f'UPPER("{column}")'
+        else:
+            continue
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "eval_trainertask" ({expression})')
+
+
+def drop_case_insensitive_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for name, _ in CASE_INSENSITIVE_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0025_notebookartifact'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='llmjob',
+            name='eval_llmjob_status_f19eba_idx',
+        ),
+        migrations.AddIndex(
+            model_name='llmjob',
+            index=models.Index(fields=['status', 'created_at'], name='eval_llmjob_status_50632f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='llmjob',
+            index=models.Index(fields=['status', 'started_at'], name='eval_llmjob_status_890f97_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='llmjob',
+            index=models.Index(fields=['job_type', 'created_at'], name='eval_llmjob_job_typ_e09e2e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasksynchistory',
+            index=models.Index(fields=['config', 'timestamp'], name='eval_tasksy_config__3ec2cc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasksynchistory',
+            index=models.Index(fields=['timestamp'], name='eval_tasksy_timesta_5b095f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainertask',
+            index=models.Index(fields=['question_id'], name='eval_traine_questio_1e086c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainertask',
+            index=models.Index(fields=['project', 'updated_at'], name='eval_traine_project_15eebe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainertask',
+            index=models.Index(fields=['project', 'completed'], name='eval_traine_project_3b871d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainertask',
+            index=models.Index(fields=['reviewer'], name='eval_traine_reviewe_934504_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainertask',
+            index=models.Index(fields=['developer'], name='eval_traine_develop_a0e440_idx'),
+        ),
+        migrations.RunPython(create_case_insensitive_indexes, drop_case_insensitive_indexes),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-19 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from eval.utils.result_storage import GZIP, decode_result, encode_result, should_inline
+
+
+def move_large_results(apps, schema_editor):
+    LLMJob = apps.get_model('eval', 'LLMJob')
+    LLMJobResult = apps.get_model('eval', 'LLMJobResult')
+    # Collect ids first so rows aren't updated under an open cursor
+    job_ids = list(LLMJob.objects.filter(status='completed').values_list('job_id', flat=True))
+    for job_id in job_ids:
+        result_data = LLMJob.objects.filter(job_id=job_id).values_list('result_data', flat=True).first()
+        raw, compressed = encode_result(result_data)
+        if should_inline(raw):
+            continue
+        LLMJobResult.objects.update_or_create(
+            job_id=job_id, defaults={'encoding': GZIP, 'data': compressed, 'raw_size': len(raw)})
+        LLMJob.objects.filter(job_id=job_id).update(result_data={}, result_external=True)
+
+
+def restore_inline_results(apps, schema_editor):
+    LLMJob = apps.get_model('eval', 'LLMJob')
+    LLMJobResult = apps.get_model('eval', 'LLMJobResult')
+    for blob in list(LLMJobResult.objects.all()):
+        LLMJob.objects.filter(job_id=blob.job_id).update(
+            result_data=decode_result(blob.encoding, blob.data), result_external=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0026_trainer_llmjob_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMJobResult',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result_blob', serialize=False, to='eval.llmjob')),
+                ('encoding', models.CharField(default='gzip', max_length=10)),
+                ('data', models.BinaryField()),
+                ('raw_size', models.PositiveIntegerField(default=0, help_text='Size of the uncompressed JSON in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='result_external',
+            field=models.BooleanField(default=False, help_text='Results are stored compressed in LLMJobResult'),
+        ),
+        migrations.AlterField(
+            model_name='llmjob',
+            name='result_data',
+            field=models.JSONField(blank=True, default=dict, help_text='Output results from the job (small results only)'),
+        ),
+        migrations.RunPython(move_large_results, restore_inline_results),
+    ]
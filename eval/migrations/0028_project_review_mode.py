@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0027_llmjob_result_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='review_mode',
+            field=models.CharField(choices=[('separate', 'One request per criterion'), ('combined', 'One structured request for all criteria')], default='separate', help_text="How Colab reviews run the enabled criteria. Combined mode sends the notebook once and falls back to one request per criterion if the model's JSON output is invalid.", max_length=20),
+        ),
+    ]
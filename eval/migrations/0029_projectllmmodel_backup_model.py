@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0028_project_review_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectllmmodel',
+            name='backup_model',
+            field=models.ForeignKey(blank=True, help_text='Model to send a duplicate request to when this one is slow to start answering (optional)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='backup_for_links', to='eval.llmmodel'),
+        ),
+    ]
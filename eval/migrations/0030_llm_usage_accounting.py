@@ -0,0 +1,152 @@
+# Generated by Django 5.2 on 2026-10-19 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0029_projectllmmodel_backup_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('model_name', models.CharField(max_length=255)),
+                ('provider', models.CharField(blank=True, max_length=20)),
+                ('source', models.CharField(choices=[('job', 'LLM job'), ('evaluation', 'Model evaluation'), ('analysis', 'Notebook analysis')], max_length=20)),
+                ('records', models.PositiveIntegerField(default=0, help_text='Jobs, evaluations or analyses')),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('llm_calls', models.PositiveIntegerField(default=0)),
+                ('input_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+                ('cache_read_tokens', models.BigIntegerField(default=0)),
+                ('cache_write_tokens', models.BigIntegerField(default=0)),
+                ('llm_latency', models.FloatField(default=0, help_text='Seconds')),
+                ('llm_cost', models.DecimalField(decimal_places=6, default=0, help_text='USD, for models with prices', max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'LLM Usage (daily)',
+                'verbose_name_plural': 'LLM Usage (daily)',
+                'ordering': ['-date', 'model_name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='cache_read_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='cache_write_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Prompt tokens not served from cache', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='llm_calls',
+            field=models.PositiveIntegerField(blank=True, help_text='Provider requests, incl. continuations', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='llm_cost',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='llm_latency',
+            field=models.FloatField(blank=True, help_text='Seconds spent waiting for the LLM', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='output_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='stop_reason',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='llmjob',
+            name='time_to_first_token',
+            field=models.FloatField(blank=True, help_text='Seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmmodel',
+            name='cached_input_token_price',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text="USD per million prompt tokens read from the provider's cache. Blank uses the input price.", max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmmodel',
+            name='input_token_price',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='USD per million uncached prompt tokens', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmmodel',
+            name='output_token_price',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='USD per million completion tokens', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='cache_read_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='cache_write_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Prompt tokens not served from cache', null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='llm_calls',
+            field=models.PositiveIntegerField(blank=True, help_text='Provider requests, incl. continuations', null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='llm_cost',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='llm_latency',
+            field=models.FloatField(blank=True, help_text='Seconds spent waiting for the LLM', null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='output_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='stop_reason',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='modelevaluationhistory',
+            name='time_to_first_token',
+            field=models.FloatField(blank=True, help_text='Seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmusagedaily',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='eval.project'),
+        ),
+        migrations.AddIndex(
+            model_name='llmusagedaily',
+            index=models.Index(fields=['date', 'model_name'], name='eval_llmusa_date_6d159c_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eval', '0031_shared_locks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llmjob',
+            name='job_type',
+            field=models.CharField(choices=[('trainer_question_analysis', 'Trainer Question Analysis'), ('review_colab', 'Review Colab'), ('general_llm_request', 'General LLM Request'), ('csv_pipeline', 'CSV Pipeline Run')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,161 @@
+"""
+Resolved LLM model configuration per (project, model).
+
+ProjectLLMModel rows override the API key, temperature, max_tokens and
+streaming flag of an LLMModel for one project. Jobs used to re-run those
+lookups every time; resolve_model_config() does it once and keeps an
+immutable record in memory until a signal reports a change (see eval.signals).
+Changes are also announced through a version in the shared cache, the way
+eval.catalog does it, so a rotated API key or a model taken out of a project
+reaches the other web workers and process_llm_jobs within
+CATALOG_VERSION_CHECK_INTERVAL seconds.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+from .catalog import bump_shared_version, shared_version
+
+MODEL_CONFIG_CACHE_TIMEOUT = getattr(settings, 'MODEL_CONFIG_CACHE_TIMEOUT', 300)
+
+# Names of the shared versions
+MODEL_CONFIGS = 'model_configs'
+QUESTION_PROJECTS = 'question_projects'
+
+_configs = {}
+_question_projects = {}
+_version = 0
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ResolvedModelConfig:
+    model_id: int
+    name: str
+    provider: str
+    api_key: str
+    temperature: float
+    max_tokens: Optional[int]
+    use_streaming: bool
+    project_id: Optional[int] = None
+    # Whether users may submit jobs for this model in this project
+    selectable: bool = True
+    # Model that gets a hedged duplicate request when this one is slow to answer
+    backup_model_id: Optional[int] = None
+
+    @property
+    def id(self):
+        # Lets the record stand in for an LLMModel in call_llm_api
+        return self.model_id
+
+    def effective_temperature(self, requested=None):
+        return self.temperature if requested is None else requested
+
+    def client(self, hedged=True, deadline=None):
+        """
+        AI client for this config; with a backup model it hedges slow requests
+        (see eval.utils.hedging). deadline (eval.utils.deadlines) bounds the
+        requests of both.
+        """
+        from eval.utils import hedging
+        from eval.utils.ai_client import get_ai_client
+        client = get_ai_client(self.provider, self.api_key, self.name, self, deadline=deadline)
+        if hedged and self.backup_model_id and hedging.LLM_HEDGING and self.backup_model_id != self.model_id:
+            backup = resolve_model_config(self.backup_model_id, self.project_id)
+            client.backup_client = backup.client(hedged=False, deadline=deadline)
+        return client
+
+
+def invalidate_model_configs():
+    global _version
+    with _lock:
+        _version += 1
+        _configs.clear()
+    bump_shared_version(MODEL_CONFIGS)
+
+
+def forget_question_project(question_id):
+    with _lock:
+        _question_projects.pop(str(question_id), None)
+    # Other processes drop every question's project; they are cheap to look up again
+    bump_shared_version(QUESTION_PROJECTS)
+
+
+def _build(model_id, project_id):
+    from eval.models import LLMModel, ProjectLLMModel
+
+    model = LLMModel.objects.get(id=model_id)
+    if not project_id:
+        return ResolvedModelConfig(
+            model_id=model.id,
+            name=model.name,
+            provider=model.provider,
+            api_key=model.api_key,
+            temperature=model.temperature,
+            max_tokens=model.max_tokens,
+            use_streaming=model.use_streaming,
+            selectable=model.is_active,
+        )
+
+    links = list(ProjectLLMModel.objects.filter(project_id=project_id, llm_model_id=model.id, is_active=True)[:1])
+    link = links[0] if links else None
+    if link is not None:
+        selectable = True
+    else:
+        # Projects with tied models only allow those; otherwise any active model
+        selectable = model.is_active and not ProjectLLMModel.objects.filter(project_id=project_id).exists()
+    return ResolvedModelConfig(
+        model_id=model.id,
+        name=model.name,
+        provider=model.provider,
+        api_key=(link.api_key if link and link.api_key else model.api_key),
+        temperature=(link.temperature if link and link.temperature is not None else model.temperature),
+        max_tokens=(link.max_tokens if link and link.max_tokens else model.max_tokens),
+        use_streaming=(link.use_streaming if link else model.use_streaming),
+        project_id=int(project_id),
+        selectable=selectable,
+        backup_model_id=(link.backup_model_id if link else None),
+    )
+
+
+def resolve_model_config(model_id, project_id=None):
+    """
+    Return the ResolvedModelConfig for model_id within project_id.
+
+    Raises LLMModel.DoesNotExist when the model is unknown.
+    """
+    key = (str(project_id) if project_id else None, str(model_id))
+    now = time.monotonic()
+    shared = shared_version(MODEL_CONFIGS, now)
+    with _lock:
+        version = (_version, shared)
+        entry = _configs.get(key)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+    config = _build(model_id, project_id)
+    with _lock:
+        # Only store if nothing was invalidated while building
+        if _version == version[0]:
+            _configs[key] = (version, now + MODEL_CONFIG_CACHE_TIMEOUT, config)
+    return config
+
+
+def project_id_for_question(question_id):
+    """Project of the TrainerTask with question_id, or None."""
+    if not question_id:
+        return None
+    key = str(question_id)
+    now = time.monotonic()
+    shared = shared_version(QUESTION_PROJECTS, now)
+    with _lock:
+        entry = _question_projects.get(key)
+        if entry and entry[0] == shared and entry[1] > now:
+            return entry[2]
+    from eval.models import TrainerTask
+    project_id = TrainerTask.objects.filter(question_id=question_id).values_list('project_id', flat=True).first()
+    with _lock:
+        _question_projects[key] = (shared, now + MODEL_CONFIG_CACHE_TIMEOUT, project_id)
+    return project_id
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 import uuid
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -23,10 +23,48 @@ class LLMModel(models.Model):
     use_streaming = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
     is_default = models.BooleanField(default=False, help_text="Use as default model when no project-specific model is set.")
+    # Prices for cost accounting (eval.utils.usage_accounting); blank leaves costs unknown
+    input_token_price = models.DecimalField(
+        max_digits=10, decimal_places=4, null=True, blank=True,
+        help_text="USD per million uncached prompt tokens")
+    output_token_price = models.DecimalField(
+        max_digits=10, decimal_places=4, null=True, blank=True,
+        help_text="USD per million completion tokens")
+    cached_input_token_price = models.DecimalField(
+        max_digits=10, decimal_places=4, null=True, blank=True,
+        help_text="USD per million prompt tokens read from the provider's cache. Blank uses the input price.")
 
     def __str__(self):
         return f"{self.name} ({self.get_provider_display()})"
 
+
+class LLMUsageStats(models.Model):
+    """Token usage, timing and cost of the LLM calls behind a record."""
+
+    USAGE_FIELDS = (
+        'input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens', 'llm_calls',
+        'stop_reason', 'time_to_first_token', 'llm_latency', 'llm_cost',
+    )
+
+    input_tokens = models.PositiveIntegerField(null=True, blank=True, help_text="Prompt tokens not served from cache")
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
+    cache_read_tokens = models.PositiveIntegerField(null=True, blank=True)
+    cache_write_tokens = models.PositiveIntegerField(null=True, blank=True)
+    llm_calls = models.PositiveIntegerField(null=True, blank=True, help_text="Provider requests, incl. continuations")
+    stop_reason = models.CharField(max_length=50, blank=True, default='')
+    time_to_first_token = models.FloatField(null=True, blank=True, help_text="Seconds")
+    llm_latency = models.FloatField(null=True, blank=True, help_text="Seconds spent waiting for the LLM")
+    llm_cost = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True, help_text="USD")
+
+    class Meta:
+        abstract = True
+
+    def save_usage_stats(self, stats):
+        """Set the fields from eval.utils.usage_accounting.usage_stats() and save only those."""
+        for name, value in stats.items():
+            setattr(self, name, value)
+        self.save(update_fields=list(stats))
+
 class StreamAndSubject(models.Model):
     """
     Model representing a Stream and Subject category for system messages
@@ -125,7 +163,7 @@ class Coherence(models.Model):
     def __str__(self):
         return f"Coherence analysis by {self.username} on {self.created_at}"
 
-class ModelEvaluationHistory(models.Model):
+class ModelEvaluationHistory(LLMUsageStats):
     evaluation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     model_name = models.CharField(max_length=100)
     prompt = models.TextField()
@@ -264,11 +302,28 @@ class TaskSyncHistory(models.Model):
     def __str__(self):
         return f"{self.timestamp} - {self.status} - {self.summary}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['config', 'timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
+
 class Project(models.Model):
+    REVIEW_SEPARATE = 'separate'
+    REVIEW_COMBINED = 'combined'
+    REVIEW_MODE_CHOICES = [
+        (REVIEW_SEPARATE, 'One request per criterion'),
+        (REVIEW_COMBINED, 'One structured request for all criteria'),
+    ]
+
     code = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    review_mode = models.CharField(
+        max_length=20, choices=REVIEW_MODE_CHOICES, default=REVIEW_SEPARATE,
+        help_text="How Colab reviews run the enabled criteria. Combined mode sends the notebook once and "
+                  "falls back to one request per criterion if the model's JSON output is invalid.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -326,6 +381,17 @@ class TrainerTask(models.Model):
                 self.dynamic_fields = {}
             self.dynamic_fields[field_name] = value
 
+    class Meta:
+        # completed__iexact / developer__iexact are served by case-insensitive
+        # expression indexes created in migration 0026 (vendor specific SQL)
+        indexes = [
+            models.Index(fields=['question_id']),
+            models.Index(fields=['project', 'updated_at']),
+            models.Index(fields=['project', 'completed']),
+            models.Index(fields=['reviewer']),
+            models.Index(fields=['developer']),
+        ]
+
 class UserPreference(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='preference')
     streams_and_subjects = models.ManyToManyField(StreamAndSubject, blank=True)
@@ -335,7 +401,7 @@ class UserPreference(models.Model):
         return f"Preferences for {self.user.username}"
 
 
-class LLMJob(models.Model):
+class LLMJob(LLMUsageStats):
     """Model to track LLM processing jobs submitted via Pub/Sub"""
     
     STATUS_CHOICES = [
@@ -349,6 +415,7 @@ class LLMJob(models.Model):
         ('trainer_question_analysis', 'Trainer Question Analysis'),
         ('review_colab', 'Review Colab'),
         ('general_llm_request', 'General LLM Request'),
+        ('csv_pipeline', 'CSV Pipeline Run'),
     ]
     
     job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -361,7 +428,8 @@ class LLMJob(models.Model):
     input_data = models.JSONField(default=dict, help_text="Input parameters for the job")
     
     # Results
-    result_data = models.JSONField(default=dict, blank=True, help_text="Output results from the job")
+    result_data = models.JSONField(default=dict, blank=True, help_text="Output results from the job (small results only)")
+    result_external = models.BooleanField(default=False, help_text="Results are stored compressed in LLMJobResult")
     error_message = models.TextField(blank=True, null=True)
     
     # Metadata
@@ -379,21 +447,55 @@ class LLMJob(models.Model):
         """Mark job as processing"""
         self.status = 'processing'
         self.started_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'started_at'])
     
     def mark_completed(self, result_data):
         """Mark job as completed with results"""
         self.status = 'completed'
         self.completed_at = timezone.now()
-        self.result_data = result_data
-        self.save()
+        with transaction.atomic():
+            self.set_result(result_data)
+            self.save(update_fields=['status', 'completed_at', 'result_data', 'result_external'])
+
+    def set_result(self, result):
+        """Store result inline if small, otherwise compressed in LLMJobResult. Caller saves the job."""
+        from eval.utils.result_storage import GZIP, encode_result, should_inline
+
+        raw, compressed = encode_result(result)
+        if should_inline(raw):
+            if self.result_external:
+                LLMJobResult.objects.filter(job_id=self.pk).delete()
+            self.result_data = result
+            self.result_external = False
+        else:
+            LLMJobResult.objects.update_or_create(job_id=self.pk, defaults={
+                'encoding': GZIP,
+                'data': compressed,
+                'raw_size': len(raw),
+            })
+            self.result_data = {}
+            self.result_external = True
+        self._result_cache = result
+
+    @property
+    def result(self):
+        """Job output, decompressed from LLMJobResult when stored externally"""
+        if hasattr(self, '_result_cache'):
+            return self._result_cache
+        if not self.result_external:
+            return self.result_data
+        try:
+            self._result_cache = self.result_blob.load()
+        except LLMJobResult.DoesNotExist:
+            self._result_cache = {}
+        return self._result_cache
     
     def mark_failed(self, error_message):
         """Mark job as failed with error message"""
         self.status = 'failed'
         self.completed_at = timezone.now()
         self.error_message = error_message
-        self.save()
+        self.save(update_fields=['status', 'completed_at', 'error_message'])
     
     @property
     def is_complete(self):
@@ -411,11 +513,43 @@ class LLMJob(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['job_id']),
-            models.Index(fields=['status']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'started_at']),
+            models.Index(fields=['job_type', 'created_at']),
             models.Index(fields=['user', 'created_at']),
         ]
 
 
+class LLMJobResult(models.Model):
+    """Compressed output of an LLMJob too large to keep on the job row"""
+
+    job = models.OneToOneField(LLMJob, on_delete=models.CASCADE, primary_key=True, related_name='result_blob')
+    encoding = models.CharField(max_length=10, default='gzip')
+    data = models.BinaryField()
+    raw_size = models.PositiveIntegerField(default=0, help_text="Size of the uncompressed JSON in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Result for {self.job_id} ({self.raw_size} bytes)"
+
+    def load(self):
+        from eval.utils.result_storage import decode_result
+        return decode_result(self.encoding, self.data)
+
+
+class NotebookArtifact(models.Model):
+    """Normalized Colab notebook shared by every review job on the same content"""
+
+    content_hash = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the notebook markdown")
+    markdown = models.TextField(help_text="Notebook rendered as markdown with fenced code cells")
+    implementation_code = models.TextField(blank=True, default='')
+    language = models.CharField(max_length=20, default='unknown')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Notebook {self.content_hash[:12]} ({self.language})"
+
+
 class UserActivitySession(models.Model):
     """
     Privacy-first activity tracking for personal productivity insights.
@@ -460,14 +594,17 @@ class UserActivitySession(models.Model):
             self.session_end = timezone.now()
             self.total_time_minutes = int((self.session_end - self.session_start).total_seconds() / 60)
             self.is_active = False
-            self.save()
+            self.save(update_fields=['session_end', 'total_time_minutes', 'is_active'])
     
     def add_interaction(self, interaction_type='general'):
-        """Record a user interaction (click, scroll, etc.)"""
-        self.page_interactions += 1
+        """Record a user interaction (click, scroll, etc.); written by the activity write buffer"""
+        from eval.utils.write_buffer import activity_buffer
+        counters = {'page_interactions': 1}
         if interaction_type == 'llm_query':
-            self.llm_queries_count += 1
-        self.save()
+            counters['llm_queries_count'] = 1
+        for field, amount in counters.items():
+            setattr(self, field, getattr(self, field) + amount)
+        activity_buffer.increment(self.session_id, **counters)
     
     @property
     def engagement_score(self):
@@ -601,6 +738,9 @@ class ProjectLLMModel(models.Model):
     api_key = models.CharField(max_length=255, blank=True, null=True, help_text="Override API key for this project (optional)")
     is_active = models.BooleanField(default=True, help_text="Is this model active for this project?")
     description = models.TextField(blank=True, null=True, help_text="Project-specific description (optional)")
+    backup_model = models.ForeignKey(
+        LLMModel, on_delete=models.SET_NULL, null=True, blank=True, related_name='backup_for_links',
+        help_text="Model to send a duplicate request to when this one is slow to start answering (optional)")
 
     class Meta:
         unique_together = ('project', 'llm_model')
@@ -635,3 +775,69 @@ class ProjectCriteria(models.Model):
             models.Index(fields=['project', 'is_enabled']),
             models.Index(fields=['validation', 'is_enabled']),
         ]
+
+
+class LLMUsageDaily(models.Model):
+    """
+    LLM usage totals per day, model, project and source, kept up to date by
+    eval.utils.usage_accounting.add_daily_usage(). Two workers adding the
+    first totals of a day at once may create two rows for the same key; every
+    report sums over the rows, so totals stay correct.
+    """
+    SOURCE_CHOICES = [
+        ('job', 'LLM job'),
+        ('evaluation', 'Model evaluation'),
+        ('analysis', 'Notebook analysis'),
+    ]
+
+    date = models.DateField()
+    model_name = models.CharField(max_length=255)
+    provider = models.CharField(max_length=20, blank=True)
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    records = models.PositiveIntegerField(default=0, help_text="Jobs, evaluations or analyses")
+    errors = models.PositiveIntegerField(default=0)
+    llm_calls = models.PositiveIntegerField(default=0)
+    input_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+    cache_read_tokens = models.BigIntegerField(default=0)
+    cache_write_tokens = models.BigIntegerField(default=0)
+    llm_latency = models.FloatField(default=0, help_text="Seconds")
+    llm_cost = models.DecimalField(max_digits=14, decimal_places=6, default=0, help_text="USD, for models with prices")
+
+    def __str__(self):
+        return f"{self.date} {self.model_name} ({self.source})"
+
+    class Meta:
+        verbose_name = "LLM Usage (daily)"
+        verbose_name_plural = "LLM Usage (daily)"
+        ordering = ['-date', 'model_name']
+        indexes = [
+            models.Index(fields=['date', 'model_name']),
+        ]
+
+
+class SharedLock(models.Model):
+    """
+    A named lock held by one process at a time until it expires; see
+    eval.utils.shared_locks. Only one insert of a name can succeed, which the
+    shared cache's add() does not guarantee on every backend.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    token = models.CharField(max_length=32)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.name} until {self.expires_at}"
+
+
+class SharedCounter(models.Model):
+    """A named counter incremented atomically by any process; see eval.utils.shared_locks."""
+
+    name = models.CharField(max_length=255, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 import json
 from .models import Response, ModelEvaluationHistory
+from . import eval_sessions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -87,18 +88,9 @@ def save_edited_response(request):
                 logger.warning(f"Could not find response {response_id} in database")
                 # Continue anyway - we'll update the session data
         
-        # If we have a session ID, update the in-memory session data too
+        # If we have a session ID, update the shared session results too
         if session_id:
-            # This would depend on how you're storing session data
-            # For example, if using Redis or a similar cache:
-            # from django.core.cache import cache
-            # session_data = cache.get(f"eval_session_{session_id}")
-            # if session_data and 'results' in session_data:
-            #     for result in session_data['results']:
-            #         if result.get('id') == response_id:
-            #             result['response'] = edited_content
-            #             cache.set(f"eval_session_{session_id}", session_data)
-            pass
+            eval_sessions.update_response(session_id, model_id, edited_content)
         
         return JsonResponse({
             'success': True, 
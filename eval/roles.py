@@ -0,0 +1,67 @@
+"""
+Role resolution shared by views, decorators and context processors.
+
+A user's role is computed from a single groups query, memoized on the user
+object for the rest of the request and cached across requests for a short
+time. Group membership changes invalidate the cached role (see eval.signals).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+ROLE_CACHE_TIMEOUT = getattr(settings, 'USER_ROLE_CACHE_TIMEOUT', 300)
+# Roles by precedence; the first group the user belongs to wins
+ROLE_GROUPS = ('admin', 'pod_lead', 'trainer')
+
+_MEMO_ATTR = '_eval_role'
+_NO_ROLE = ''
+_VERSION_KEY = 'user_role_version'
+
+
+def _cache_key(user_id):
+    # Bumping the version drops every cached role at once, e.g. when a group is renamed
+    return f"user_role_{cache.get_or_set(_VERSION_KEY, time.time_ns, timeout=None)}_{user_id}"
+
+
+def role_from_groups(user, group_names):
+    if user.is_superuser or user.is_staff or 'admin' in group_names:
+        return 'admin'
+    for role in ROLE_GROUPS[1:]:
+        if role in group_names:
+            return role
+    return None
+
+
+def resolve_user_role(user):
+    """Return 'admin', 'pod_lead', 'trainer' or None for user."""
+    if not user.is_authenticated:
+        return None
+    memo = getattr(user, _MEMO_ATTR, None)
+    if memo is not None:
+        return memo or None
+
+    key = _cache_key(user.pk)
+    role = cache.get(key)
+    if role is None:
+        group_names = set(user.groups.filter(name__in=ROLE_GROUPS).values_list('name', flat=True))
+        role = role_from_groups(user, group_names) or _NO_ROLE
+        cache.set(key, role, timeout=ROLE_CACHE_TIMEOUT)
+    setattr(user, _MEMO_ATTR, role)
+    return role or None
+
+
+def invalidate_user_role(user_ids, instance=None):
+    """Forget cached roles after group membership or staff flags change."""
+    for user_id in user_ids:
+        cache.delete(_cache_key(user_id))
+    if instance is not None:
+        instance.__dict__.pop(_MEMO_ATTR, None)
+
+
+def invalidate_all_roles():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        # The version key was evicted; any fresh value is newer than the cached roles
+        cache.set(_VERSION_KEY, time.time_ns(), timeout=None)
@@ -1,7 +1,15 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.contrib.auth.models import User, Group
 from django.dispatch import receiver
 
+from eval import catalog
+from eval.catalog import invalidate_catalog, invalidate_preferred_streams
+from eval.model_config import forget_question_project, invalidate_model_configs
+from eval.models import (
+    LLMModel, Project, ProjectLLMModel, StreamAndSubject, SystemMessage, TrainerTask, UserPreference,
+)
+from eval.roles import invalidate_all_roles, invalidate_user_role
+
 @receiver(post_save, sender=User)
 def add_user_to_trainer_group(sender, instance, created, **kwargs):
     """
@@ -10,3 +18,64 @@ def add_user_to_trainer_group(sender, instance, created, **kwargs):
     if created:
         group, _ = Group.objects.get_or_create(name='trainer')
         instance.groups.add(group)
+    else:
+        # is_staff / is_superuser feed into the role as well
+        invalidate_user_role([instance.pk], instance)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_role_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached roles when group membership changes, from either side of the relation.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user_role([instance.pk], instance)
+    elif pk_set:
+        invalidate_user_role(pk_set)
+    else:
+        # group.user_set.clear() does not report which users were removed
+        invalidate_all_roles()
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_roles_on_group_edit(sender, **kwargs):
+    invalidate_all_roles()
+
+@receiver([post_save, post_delete], sender=StreamAndSubject)
+def invalidate_streams_catalog(sender, **kwargs):
+    invalidate_catalog(catalog.STREAMS)
+    # System messages are cached with their category
+    invalidate_catalog(catalog.SYSTEM_MESSAGES)
+
+@receiver([post_save, post_delete], sender=SystemMessage)
+def invalidate_system_messages_catalog(sender, **kwargs):
+    invalidate_catalog(catalog.SYSTEM_MESSAGES)
+
+@receiver([post_save, post_delete], sender=LLMModel)
+def invalidate_llm_models_catalog(sender, **kwargs):
+    invalidate_catalog(catalog.LLM_MODELS)
+
+@receiver(m2m_changed, sender=UserPreference.streams_and_subjects.through)
+def invalidate_preferred_streams_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_preferred_streams(instance.user_id)
+    elif pk_set:
+        for user_id in UserPreference.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+            invalidate_preferred_streams(user_id)
+
+@receiver(post_delete, sender=UserPreference)
+def invalidate_preferred_streams_on_delete(sender, instance, **kwargs):
+    invalidate_preferred_streams(instance.user_id)
+
+@receiver([post_save, post_delete], sender=LLMModel)
+@receiver([post_save, post_delete], sender=ProjectLLMModel)
+@receiver(post_delete, sender=Project)
+def invalidate_resolved_model_configs(sender, **kwargs):
+    invalidate_model_configs()
+
+@receiver([post_save, post_delete], sender=TrainerTask)
+def forget_cached_question_project(sender, instance, **kwargs):
+    if instance.question_id:
+        forget_question_project(instance.question_id)
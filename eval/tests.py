@@ -1,3 +1,415 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
 
-# Create your tests here.
+import contextvars
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from coreproject import metrics
+from eval import catalog, eval_sessions, model_config
+from eval.utils import circuit_breaker, hedging, shared_locks, single_flight, structured_review
+from eval.utils.code_extractor import detect_language, extract_implementation, tokenize
+from eval.utils.deadlines import (
+    Deadline, DeadlineExceeded, job_deadline, request_retries, request_timeouts, restart_job_deadline)
+from eval.utils.llm_usage import TokenUsage, collect_usage, record_usage, usage_from_openai
+from eval.utils.structured_review import InvalidStructuredReview, parse_review, review_schema
+from eval.utils.usage_accounting import cost_of
+
+
+class CodeExtractorTests(SimpleTestCase):
+    def test_implementation_section_wins_over_other_blocks(self):
+        content = (
+            "# Problem\n```python\nprint('an example that is not the solution code')\n```\n"
+            "## Implementation\n```python\ndef solve(nums):\n    return sorted(nums)\n```\n"
+            "## Tests\n```python\nassert solve([2, 1]) == [1, 2]\n```"
+        )
+        code, language = extract_implementation(content)
+        self.assertEqual(code, "def solve(nums):\n    return sorted(nums)")
+        self.assertEqual(language, 'python')
+
+    def test_comment_inside_fence_does_not_end_section(self):
+        content = "## Implementation\n```python\n# helper\ndef helper():\n    return 1\n```\n## Notes\ntext"
+        code, _ = extract_implementation(content)
+        self.assertEqual(code, "# helper\ndef helper():\n    return 1")
+
+    def test_section_priority_follows_pattern_order(self):
+        content = "## Solution\n```py\nfirst()\n```\n## Code\n```py\nsecond()\n```"
+        code, _ = extract_implementation(content)
+        self.assertEqual(code, "second()")
+
+    def test_falls_back_to_substantial_blocks(self):
+        content = "Intro\n```\nx = 1\n```\ntext\n```cpp\nint main() { return compute_the_answer(42); }\n```"
+        code, language = extract_implementation(content)
+        self.assertEqual(code, "int main() { return compute_the_answer(42); }")
+        self.assertEqual(language, 'cpp')
+
+    def test_unfenced_python_lines(self):
+        content = "Here is my answer.\n\ndef foo(x):\n    y = x + 1\n    return y\n\nThat is all folks."
+        code, language = extract_implementation(content)
+        self.assertEqual(language, 'python')
+        self.assertEqual(code, "def foo(x):\n    y = x + 1\n    return y")
+
+    def test_empty_content(self):
+        self.assertEqual(extract_implementation(''), ('', 'unknown'))
+
+    def test_unclosed_fence_is_ignored(self):
+        headings, blocks = tokenize("# Title\n```python\nnever closed")
+        self.assertEqual(blocks, [])
+        self.assertEqual([title for _, title, _ in headings], ['Title'])
+
+    def test_detect_language_priority(self):
+        self.assertEqual(detect_language("def main():\n    print('x')\n#include <vector>"), 'cpp')
+        self.assertEqual(detect_language("console.log('hi')"), 'javascript')
+        self.assertEqual(detect_language("plain prose"), 'unknown')
+
+
+class StructuredReviewTests(SimpleTestCase):
+    def setUp(self):
+        self.schema = review_schema(["Grammar Check", "Security Review"], include_plagiarism=True)
+
+    def test_schema_requires_every_field(self):
+        self.assertEqual(
+            self.schema["required"], ["plagiarism_score", "plagiarism_result", "grammar", "security_review"])
+        self.assertFalse(self.schema["additionalProperties"])
+
+    def test_parse_strips_markdown_fence(self):
+        text = ('```json\n{"plagiarism_score": 15, "plagiarism_result": "original", '
+                '"grammar": "No grammar issues found.", "security_review": "No security issues found."}\n```')
+        self.assertEqual(parse_review(text, self.schema)["plagiarism_score"], 15)
+
+    def test_missing_field_is_invalid(self):
+        with self.assertRaises(InvalidStructuredReview):
+            parse_review('{"plagiarism_score": 15, "plagiarism_result": "original", "grammar": "ok"}', self.schema)
+
+    def test_score_out_of_range_is_invalid(self):
+        text = ('{"plagiarism_score": 150, "plagiarism_result": "x", "grammar": "ok", "security_review": "ok"}')
+        with self.assertRaises(InvalidStructuredReview):
+            parse_review(text, self.schema)
+
+    def test_non_json_is_invalid(self):
+        with self.assertRaises(InvalidStructuredReview):
+            parse_review("PLAGIARISM SCORE: 20%", self.schema)
+
+    def test_provider_error_is_not_a_format_problem(self):
+        reply = ["Error with Anthropic API: Error code: 529 - overloaded"]
+        with mock.patch.object(structured_review, "call_llm_api", return_value=reply):
+            with self.assertRaises(structured_review.StructuredReviewFailed):
+                structured_review.run_combined_review("claude-x", ["Grammar Check"], "notebook", "")
+
+
+class LLMUsageTests(SimpleTestCase):
+    def test_openai_cached_tokens_are_split_from_input(self):
+        usage = SimpleNamespace(
+            prompt_tokens=2000, completion_tokens=30,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+        with collect_usage() as outer:
+            with collect_usage() as inner:
+                record_usage(usage_from_openai(usage))
+            record_usage(usage_from_openai(usage))
+        self.assertEqual((inner.input_tokens, inner.cache_read_tokens, inner.calls), (464, 1536, 1))
+        self.assertEqual((outer.output_tokens, outer.calls), (60, 2))
+
+
+class DeadlineTests(SimpleTestCase):
+    def test_timeouts_shrink_to_the_remaining_budget(self):
+        timeouts = request_timeouts(Deadline.after(30))
+        self.assertLessEqual(timeouts['read'], 30)
+        self.assertEqual(timeouts['connect'], 10)
+        self.assertEqual(request_retries(Deadline.after(30), timeouts), 0)
+        self.assertEqual(request_retries(None, timeouts), 2)
+
+    def test_no_request_once_expired(self):
+        with self.assertRaises(DeadlineExceeded):
+            request_timeouts(Deadline.after(0))
+
+    def test_manual_retry_restarts_the_budget(self):
+        created = datetime.now(timezone.utc) - timedelta(hours=2)
+        job = SimpleNamespace(pk=1, job_type='general_llm_request', created_at=created, input_data={'temp': 0.2})
+        self.assertTrue(job_deadline(job).expired())
+        restart_job_deadline(job)
+        self.assertFalse(job_deadline(job).expired())
+        self.assertEqual(job.input_data['temp'], 0.2)
+
+
+class UsageAccountingTests(SimpleTestCase):
+    def test_cost_prices_cache_reads_and_writes(self):
+        usage = TokenUsage(input_tokens=1000, output_tokens=500, cache_read_tokens=9000, cache_write_tokens=200, calls=1)
+        prices = (Decimal('3'), Decimal('15'), Decimal('0.3'))
+        # 1000*3 + 200*3*1.25 + 9000*0.3 + 500*15 per million tokens
+        self.assertEqual(cost_of(usage, prices), Decimal('0.013950'))
+        self.assertIsNone(cost_of(usage, None))
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_is_cumulative_and_adds_up_across_processes(self):
+        histogram = metrics.Histogram('test_request_seconds', 'Test requests', ['view'], buckets=(1, 5))
+        for seconds in (0.5, 1, 3, 10):
+            histogram.observe(seconds, view='home')
+        text = metrics.render(metrics.merge([[histogram.family()], [histogram.family()]]))
+        self.assertIn('# TYPE test_request_seconds histogram', text)
+        self.assertIn('test_request_seconds_bucket{view="home",le="1"} 4', text)
+        self.assertIn('test_request_seconds_bucket{view="home",le="5"} 6', text)
+        self.assertIn('test_request_seconds_bucket{view="home",le="+Inf"} 8', text)
+        self.assertIn('test_request_seconds_sum{view="home"} 29', text)
+        with self.assertRaises(ValueError):
+            histogram.observe(1, page='home')
+
+    def test_view_counts_the_answering_worker_once(self):
+        counter = metrics.Counter('test_scrapes_total', 'Test scrapes')
+        counter.inc()
+        with tempfile.TemporaryDirectory() as metrics_dir, mock.patch.object(metrics, 'METRICS_DIR', metrics_dir):
+            request = RequestFactory().get('/metrics')
+            self.assertIn('test_scrapes_total 1', metrics.metrics_view(request).content.decode())
+            counter.inc()
+            self.assertIn('test_scrapes_total 2', metrics.metrics_view(request).content.decode())
+            request.META['REMOTE_ADDR'] = '10.0.0.5'
+            self.assertEqual(metrics.metrics_view(request).status_code, 403)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogTests(SimpleTestCase):
+    def test_edits_in_other_processes_are_seen_after_the_check_interval(self):
+        loads = []
+
+        def load():
+            loads.append(True)
+            return [len(loads)]
+
+        self.assertEqual(catalog._get('test_table', load), (1,))
+        with mock.patch.object(catalog.cache, 'get_or_set', side_effect=AssertionError('checked again')):
+            self.assertEqual(catalog._get('test_table', load), (1,))
+        # Another process edits the table
+        cache.incr(catalog._shared_version_key('test_table'))
+        self.assertEqual(catalog._get('test_table', load), (1,))
+        # Once the interval has passed
+        catalog._shared_checks.pop('test_table')
+        self.assertEqual(catalog._get('test_table', load), (2,))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ModelConfigTests(SimpleTestCase):
+    def test_changes_made_in_other_processes_are_picked_up(self):
+        builds = []
+
+        def build(model_id, project_id):
+            builds.append(model_id)
+            return SimpleNamespace(api_key=f'key-{len(builds)}')
+
+        with mock.patch.object(model_config, '_build', build):
+            self.assertEqual(model_config.resolve_model_config(1, 2).api_key, 'key-1')
+            self.assertEqual(model_config.resolve_model_config(1, 2).api_key, 'key-1')
+            # Another process saves the model: its signal bumps the shared version
+            cache.incr(catalog._shared_version_key(model_config.MODEL_CONFIGS))
+            # Once the check interval has passed
+            catalog._shared_checks.pop(model_config.MODEL_CONFIGS)
+            self.assertEqual(model_config.resolve_model_config(1, 2).api_key, 'key-2')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EvalSessionTests(TestCase):
+    def test_results_are_kept_in_order_and_edited_in_place(self):
+        eval_sessions.start('session')
+        for model_id in range(20):
+            eval_sessions.add_result('session', {'model_id': model_id})
+        self.assertEqual([result['model_id'] for result in eval_sessions.results('session')], list(range(20)))
+        self.assertTrue(eval_sessions.update_response('session', '7', 'edited'))
+        self.assertFalse(eval_sessions.update_response('session', '99', 'edited'))
+        edited = [result for result in eval_sessions.results('session') if result.get('response') == 'edited']
+        self.assertEqual([result['model_id'] for result in edited], [7])
+        self.assertIsNone(eval_sessions.results('unknown-session'))
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+
+
+def _raise(error):
+    raise error
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CircuitBreakerTests(TestCase):
+    def call_failing(self, model, status_code):
+        with self.assertRaises(ProviderError):
+            circuit_breaker.call('openai', model, lambda: _raise(ProviderError(status_code)))
+
+    def test_only_provider_failures_trip_the_breaker(self):
+        for _ in range(circuit_breaker.LLM_BREAKER_MIN_CALLS):
+            self.call_failing('bad-request-model', 401)
+            self.call_failing('bad-request-model', 400)
+        self.assertFalse(circuit_breaker.is_open('openai', 'bad-request-model'))
+        for _ in range(circuit_breaker.LLM_BREAKER_MIN_CALLS):
+            self.call_failing('trip-model', 503)
+        self.assertTrue(circuit_breaker.is_open('openai', 'trip-model'))
+        with self.assertRaises(circuit_breaker.CircuitOpenError):
+            circuit_breaker.call('openai', 'trip-model', lambda: 'not called')
+
+    def test_half_open_probe_reopens_or_closes(self):
+        for _ in range(circuit_breaker.LLM_BREAKER_MIN_CALLS):
+            self.call_failing('probe-model', 429)
+        self.assertTrue(circuit_breaker.is_open('openai', 'probe-model'))
+        with mock.patch.object(circuit_breaker, 'LLM_BREAKER_COOLDOWN', 0):
+            # A failed probe opens the circuit again
+            self.call_failing('probe-model', 500)
+            self.assertEqual(circuit_breaker.breaker('openai', 'probe-model').shared_state()['failures'], 1)
+            self.assertEqual(circuit_breaker.call('openai', 'probe-model', lambda: 'ok'), 'ok')
+        self.assertEqual(
+            circuit_breaker.breaker('openai', 'probe-model').shared_state()['state'], circuit_breaker.CLOSED)
+
+    def test_one_probe_at_a_time(self):
+        for _ in range(circuit_breaker.LLM_BREAKER_MIN_CALLS):
+            self.call_failing('single-probe-model', 502)
+        b = circuit_breaker.breaker('openai', 'single-probe-model')
+        with mock.patch.object(circuit_breaker, 'LLM_BREAKER_COOLDOWN', 0):
+            probe = b.before_call()
+            self.assertIsNotNone(probe)
+            with self.assertRaises(circuit_breaker.CircuitOpenError):
+                b.before_call()
+            b.record(False, probe=probe)
+        self.assertIsNone(b.before_call())
+
+    def test_transient_errors(self):
+        self.assertTrue(circuit_breaker.is_transient(ConnectionResetError()))
+        self.assertTrue(circuit_breaker.is_transient(ProviderError(529)))
+        self.assertFalse(circuit_breaker.is_transient(ProviderError(403)))
+        self.assertTrue(circuit_breaker.is_transient_message("Error with DeepSeek API: Request timed out."))
+        self.assertFalse(circuit_breaker.is_transient_message("Error generating response: Error code: 400 - too long"))
+
+
+class SharedLocksTests(TestCase):
+    def test_one_holder_until_release_or_expiry(self):
+        token = shared_locks.acquire('test-lock', 30)
+        self.assertIsNone(shared_locks.acquire('test-lock', 30))
+        self.assertEqual(shared_locks.holder('test-lock'), token)
+        shared_locks.release('test-lock', 'someone-else')
+        self.assertEqual(shared_locks.holder('test-lock'), token)
+        shared_locks.release('test-lock', token)
+        expired = shared_locks.acquire('test-lock', -1)
+        self.assertIsNone(shared_locks.holder('test-lock'))
+        taker = shared_locks.acquire('test-lock', 30)
+        self.assertNotIn(taker, (None, expired))
+        self.assertFalse(shared_locks.refresh('test-lock', expired, 30))
+        self.assertTrue(shared_locks.refresh('test-lock', taker, 30))
+
+    def test_counters_count_from_zero(self):
+        self.assertEqual(shared_locks.counter_value('test-counter'), 0)
+        self.assertEqual(shared_locks.increment('test-counter'), 1)
+        self.assertEqual(shared_locks.increment('test-counter', 5), 6)
+        self.assertEqual(shared_locks.counter_value('test-counter'), 6)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch.object(single_flight, 'LLM_SINGLE_FLIGHT_POLL_INTERVAL', 0.01)
+class SingleFlightTests(TransactionTestCase):
+    def test_threads_share_one_call(self):
+        started, release, calls, results = threading.Event(), threading.Event(), [], []
+
+        def call():
+            calls.append(True)
+            started.set()
+            release.wait(5)
+            return 'answer'
+
+        leader = threading.Thread(target=lambda: results.append(single_flight.do('local-key', call)))
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=lambda: results.append(single_flight.do('local-key', call)))
+        waiter.start()
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+        self.assertEqual(results, ['answer', 'answer'])
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_a_leader_in_another_process(self):
+        token = shared_locks.acquire('llm_flight_shared-key', 30)
+        self.assertIsNone(shared_locks.acquire('llm_flight_shared-key', 30))
+        threading.Timer(0.05, lambda: cache.set('llm_flight_result_shared-key', (token, 'answer'))).start()
+        self.assertEqual(single_flight.do('shared-key', lambda: self.fail('called twice')), 'answer')
+
+    def test_gives_up_waiting_at_the_deadline(self):
+        shared_locks.acquire('llm_flight_stuck-key', 30)
+        self.assertEqual(single_flight.do('stuck-key', lambda: 'direct', deadline=Deadline.after(0.05)), 'direct')
+        with mock.patch.object(single_flight, 'LLM_SINGLE_FLIGHT_MAX_WAIT', 0.05):
+            self.assertEqual(single_flight.do('stuck-key', lambda: 'direct'), 'direct')
+
+
+request_label = contextvars.ContextVar('request_label', default=None)
+
+
+class FakeClient:
+    """Answers after first_token_after seconds unless cancelled first."""
+
+    def __init__(self, model_name, first_token_after):
+        self.model_name = model_name
+        self.first_token_after = first_token_after
+        self.on_first_token = None
+        self.cancelled = threading.Event()
+        self.calls = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _respond(self, messages, temperature=None, max_tokens=None):
+        self.calls += 1
+        if self.cancelled.wait(self.first_token_after):
+            return {'status': 'error', 'cancelled': True, 'response': ''}
+        self.on_first_token()
+        return {'status': 'success', 'response': f'{self.model_name} for {request_label.get()}'}
+
+
+@mock.patch.object(hedging, 'LLM_HEDGE_DEFAULT_DELAY', 0.05)
+@mock.patch.object(hedging, 'first_token_latency', hedging.LatencyTracker())
+class HedgingTests(SimpleTestCase):
+    def test_first_to_answer_wins_and_the_other_is_cancelled(self):
+        primary, backup = FakeClient('primary', 5), FakeClient('backup', 0)
+        label = request_label.set('job 7')
+        try:
+            with mock.patch.object(hedging, 'budget', hedging.HedgeBudget(0.1, 1)):
+                result = hedging.run_hedged(primary, backup, [])
+        finally:
+            request_label.reset(label)
+        self.assertEqual(result['served_by'], 'backup')
+        self.assertTrue(result['hedged'])
+        # The request threads run in the caller's context
+        self.assertEqual(result['response'], 'backup for job 7')
+        self.assertTrue(primary.cancelled.wait(1))
+
+    def test_no_hedge_once_the_budget_is_spent(self):
+        primary, backup = FakeClient('primary', 0.1), FakeClient('backup', 0)
+        with mock.patch.object(hedging, 'budget', hedging.HedgeBudget(0.1, 1)):
+            self.assertTrue(hedging.run_hedged(primary, backup, []).get('hedged'))
+            primary.cancelled.clear()
+            result = hedging.run_hedged(primary, backup, [])
+        self.assertNotIn('hedged', result)
+        self.assertTrue(result['response'].startswith('primary'))
+        self.assertEqual(backup.calls, 1)
+
+    def test_threshold_is_a_high_percentile_of_recent_first_tokens(self):
+        tracker = hedging.LatencyTracker()
+        for seconds in range(1, hedging.LLM_HEDGE_MIN_SAMPLES):
+            tracker.record('model', seconds)
+        self.assertEqual(tracker.threshold('model'), hedging.LLM_HEDGE_DEFAULT_DELAY)
+        for seconds in range(hedging.LLM_HEDGE_MIN_SAMPLES, 101):
+            tracker.record('model', seconds)
+        self.assertEqual(tracker.threshold('model'), 95)
+        fast = hedging.LatencyTracker()
+        for _ in range(hedging.LLM_HEDGE_MIN_SAMPLES):
+            fast.record('fast-model', 0.1)
+        self.assertEqual(fast.threshold('fast-model'), hedging.LLM_HEDGE_MIN_DELAY)
+
+    def test_recorded_latencies_fill_in_until_there_are_enough_samples(self):
+        history = mock.Mock(return_value=[10.0] * hedging.LLM_HEDGE_MIN_SAMPLES)
+        tracker = hedging.LatencyTracker(history=history)
+        self.assertEqual(tracker.threshold('model'), 10)
+        for _ in range(hedging.LLM_HEDGE_MIN_SAMPLES):
+            tracker.record('model', 3)
+        self.assertEqual(tracker.threshold('model'), 3)
+        # Read once per LLM_HEDGE_HISTORY_TTL, not on every request
+        self.assertEqual(history.call_count, 1)
@@ -34,12 +34,14 @@ urlpatterns = [
     path('get_model_results/<str:session_id>/', views.get_model_results, name='get_model_results'),
     path('reports/', views.reports, name='reports'),
     path('api/reports/all/', views.api_all_reports, name='api_all_reports'),
+    path('api/reports/export/', views.export_reports, name='export_reports'),
     # Custom login view with domain restriction
     path('accounts/login/', TuringDomainLoginView.as_view(), name='login'),
     # Django built-in logout view
     path('accounts/logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
     path('save_to_history/', views.save_to_history, name='save_to_history'),
     path('get_evaluation_history/', views.get_evaluation_history, name='get_evaluation_history'),
+    path('evaluation_history/export/', views.export_evaluation_history, name='export_evaluation_history'),
     path('get_model_analytics/', views.get_model_analytics, name='get_model_analytics'),
     path('get_user_analytics/', views.get_user_analytics, name='get_user_analytics'),
     path('save_edited_response/', response_editor.save_edited_response, name='save_edited_response'),
@@ -58,6 +60,7 @@ urlpatterns = [
     
     # New LLM Job API endpoints (Pub/Sub based with polling)
     path('api/llm/jobs/submit/', api_llm.submit_llm_job, name='api_submit_llm_job'),
+    path('api/llm/jobs/status/', api_llm.poll_job_statuses, name='api_poll_job_statuses'),
     path('api/llm/jobs/<uuid:job_id>/status/', api_llm.poll_job_status, name='api_poll_job_status'),
     path('api/llm/jobs/<uuid:job_id>/result/', api_llm.get_job_result, name='api_get_job_result'),
     path('api/llm/jobs/', api_llm.list_user_jobs, name='api_list_user_jobs'),
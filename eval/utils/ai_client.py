@@ -1,26 +1,317 @@
 import os
 import re
+import threading
 import time
-from openai import OpenAI
+from openai import OpenAI, Timeout as OpenAITimeout
 import anthropic
 import google.generativeai as genai
 from django.conf import settings
 import logging
 
+from coreproject import metrics
+from . import circuit_breaker, deadlines, hedging, single_flight
+from .llm_usage import record_usage, usage_from_anthropic, usage_from_gemini, usage_from_openai
+
 logger = logging.getLogger(__name__)
 
+# Extra calls allowed for a response the provider cut off at its token limit
+LLM_MAX_CONTINUATIONS = getattr(settings, 'LLM_MAX_CONTINUATIONS', 3)
+
+CONTINUE_PROMPT = (
+    "Your previous response was cut off by the output token limit. Continue it exactly where it stops, "
+    "without repeating or summarizing what you already wrote."
+)
+
+
+class ContinuationStats:
+    """
+    Per-process continuation counters:
+    truncated      responses the provider stopped at max_tokens
+    continuations  extra calls made to complete them
+    avoided        complete responses the old text heuristic would have continued
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'truncated': 0, 'continuations': 0, 'avoided': 0}
+
+    def record(self, name, count=1):
+        with self._lock:
+            self._counts[name] += count
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+continuation_stats = ContinuationStats()
+metrics.expose_counts('llm_continuation_events_total', 'Truncated responses, continuation calls and calls avoided',
+                      continuation_stats.snapshot, 'event')
+time_to_first_token = metrics.Histogram(
+    'llm_time_to_first_token_seconds', 'Seconds until the first token of an LLM response, by provider and model',
+    ['provider', 'model'], buckets=metrics.SLOW_BUCKETS)
+
+
+def _looks_truncated(response_text):
+    """
+    The text heuristic that used to decide on continuations. It flags most
+    complete answers (e.g. any line ending without punctuation), so it now
+    only feeds the 'avoided' counter; the provider's stop reason decides.
+    """
+    if not response_text or not response_text.strip():
+        return True
+
+    response_text = response_text.strip()
+
+    truncation_indicators = [
+        r'[a-zA-Z0-9]\s*$',
+        r'```[^`]*$',
+        r'(Analysis|Review|Check|Summary|Conclusion):\s*$',
+        r'\d+\.\s*$',
+        r'[-*]\s*$',
+        r'(because|since|therefore|however|moreover|furthermore|additionally)\s*$',
+        r'(function|class|def|if|for|while|try)\s*$',
+    ]
+    if any(re.search(pattern, response_text, re.IGNORECASE | re.MULTILINE) for pattern in truncation_indicators):
+        return True
+    if len(response_text) < 50:
+        return True
+    last_part = response_text[-100:].strip()
+    return bool(last_part and not re.search(r'[.!?;}\])]$', last_part))
+
+
 class BaseAIClient:
-    def __init__(self, api_key, model_name, model_instance=None):
+    # Provider stop reasons meaning the output hit the max_tokens limit
+    TRUNCATED_STOP_REASONS = ()
+    # The SDK's Timeout class (httpx.Timeout); None for SDKs that take plain seconds
+    TIMEOUT_TYPE = None
+
+    def __init__(self, api_key, model_name, model_instance=None, deadline=None):
         self.api_key = api_key
         self.model_name = model_name
         self.model_instance = model_instance
+        # eval.utils.deadlines.Deadline of the job this client works for; None for
+        # interactive calls, which still get the default timeouts
+        self.deadline = deadline
+        # TokenUsage of the most recent get_response() call, if the provider reported one
+        self.last_usage = None
+        # Set by _stream_response() once the provider reports why the stream ended
+        self._stream_stop_reason = None
+        # Hedging (eval.utils.hedging): client for a duplicate request when this one is
+        # slow to start, a hook called on the first token, and cancellation of the loser
+        self.backup_client = None
+        self.on_first_token = None
+        self._first_token = threading.Event()
+        self._time_to_first_token = None
+        self._cancelled = threading.Event()
 
     def get_response(self, messages, temperature=None, max_tokens=None):
-        """Universal response method with transparent streaming support."""
+        """
+        Universal response method with transparent streaming support.
+
+        A message may carry "cache": True to mark it as a stable prompt prefix
+        (e.g. a long system prompt shared by many requests). Anthropic caches
+        everything up to and including marked messages; the other providers
+        cache prefixes automatically and ignore the marker.
+
+        Besides the response, results carry what usage accounting needs
+        (eval.utils.usage_accounting): 'usage' (token counts, incl. cached
+        prompt tokens), 'stop_reason', 'time_to_first_token' and 'latency',
+        the seconds this call took end to end.
+        """
+        self.last_usage = None
+        started = time.monotonic()
+        led = []
+
+        def call():
+            led.append(True)
+            if self.backup_client is not None:
+                return hedging.run_hedged(self, self.backup_client, messages, temperature, max_tokens)
+            return self._respond(messages, temperature, max_tokens)
+
+        # Identical requests already in flight (here or in another worker) are shared
+        key = single_flight.request_key(
+            getattr(self, 'provider', ''), self.model_name, messages, temperature, max_tokens)
+        result = single_flight.do(key, call, publish=self._publishable, deadline=self.deadline)
+        if not led:
+            # Another caller paid for this response; its usage is already counted there
+            result = dict(result, coalesced=True, usage=None)
+        return dict(result, latency=round(time.monotonic() - started, 3))
+
+    def _respond(self, messages, temperature=None, max_tokens=None):
+        """
+        One request and its continuations, without coalescing or hedging,
+        through the circuit breaker of this provider and model.
+        """
+        if self.deadline is not None and self.deadline.expired():
+            logger.warning(f"{self.deadline.label}: deadline exceeded before calling {self.model_name}")
+            return {
+                'status': 'error',
+                'error': f'{self.deadline.label} deadline exceeded',
+                'response': '',
+                'completion_attempts': 0,
+                'was_continued': False,
+                'used_streaming': False,
+                'deadline_exceeded': True
+            }
+        try:
+            return circuit_breaker.call(
+                getattr(self, 'provider', ''), self.model_name,
+                lambda: self._request(messages, temperature, max_tokens),
+                is_failure=self._failure_reason,
+                latency=lambda result, elapsed: self._time_to_first_token or elapsed)
+        except circuit_breaker.CircuitOpenError as e:
+            logger.warning(str(e))
+            return {
+                'status': 'error',
+                'error': str(e),
+                'response': '',
+                'completion_attempts': 0,
+                'was_continued': False,
+                'used_streaming': False,
+                'circuit_open': True
+            }
+
+    def _failure_reason(self, result):
+        # A hedged request cancelled in favour of the other one didn't fail, nor
+        # did one cut short because the job ran out of time
+        if result.get('status') == 'success' or result.get('cancelled'):
+            return ''
+        if result.get('deadline_exceeded') or (self.deadline is not None and self.deadline.expired()):
+            return ''
+        # A bad request or API key is the caller's problem, not the provider's
+        if not result.get('transient'):
+            return ''
+        return result.get('error') or 'error'
+
+    def _request(self, messages, temperature=None, max_tokens=None):
+        # A client that lost a hedge earlier must still read its next response
+        self._cancelled.clear()
+        self._first_token.clear()
+        self._time_to_first_token = None
+        started = time.monotonic()
         if self._should_use_streaming():
-            return self._get_response_with_streaming(messages, temperature, max_tokens)
+            result = self._get_response_with_streaming(messages, temperature, max_tokens)
         else:
-            return self._get_response_without_streaming(messages, temperature, max_tokens)
+            result = self._get_response_without_streaming(messages, temperature, max_tokens)
+        if result.get('status') == 'success':
+            # For a blocking call the whole answer is the first token
+            self._mark_first_token(started)
+            result['time_to_first_token'] = round(self._time_to_first_token, 3)
+        return self._complete_truncated(messages, result, temperature, max_tokens)
+
+    def _mark_first_token(self, started):
+        if self._first_token.is_set():
+            return
+        self._first_token.set()
+        self._time_to_first_token = time.monotonic() - started
+        hedging.first_token_latency.record(self.model_name, self._time_to_first_token)
+        time_to_first_token.observe(self._time_to_first_token, provider=getattr(self, 'provider', ''),
+                                    model=self.model_name)
+        if self.on_first_token is not None:
+            self.on_first_token()
+
+    def cancel(self):
+        """Stop reading a streaming response; drops the slower of two hedged requests."""
+        self._cancelled.set()
+
+    @staticmethod
+    def _publishable(result):
+        """Successful results, minus the SDK response object, can go to other processes."""
+        if result.get('status') != 'success':
+            return None
+        return {k: v for k, v in result.items() if k != 'raw_response'}
+
+    def _complete_truncated(self, messages, result, temperature=None, max_tokens=None):
+        """
+        Continue a response the provider stopped at max_tokens, resuming from
+        the partial output in the same streaming mode as the first call.
+        Responses that ended normally are returned as they are.
+        """
+        if result.get('status') != 'success':
+            return result
+        if result.get('stop_reason') not in self.TRUNCATED_STOP_REASONS:
+            if _looks_truncated(result['response']):
+                continuation_stats.record('avoided')
+            return result
+
+        continuation_stats.record('truncated')
+        combined = result['response']
+        attempts = 1
+        part = result
+        out_of_time = False
+        while attempts <= LLM_MAX_CONTINUATIONS:
+            if self.deadline is not None and self.deadline.expired():
+                logger.warning(f"{self.deadline.label}: no time left to continue the {self.model_name} response")
+                out_of_time = True
+                break
+            attempts += 1
+            continuation_stats.record('continuations')
+            logger.info(f"{self.model_name} stopped at max_tokens, continuation {attempts - 1}/{LLM_MAX_CONTINUATIONS}")
+            continuation_messages = self._continuation_messages(messages, combined)
+            if result.get('used_streaming'):
+                part = self._get_response_with_streaming(continuation_messages, temperature, max_tokens)
+            else:
+                part = self._get_response_without_streaming(continuation_messages, temperature, max_tokens)
+            if part.get('status') != 'success' or not part['response'].strip():
+                logger.warning(f"Continuation {attempts - 1} for {self.model_name} returned nothing: {part.get('error', 'empty')}")
+                break
+            combined = self._join_continuation(combined, part['response'])
+            if part.get('stop_reason') not in self.TRUNCATED_STOP_REASONS:
+                break
+
+        completed = part.get('status') == 'success' and part.get('stop_reason') not in self.TRUNCATED_STOP_REASONS
+        result = dict(
+            result,
+            response=combined,
+            completion_attempts=attempts,
+            was_continued=attempts > 1,
+            stop_reason=part.get('stop_reason') if completed else result['stop_reason'],
+            usage=self.last_usage.as_dict() if self.last_usage else None,
+        )
+        if out_of_time:
+            result['warning'] = 'Response may be incomplete: the job deadline ran out before it was continued'
+        elif not completed:
+            result['warning'] = 'Response may still be incomplete after maximum continuation attempts'
+        return result
+
+    def _continuation_messages(self, messages, partial_response):
+        """The original conversation, the partial answer and a request to go on."""
+        return list(messages) + [
+            {"role": "assistant", "content": partial_response},
+            {"role": "user", "content": CONTINUE_PROMPT},
+        ]
+
+    def _join_continuation(self, partial_response, continuation_text):
+        return partial_response + self._clean_continuation_text(partial_response, continuation_text)
+
+    def _clean_continuation_text(self, original_text, continuation_text):
+        """
+        Drop words the continuation repeats from the end of the original text.
+
+        Args:
+            original_text (str): The original response text
+            continuation_text (str): The continuation text
+
+        Returns:
+            str: Continuation text without the repeated words
+        """
+        words_original = original_text[-200:].split()
+        words_continuation = continuation_text[:200].split()
+
+        # Find the longest common suffix/prefix overlap
+        max_overlap = min(len(words_original), len(words_continuation), 10)  # Limit overlap check
+
+        for overlap_len in range(max_overlap, 0, -1):
+            if words_original[-overlap_len:] == words_continuation[:overlap_len]:
+                # Cut after the repeated words and keep the rest verbatim
+                position = 0
+                for word in words_continuation[:overlap_len]:
+                    position = continuation_text.index(word, position) + len(word)
+                logger.info(f"Removed {overlap_len} overlapping words from continuation")
+                return continuation_text[position:]
+
+        return continuation_text
 
     def _should_use_streaming(self):
         """Determine if streaming should be used based on configuration and smart defaults."""
@@ -58,14 +349,43 @@ class BaseAIClient:
         """Universal streaming collection that works for all providers."""
         full_response = ""
         chunk_count = 0
+        self._stream_stop_reason = None
+        started = time.monotonic()
         
         try:
             logger.info(f"Starting streaming response for {self.model_name}")
             
-            for chunk in self._stream_response(messages, temperature, max_tokens):
+            stream = self._stream_response(messages, temperature, max_tokens)
+            for chunk in stream:
+                if self._cancelled.is_set():
+                    # Closing the generator closes the provider connection
+                    stream.close()
+                    logger.info(f"Cancelled streaming response from {self.model_name}")
+                    return {
+                        'status': 'error',
+                        'error': 'Cancelled in favour of a faster hedged request',
+                        'response': full_response,
+                        'completion_attempts': 1,
+                        'was_continued': False,
+                        'used_streaming': True,
+                        'cancelled': True
+                    }
                 if chunk:  # Only add non-empty chunks
+                    self._mark_first_token(started)
                     full_response += chunk
                     chunk_count += 1
+                if self.deadline is not None and self.deadline.expired():
+                    stream.close()
+                    logger.warning(f"{self.deadline.label}: deadline exceeded while streaming from {self.model_name}")
+                    return {
+                        'status': 'error',
+                        'error': f'{self.deadline.label} deadline exceeded while streaming the response',
+                        'response': full_response,
+                        'completion_attempts': 1,
+                        'was_continued': False,
+                        'used_streaming': True,
+                        'deadline_exceeded': True
+                    }
             
             logger.info(f"Streaming completed: {len(full_response)} chars, {chunk_count} chunks")
             
@@ -76,13 +396,28 @@ class BaseAIClient:
                 'completion_attempts': 1,
                 'was_continued': False,
                 'used_streaming': True,
-                'chunk_count': chunk_count
+                'chunk_count': chunk_count,
+                'stop_reason': self._stream_stop_reason,
+                'usage': self.last_usage.as_dict() if self.last_usage else None
             }
             
         except NotImplementedError:
             logger.info("Streaming not implemented for this provider, using non-streaming")
             return self._get_response_without_streaming(messages, temperature, max_tokens)
         except Exception as e:
+            if deadlines.is_timeout(e):
+                # A blocking retry would wait even longer for the same stalled provider
+                logger.warning(f"Streaming from {self.model_name} timed out: {e}")
+                return {
+                    'status': 'error',
+                    'error': f'Timed out streaming from {self.model_name}: {e}',
+                    'response': '',
+                    'completion_attempts': 1,
+                    'was_continued': False,
+                    'used_streaming': True,
+                    'deadline_exceeded': self.deadline is not None and self.deadline.expired(),
+                    'transient': True
+                }
             logger.warning(f"Streaming failed: {e}, falling back to non-streaming")
             return self._get_response_without_streaming(messages, temperature, max_tokens)
 
@@ -94,13 +429,43 @@ class BaseAIClient:
         """Provider-specific streaming implementation - to be implemented by subclasses."""
         raise NotImplementedError("Subclasses must implement streaming method.")
 
+    def _sdk(self, streaming=False):
+        """
+        The SDK client with explicit timeouts for one request, cut to the
+        time left before the deadline (connect, read or stream idle), and
+        only as many SDK retries as still fit. Raises DeadlineExceeded when
+        no time is left.
+        """
+        timeouts = deadlines.request_timeouts(self.deadline, streaming)
+        return self.client.with_options(
+            timeout=self.TIMEOUT_TYPE(**timeouts),
+            max_retries=deadlines.request_retries(self.deadline, timeouts))
+
+    def _record_usage(self, usage):
+        """Remember a response's TokenUsage and add it to any active collect_usage() block."""
+        if usage is None:
+            return
+        if self.last_usage is None:
+            self.last_usage = usage
+        else:
+            self.last_usage.add(usage)
+        record_usage(usage, getattr(self, 'provider', ''), self.model_name)
+
+    @staticmethod
+    def _strip_cache_markers(messages):
+        return [{k: v for k, v in msg.items() if k != 'cache'} for msg in messages]
+
     def cleanup(self):
         pass
 
 class OpenAIClient(BaseAIClient):
-    def __init__(self, api_key, model_name, model_instance=None, base_url=None):
-        super().__init__(api_key, model_name, model_instance)
-        self.client = OpenAI(api_key=self.api_key, base_url=base_url)
+    TRUNCATED_STOP_REASONS = ('length',)
+    TIMEOUT_TYPE = OpenAITimeout
+
+    def __init__(self, api_key, model_name, model_instance=None, base_url=None, deadline=None):
+        super().__init__(api_key, model_name, model_instance, deadline)
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url,
+                             timeout=OpenAITimeout(**deadlines.request_timeouts()))
         self.provider = 'openai'
 
     def _get_default_max_tokens(self):
@@ -120,8 +485,10 @@ class OpenAIClient(BaseAIClient):
         """OpenAI streaming implementation."""
         params = {
             "model": self.model_name,
-            "messages": messages,
-            "stream": True
+            "messages": self._strip_cache_markers(messages),
+            "stream": True,
+            # The final chunk carries token usage, including cached prompt tokens
+            "stream_options": {"include_usage": True}
         }
         
         # Use max_tokens parameter if provided, else fall back to model_instance or default
@@ -145,10 +512,19 @@ class OpenAIClient(BaseAIClient):
             params["temperature"] = temperature
 
         try:
-            response = self.client.chat.completions.create(**params)
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            response = self._sdk(streaming=True).chat.completions.create(**params)
+            try:
+                for chunk in response:
+                    if chunk.usage:
+                        self._record_usage(usage_from_openai(chunk.usage))
+                    if not chunk.choices:
+                        continue
+                    if chunk.choices[0].finish_reason:
+                        self._stream_stop_reason = chunk.choices[0].finish_reason
+                    if chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                response.close()
         except Exception as e:
             logger.error(f"OpenAI streaming error: {e}")
             raise
@@ -157,7 +533,7 @@ class OpenAIClient(BaseAIClient):
         """OpenAI non-streaming fallback implementation."""
         params = {
             "model": self.model_name,
-            "messages": messages,
+            "messages": self._strip_cache_markers(messages),
             "stream": False
         }
         
@@ -177,14 +553,17 @@ class OpenAIClient(BaseAIClient):
             params["temperature"] = temperature
 
         try:
-            response = self.client.chat.completions.create(**params)
+            response = self._sdk().chat.completions.create(**params)
+            self._record_usage(usage_from_openai(response.usage))
             return {
                 'status': 'success',
                 'response': response.choices[0].message.content,
                 'raw_response': response,
                 'completion_attempts': 1,
                 'was_continued': False,
-                'used_streaming': False
+                'used_streaming': False,
+                'stop_reason': response.choices[0].finish_reason,
+                'usage': self.last_usage.as_dict() if self.last_usage else None
             }
         except Exception as e:
             logger.error(f"OpenAI non-streaming error: {e}")
@@ -194,13 +573,18 @@ class OpenAIClient(BaseAIClient):
                 'response': '',
                 'completion_attempts': 1,
                 'was_continued': False,
-                'used_streaming': False
+                'used_streaming': False,
+                'transient': circuit_breaker.is_transient(e)
             }
 
 class AnthropicClient(BaseAIClient):
-    def __init__(self, api_key, model_name, model_instance=None):
-        super().__init__(api_key, model_name, model_instance)
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+    TRUNCATED_STOP_REASONS = ('max_tokens',)
+    TIMEOUT_TYPE = anthropic.Timeout
+
+    def __init__(self, api_key, model_name, model_instance=None, deadline=None):
+        super().__init__(api_key, model_name, model_instance, deadline)
+        self.client = anthropic.Anthropic(api_key=self.api_key,
+                                          timeout=anthropic.Timeout(**deadlines.request_timeouts()))
         self.provider = 'anthropic'
 
     def _get_default_max_tokens(self):
@@ -220,13 +604,34 @@ class AnthropicClient(BaseAIClient):
         else:
             return 8192   # Conservative default for unknown models
 
-    def _stream_response(self, messages, temperature=None, max_tokens=None):
-        """Anthropic streaming implementation."""
-        # Anthropic's API requires the system message to be passed separately
+    @staticmethod
+    def _cached_content(content):
+        """Content blocks for a cache-marked message, with a cache breakpoint on the last block."""
+        blocks = [{"type": "text", "text": content}] if isinstance(content, str) else [dict(b) for b in content]
+        blocks[-1]["cache_control"] = {"type": "ephemeral"}
+        return blocks
+
+    def _split_system(self, messages):
+        """
+        Separate the system message (Anthropic's API takes it as its own
+        parameter) and turn "cache": True markers into cache_control blocks.
+        """
         system_message = ""
         if messages and messages[0]['role'] == 'system':
-            system_message = messages[0]['content']
+            system = messages[0]
+            system_message = self._cached_content(system['content']) if system.get('cache') else system['content']
             messages = messages[1:]
+        converted = []
+        for msg in messages:
+            if msg.get('cache'):
+                converted.append({"role": msg['role'], "content": self._cached_content(msg['content'])})
+            else:
+                converted.append({k: v for k, v in msg.items() if k != 'cache'})
+        return system_message, converted
+
+    def _stream_response(self, messages, temperature=None, max_tokens=None):
+        """Anthropic streaming implementation."""
+        system_message, messages = self._split_system(messages)
 
         # Use max_tokens parameter if provided, else fall back to model_instance or default
         if max_tokens is not None:
@@ -249,25 +654,20 @@ class AnthropicClient(BaseAIClient):
 
         try:
             # Anthropic streaming API - no 'stream' parameter needed
-            with self.client.messages.stream(**params) as stream:
+            with self._sdk(streaming=True).messages.stream(**params) as stream:
                 for chunk in stream:
                     if chunk.type == "content_block_delta":
                         yield chunk.delta.text
+                final_message = stream.get_final_message()
+                self._stream_stop_reason = final_message.stop_reason
+                self._record_usage(usage_from_anthropic(final_message.usage))
         except Exception as e:
             logger.error(f"Anthropic streaming error: {e}")
             raise
 
     def _get_response_without_streaming(self, messages, temperature=None, max_tokens=None):
-        """Anthropic non-streaming fallback with continuation logic."""
-        return self._get_response_with_continuation(messages, temperature, max_tokens=max_tokens)
-
-    def _get_response_with_continuation(self, messages, temperature=None, max_retries=3, max_tokens=None):
-        """Original continuation-based approach as fallback."""
-        # Anthropic's API requires the system message to be passed separately
-        system_message = ""
-        if messages and messages[0]['role'] == 'system':
-            system_message = messages[0]['content']
-            messages = messages[1:]
+        """Anthropic non-streaming implementation."""
+        system_message, messages = self._split_system(messages)
 
         # Use max_tokens parameter if provided, else fall back to model_instance or default
         if max_tokens is not None:
@@ -302,87 +702,18 @@ class AnthropicClient(BaseAIClient):
             params["temperature"] = temperature
 
         try:
-            # Initial API call
-            response = self.client.messages.create(**params)
-            initial_response = response.content[0].text
-            
-            logger.info(f"Initial non-streaming response length: {len(initial_response)} chars")
-            
-            # Check if response is complete
-            if not self._is_response_incomplete(initial_response):
-                logger.info("Non-streaming response appears complete")
-                return {
-                    'status': 'success',
-                    'response': initial_response,
-                    'raw_response': response,
-                    'completion_attempts': 1,
-                    'was_continued': False,
-                    'used_streaming': False
-                }
-            
-            # Response appears incomplete, attempt continuation
-            logger.warning("Non-streaming response incomplete, attempting continuation...")
-            combined_response = initial_response
-            continuation_attempts = 0
-            
-            for attempt in range(max_retries):
-                continuation_attempts += 1
-                logger.info(f"Continuation attempt {continuation_attempts}/{max_retries}")
-                
-                # Create continuation prompt
-                continuation_messages = self._create_continuation_prompt(messages, combined_response)
-                
-                # Prepare continuation parameters
-                continuation_params = params.copy()
-                continuation_params["messages"] = continuation_messages
-                
-                try:
-                    # Wait a bit to avoid rate limiting
-                    time.sleep(1)
-                    
-                    # Make continuation API call
-                    continuation_response = self.client.messages.create(**continuation_params)
-                    continuation_text = continuation_response.content[0].text
-                    
-                    logger.info(f"Continuation {continuation_attempts} length: {len(continuation_text)} chars")
-                    
-                    # Combine responses intelligently
-                    if continuation_text.strip():
-                        # Remove any repetition from the beginning of continuation
-                        continuation_clean = self._clean_continuation_text(combined_response, continuation_text)
-                        combined_response = combined_response + "\n\n" + continuation_clean
-                        
-                        # Check if this continuation completes the response
-                        if not self._is_response_incomplete(continuation_clean):
-                            logger.info(f"Response completed after {continuation_attempts} continuation(s)")
-                            return {
-                                'status': 'success',
-                                'response': combined_response,
-                                'raw_response': response,
-                                'completion_attempts': continuation_attempts + 1,
-                                'was_continued': True,
-                                'used_streaming': False
-                            }
-                    else:
-                        logger.warning(f"Empty continuation response on attempt {continuation_attempts}")
-                        break
-                        
-                except Exception as e:
-                    logger.error(f"Error in continuation attempt {continuation_attempts}: {e}")
-                    break
-            
-            # Return combined response even if not fully complete
-            logger.warning(f"Returning potentially incomplete response after {continuation_attempts} attempts")
+            response = self._sdk().messages.create(**params)
+            self._record_usage(usage_from_anthropic(response.usage))
             return {
                 'status': 'success',
-                'response': combined_response,
+                'response': response.content[0].text,
                 'raw_response': response,
-                'completion_attempts': continuation_attempts + 1,
-                'was_continued': True,
+                'completion_attempts': 1,
+                'was_continued': False,
                 'used_streaming': False,
-                'warning': 'Response may still be incomplete after maximum retry attempts'
+                'stop_reason': response.stop_reason,
+                'usage': self.last_usage.as_dict() if self.last_usage else None
             }
-            
         except Exception as e:
             logger.error(f"Error in Anthropic non-streaming call: {e}")
             return {
@@ -391,127 +722,26 @@ class AnthropicClient(BaseAIClient):
                 'response': '',
                 'completion_attempts': 1,
                 'was_continued': False,
-                'used_streaming': False
+                'used_streaming': False,
+                'transient': circuit_breaker.is_transient(e)
             }
 
-    def _is_response_incomplete(self, response_text):
+    def _continuation_messages(self, messages, partial_response):
         """
-        Detect if a response appears to be incomplete or truncated.
-        
-        Args:
-            response_text (str): The response text to analyze
-            
-        Returns:
-            bool: True if response appears incomplete
+        Prefill the partial answer as the assistant turn; Claude resumes it
+        mid-sentence without a separate instruction. Trailing whitespace is
+        not allowed in a prefill.
         """
-        if not response_text or not response_text.strip():
-            return True
-            
-        response_text = response_text.strip()
-        
-        # Check for common truncation indicators
-        truncation_indicators = [
-            # Incomplete sentences
-            r'[a-zA-Z0-9]\s*$',  # Ends with alphanumeric character (no punctuation)
-            # Incomplete code blocks
-            r'```[^`]*$',  # Unclosed code block
-            # Incomplete analysis sections
-            r'(Analysis|Review|Check|Summary|Conclusion):\s*$',  # Section header with no content
-            # Incomplete lists
-            r'\d+\.\s*$',  # Numbered list item with no content
-            r'[-*]\s*$',   # Bullet point with no content
-            # Incomplete explanations
-            r'(because|since|therefore|however|moreover|furthermore|additionally)\s*$',
-            # Incomplete code or technical content
-            r'(function|class|def|if|for|while|try)\s*$',
-        ]
-        
-        for pattern in truncation_indicators:
-            if re.search(pattern, response_text, re.IGNORECASE | re.MULTILINE):
-                logger.warning(f"Detected potential truncation with pattern: {pattern}")
-                return True
-        
-        # Check for very short responses that seem incomplete for analysis tasks
-        if len(response_text) < 50:
-            logger.warning(f"Response too short ({len(response_text)} chars), likely incomplete")
-            return True
-            
-        # Check for incomplete sentences (no ending punctuation in last 100 chars)
-        last_part = response_text[-100:].strip()
-        if last_part and not re.search(r'[.!?;}\])]$', last_part):
-            logger.warning("Response doesn't end with proper punctuation, likely incomplete")
-            return True
-            
-        return False
-
-    def _create_continuation_prompt(self, original_messages, partial_response):
-        """
-        Create a continuation prompt to complete an incomplete response.
-        
-        Args:
-            original_messages (list): Original conversation messages
-            partial_response (str): The incomplete response received
-            
-        Returns:
-            list: Updated messages for continuation
-        """
-        # Create continuation messages
-        continuation_messages = original_messages.copy()
-        
-        # Add the partial response as an assistant message
-        continuation_messages.append({
-            "role": "assistant", 
-            "content": partial_response
-        })
-        
-        # Add continuation prompt
-        continuation_messages.append({
-            "role": "user",
-            "content": "Please continue your previous response from where you left off. Complete the analysis or explanation that was cut off."
-        })
-        
-        return continuation_messages
+        return list(messages) + [{"role": "assistant", "content": partial_response.rstrip()}]
 
-
-    def _clean_continuation_text(self, original_text, continuation_text):
-        """
-        Clean continuation text to remove repetition from the original response.
-        
-        Args:
-            original_text (str): The original response text
-            continuation_text (str): The continuation text
-            
-        Returns:
-            str: Cleaned continuation text
-        """
-        if not continuation_text.strip():
-            return continuation_text
-            
-        # Get the last 200 characters of original text for overlap detection
-        original_end = original_text[-200:].strip() if len(original_text) > 200 else original_text.strip()
-        continuation_start = continuation_text[:200].strip()
-        
-        # Look for overlap and remove it
-        words_original = original_end.split()
-        words_continuation = continuation_start.split()
-        
-        # Find the longest common suffix/prefix overlap
-        max_overlap = min(len(words_original), len(words_continuation), 10)  # Limit overlap check
-        
-        for overlap_len in range(max_overlap, 0, -1):
-            if words_original[-overlap_len:] == words_continuation[:overlap_len]:
-                # Remove the overlapping part from continuation
-                remaining_words = words_continuation[overlap_len:]
-                cleaned_continuation = ' '.join(remaining_words)
-                logger.info(f"Removed {overlap_len} overlapping words from continuation")
-                return cleaned_continuation
-        
-        # No significant overlap found, return original continuation
-        return continuation_text
+    def _join_continuation(self, partial_response, continuation_text):
+        return partial_response.rstrip() + continuation_text
 
 class GeminiClient(BaseAIClient):
-    def __init__(self, api_key, model_name, model_instance=None):
-        super().__init__(api_key, model_name, model_instance)
+    TRUNCATED_STOP_REASONS = ('MAX_TOKENS',)
+
+    def __init__(self, api_key, model_name, model_instance=None, deadline=None):
+        super().__init__(api_key, model_name, model_instance, deadline)
         genai.configure(api_key=self.api_key)
         self.client = genai.GenerativeModel(self.model_name)
         self.provider = 'gemini'
@@ -526,6 +756,15 @@ class GeminiClient(BaseAIClient):
         else:
             return 8192  # Default for Gemini models
 
+    @staticmethod
+    def _finish_reason(response):
+        """Name of the first candidate's finish reason (e.g. 'STOP', 'MAX_TOKENS')."""
+        candidates = getattr(response, 'candidates', None)
+        if not candidates or not candidates[0].finish_reason:
+            return None
+        reason = candidates[0].finish_reason
+        return getattr(reason, 'name', str(reason))
+
     def _stream_response(self, messages, temperature=None, max_tokens=None):
         """Gemini streaming implementation."""
         # Gemini's API has a different structure for messages
@@ -548,12 +787,16 @@ class GeminiClient(BaseAIClient):
             response_stream = self.client.generate_content(
                 gemini_messages, 
                 generation_config=generation_config,
-                stream=True
+                stream=True,
+                # Gemini takes one overall timeout; the streaming loop enforces the deadline
+                request_options={"timeout": deadlines.request_seconds(self.deadline, streaming=True)}
             )
             
             for chunk in response_stream:
+                self._stream_stop_reason = self._finish_reason(chunk) or self._stream_stop_reason
                 if hasattr(chunk, 'text') and chunk.text:
                     yield chunk.text
+            self._record_usage(usage_from_gemini(getattr(response_stream, 'usage_metadata', None)))
         except Exception as e:
             logger.error(f"Gemini streaming error: {e}")
             raise
@@ -574,14 +817,19 @@ class GeminiClient(BaseAIClient):
             generation_config["temperature"] = temperature
 
         try:
-            response = self.client.generate_content(gemini_messages, generation_config=generation_config)
+            response = self.client.generate_content(
+                gemini_messages, generation_config=generation_config,
+                request_options={"timeout": deadlines.request_seconds(self.deadline)})
+            self._record_usage(usage_from_gemini(getattr(response, 'usage_metadata', None)))
             return {
                 'status': 'success',
                 'response': response.text,
                 'raw_response': response,
                 'completion_attempts': 1,
                 'was_continued': False,
-                'used_streaming': False
+                'used_streaming': False,
+                'stop_reason': self._finish_reason(response),
+                'usage': self.last_usage.as_dict() if self.last_usage else None
             }
         except Exception as e:
             logger.error(f"Gemini non-streaming error: {e}")
@@ -591,10 +839,11 @@ class GeminiClient(BaseAIClient):
                 'response': '',
                 'completion_attempts': 1,
                 'was_continued': False,
-                'used_streaming': False
+                'used_streaming': False,
+                'transient': circuit_breaker.is_transient(e)
             }
 
-def get_ai_client(provider, api_key, model_name, model_instance=None):
+def get_ai_client(provider, api_key, model_name, model_instance=None, deadline=None):
     """
     Get an AI client for the specified provider.
     
@@ -603,16 +852,18 @@ def get_ai_client(provider, api_key, model_name, model_instance=None):
         api_key (str): API key for the provider
         model_name (str): Name of the model to use
         model_instance (LLMModel, optional): Database model instance containing configuration
+        deadline (Deadline, optional): Job deadline (eval.utils.deadlines) that caps
+            every request's timeouts, continuations and retries
     
     Returns:
         BaseAIClient: Configured AI client instance
     """
     provider = provider.lower()
     if provider == 'openai':
-        return OpenAIClient(api_key, model_name, model_instance)
+        return OpenAIClient(api_key, model_name, model_instance, deadline=deadline)
     elif provider == 'anthropic':
-        return AnthropicClient(api_key, model_name, model_instance)
+        return AnthropicClient(api_key, model_name, model_instance, deadline=deadline)
     elif provider == 'gemini':
-        return GeminiClient(api_key, model_name, model_instance)
+        return GeminiClient(api_key, model_name, model_instance, deadline=deadline)
     else:
         raise ValueError(f"Unsupported AI provider: {provider}")
@@ -1,18 +1,24 @@
 import os
 import json
-from openai import OpenAI
+from openai import OpenAI, Timeout
 
-def analyze_reasoning_for_files(filepaths, api_key):
+from eval.utils import deadlines
+
+def analyze_reasoning_for_files(filepaths, api_key, deadline=None):
     """
     Analyzes logical reasoning for each JSON file in filepaths using the OpenAI API.
     
     Args:
         filepaths: List of paths to JSON files.
         api_key: Your OpenAI API key.
+        deadline: eval.utils.deadlines.Deadline for all the requests; by
+            default LLM_DEFAULT_JOB_DEADLINE from now.
 
     Returns:
         A dictionary mapping each JSON file's basename to its analysis results.
     """
+    if deadline is None:
+        deadline = deadlines.default_deadline('reasoning analysis')
     # Initialize OpenAI client
     client = OpenAI(api_key=api_key)
     results = {}
@@ -45,7 +51,8 @@ def analyze_reasoning_for_files(filepaths, api_key):
                 f"Sections:\n{thoughts_sections}"
             )
             
-            response = client.chat.completions.create(
+            # Timeouts cut down to what the earlier files left of the deadline
+            response = client.with_options(**deadlines.sdk_options(Timeout, deadline)).chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_message},
@@ -0,0 +1,239 @@
+"""
+Circuit breakers for LLM providers, one per (provider, model).
+
+Each process keeps a rolling window of call outcomes per breaker. Once enough
+of them fail (timeouts, connection errors, 429 and 5xx responses, or calls
+slower than LLM_BREAKER_SLOW_CALL_SECONDS) the breaker opens and its state goes to the shared cache, so every worker fails
+fast with CircuitOpenError instead of waiting out SDK timeouts. After
+LLM_BREAKER_COOLDOWN seconds one caller, fleet-wide, gets through as a probe
+(half-open): success closes the breaker, failure opens it again. The probe is
+claimed with a database lock (eval.utils.shared_locks), since the cache's
+add() is not atomic on the default file backend.
+
+Errors that are about the request rather than the provider (400 for an
+oversized prompt, 401/403 for one project's bad API key) don't count: the
+breaker is shared by every project using the model.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from coreproject import metrics
+
+from . import shared_locks
+from .deadlines import DeadlineExceeded, is_timeout
+
+logger = logging.getLogger(__name__)
+
+LLM_BREAKER_WINDOW = getattr(settings, 'LLM_BREAKER_WINDOW', 60)
+LLM_BREAKER_MIN_CALLS = getattr(settings, 'LLM_BREAKER_MIN_CALLS', 5)
+LLM_BREAKER_ERROR_RATE = getattr(settings, 'LLM_BREAKER_ERROR_RATE', 0.5)
+LLM_BREAKER_SLOW_CALL_SECONDS = getattr(settings, 'LLM_BREAKER_SLOW_CALL_SECONDS', 120)
+LLM_BREAKER_COOLDOWN = getattr(settings, 'LLM_BREAKER_COOLDOWN', 30)
+# How long a probe may take before another caller may probe
+LLM_BREAKER_PROBE_TIMEOUT = getattr(settings, 'LLM_BREAKER_PROBE_TIMEOUT', 300)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_INDEX_KEY = 'llm_breaker_index'
+
+# Every provider request goes through call(), so it is timed here
+llm_request_seconds = metrics.Histogram(
+    'llm_request_duration_seconds', 'LLM provider requests (with continuations) by provider, model and outcome',
+    ['provider', 'model', 'outcome'], buckets=metrics.SLOW_BUCKETS)
+llm_rejected = metrics.Counter(
+    'llm_requests_rejected_total', 'LLM requests failed fast by an open circuit', ['provider', 'model'])
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# How the SDKs word timeouts, connection errors and 408/429/5xx responses
+_TRANSIENT_MESSAGE = re.compile(
+    r'Error code: (?:408|429|5\d\d)\b|timed out|timeout|connection error|overloaded|rate limit'
+    r'|service unavailable|internal server error|bad gateway', re.IGNORECASE)
+
+
+def is_transient(error):
+    """Whether an SDK exception says the provider is struggling, as opposed to a bad request or key."""
+    if isinstance(error, DeadlineExceeded):
+        # The job ran out of its own time budget
+        return False
+    if isinstance(error, ConnectionError) or is_timeout(error):
+        return True
+    # OpenAI/Anthropic errors have status_code, google.api_core errors an HTTP code
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    return any('Connection' in cls.__name__ for cls in type(error).__mro__)
+
+
+def is_transient_message(text):
+    """is_transient() for an error that was already turned into text."""
+    return bool(text) and bool(_TRANSIENT_MESSAGE.search(text))
+
+
+class CircuitBreaker:
+    def __init__(self, provider, model_name):
+        self.provider = (provider or 'unknown').lower()
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._outcomes = deque()
+        suffix = f'{self.provider}_{model_name}'
+        self._state_key = f'llm_breaker_state_{suffix}'
+        self._probe_lock = f'llm_breaker_probe_{suffix}'
+
+    @property
+    def label(self):
+        return f'{self.provider}/{self.model_name}'
+
+    def shared_state(self):
+        """{'state', 'opened_at', 'failures', 'calls', 'last_error'}; closed when nothing is recorded."""
+        try:
+            state = cache.get(self._state_key)
+        except Exception:
+            state = None
+        if not state or state['state'] == CLOSED:
+            return {'state': CLOSED, 'opened_at': None, 'failures': 0, 'calls': 0, 'last_error': ''}
+        if time.time() >= state['opened_at'] + LLM_BREAKER_COOLDOWN:
+            state = dict(state, state=HALF_OPEN)
+        return state
+
+    def before_call(self):
+        """
+        Return the probe lock's token if this call is the half-open probe, None
+        for a normal call; raise CircuitOpenError while the breaker is open.
+        """
+        state = self.shared_state()
+        if state['state'] == CLOSED:
+            return None
+        if state['state'] == HALF_OPEN:
+            try:
+                probe = shared_locks.acquire(self._probe_lock, LLM_BREAKER_PROBE_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Could not claim the probe for {self.label}: {e}")
+                probe = None
+            if probe is not None:
+                logger.info(f"Circuit for {self.label} half-open, sending a probe request")
+                return probe
+        retry_at = datetime.fromtimestamp(state['opened_at'] + LLM_BREAKER_COOLDOWN).strftime('%H:%M:%S')
+        raise CircuitOpenError(
+            f"{self.label} is unavailable: {state['failures']} of the last {state['calls']} calls failed "
+            f"(last error: {state['last_error'] or 'slow responses'}). Failing fast until a probe "
+            f"succeeds; next probe after {retry_at}.")
+
+    def record(self, failed, error='', probe=None):
+        if probe is not None:
+            try:
+                shared_locks.release(self._probe_lock, probe)
+            except Exception as e:
+                # It expires after LLM_BREAKER_PROBE_TIMEOUT
+                logger.warning(f"Could not release the probe for {self.label}: {e}")
+            if failed:
+                logger.warning(f"Probe to {self.label} failed ({error}); circuit stays open")
+                self._open(1, 1, error)
+            else:
+                logger.info(f"Probe to {self.label} succeeded; closing circuit")
+                with self._lock:
+                    self._outcomes.clear()
+                cache.delete(self._state_key)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._outcomes.append((now, failed))
+            while self._outcomes and self._outcomes[0][0] < now - LLM_BREAKER_WINDOW:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, f in self._outcomes if f)
+        if failed and calls >= LLM_BREAKER_MIN_CALLS and failures / calls >= LLM_BREAKER_ERROR_RATE:
+            logger.error(f"Opening circuit for {self.label}: {failures}/{calls} calls failed in {LLM_BREAKER_WINDOW}s")
+            self._open(failures, calls, error)
+            with self._lock:
+                self._outcomes.clear()
+
+    def _open(self, failures, calls, error):
+        state = {
+            'state': OPEN, 'opened_at': time.time(), 'failures': failures, 'calls': calls,
+            'last_error': (error or '')[:200],
+        }
+        try:
+            cache.set(self._state_key, state, timeout=None)
+            index = set(map(tuple, cache.get(_INDEX_KEY) or ()))
+            if (self.provider, self.model_name) not in index:
+                cache.set(_INDEX_KEY, sorted(index | {(self.provider, self.model_name)}), timeout=None)
+        except Exception as e:
+            logger.warning(f"Could not share circuit state for {self.label}: {e}")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(provider, model_name):
+    key = ((provider or 'unknown').lower(), model_name)
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(*key)
+        return _breakers[key]
+
+
+def is_open(provider, model_name):
+    """True while calls to the model fail fast (open, not yet due for a probe)."""
+    return breaker(provider, model_name).shared_state()['state'] == OPEN
+
+
+def call(provider, model_name, fn, is_failure=None, latency=None):
+    """
+    Run fn() through the breaker for (provider, model_name). is_failure(result)
+    flags results that report a provider failure without raising (see
+    is_transient()); latency(result, elapsed) gives the seconds compared with
+    LLM_BREAKER_SLOW_CALL_SECONDS. Exceptions count only if is_transient().
+    """
+    b = breaker(provider, model_name)
+    try:
+        probe = b.before_call()
+    except CircuitOpenError:
+        llm_rejected.inc(provider=b.provider, model=model_name)
+        raise
+    started = time.monotonic()
+    try:
+        result = fn()
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        llm_request_seconds.observe(
+            time.monotonic() - started, provider=b.provider, model=model_name, outcome='exception')
+        b.record(is_transient(e), str(e), probe)
+        raise
+    elapsed = time.monotonic() - started
+    error = is_failure(result) if is_failure else ''
+    llm_request_seconds.observe(
+        elapsed, provider=b.provider, model=model_name, outcome='error' if error else 'success')
+    seconds = latency(result, elapsed) if latency else elapsed
+    if not error and seconds > LLM_BREAKER_SLOW_CALL_SECONDS:
+        error = f'slow response ({seconds:.0f}s)'
+    b.record(bool(error), error, probe)
+    return result
+
+
+def states():
+    """Shared state of every breaker that has opened, for diagnostics."""
+    try:
+        index = cache.get(_INDEX_KEY) or ()
+    except Exception:
+        index = ()
+    rows = []
+    for provider, model_name in index:
+        state = breaker(provider, model_name).shared_state()
+        rows.append(dict(state, provider=provider, model=model_name, label=f'{provider}/{model_name}'))
+    return rows
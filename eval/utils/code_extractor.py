@@ -0,0 +1,290 @@
+"""
+Implementation-code extraction for Colab review jobs.
+
+The notebook markdown is tokenized once into headings and fenced code blocks;
+every strategy below works on that token list instead of re-scanning the text.
+All patterns are compiled at import time and keyword checks are set lookups on
+the leading word of a line.
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+FENCE = '```'
+# Blocks shorter than this are treated as examples when falling back to all blocks
+SUBSTANTIAL_BLOCK_CHARS = 30
+# Fewer code-like lines than this is not worth sending for review
+MIN_LOOSE_CODE_LINES = 6
+
+# Section headings that mark the implementation, in priority order
+SECTION_PATTERNS = [
+    re.compile(r'implementation', re.IGNORECASE),
+    re.compile(r'code', re.IGNORECASE),
+    re.compile(r'solution', re.IGNORECASE),
+    re.compile(r'answer', re.IGNORECASE),
+    re.compile(r'final.*code', re.IGNORECASE),
+]
+
+_LEADING_WORD = re.compile(r'([#A-Za-z_]\w*)(.?)')
+_CALL_LINE = re.compile(r'[a-zA-Z_]\w*\s*\(.*\)\s*$')
+_CALL_OR_DECL_LINE = re.compile(r'[a-zA-Z_]\w*\s*\(.*\)\s*[{;]?\s*$')
+_INDEX_LINE = re.compile(r'[a-zA-Z_]\w*\s*\[.*\]\s*$')
+
+FENCE_LANGUAGES = {
+    'python': 'python', 'py': 'python',
+    'cpp': 'cpp', 'c++': 'cpp', 'c': 'cpp',
+    'java': 'java',
+    'javascript': 'javascript', 'js': 'javascript',
+}
+
+# Substrings that identify a language, checked in this priority order
+LANGUAGE_HINTS = [
+    ('cpp', ['#include', 'iostream', 'std::', 'int main', 'cout', 'cin']),
+    ('python', ['def ', 'import ', 'from ', 'print(', 'len(', 'range(']),
+    ('java', ['public class', 'public static void', 'system.out', 'string[]']),
+    ('javascript', ['function', 'console.log', 'var ', 'let ', 'const ']),
+]
+_LANGUAGE_PRIORITY = [language for language, _ in LANGUAGE_HINTS]
+_HINT_LANGUAGE = {hint: language for language, hints in reversed(LANGUAGE_HINTS) for hint in hints}
+_LANGUAGE_HINT_PATTERN = re.compile('|'.join(
+    re.escape(hint) for hint in sorted(_HINT_LANGUAGE, key=len, reverse=True)))
+
+
+def _keywords(*entries):
+    """
+    Build a set of (word, next_char) pairs from line-prefix keywords.
+
+    'def ' becomes ('def', ' ') and 'cout' becomes ('cout', ''), where an
+    empty next_char means any character may follow the word.
+    """
+    keys = set()
+    for entry in entries:
+        match = _LEADING_WORD.match(entry)
+        word, rest = match.group(1), entry[match.end(1):]
+        keys.add((word, rest[:1]))
+    return frozenset(keys)
+
+
+LINE_KEYWORDS = {
+    'cpp': _keywords(
+        '#include', 'using', 'int ', 'float ', 'double ', 'char ', 'bool ', 'void ', 'string ', 'if ',
+        'for ', 'while ', 'do ', 'switch ', 'case ', 'return ', 'cout', 'cin', 'std:', 'class ',
+        'struct ', 'namespace '),
+    'python': _keywords(
+        'def ', 'class ', 'import ', 'from ', 'if ', 'for ', 'while ', 'try:', 'except:', 'with ',
+        'return ', 'print(', 'len('),
+    'java': _keywords(
+        'public ', 'private ', 'protected ', 'static ', 'class ', 'interface ', 'if ', 'for ',
+        'while ', 'do ', 'switch ', 'case ', 'return ', 'System.', 'import ', 'package '),
+}
+
+
+def _find_fence(content, pos):
+    """Offset of the next ``` that starts a line (after indentation), or -1."""
+    index = content.find(FENCE, pos)
+    while index != -1:
+        line_start = content.rfind('\n', 0, index) + 1
+        if not content[line_start:index].strip(' \t'):
+            return index
+        index = content.find(FENCE, index + len(FENCE))
+    return -1
+
+
+def _collect_headings(content, start, stop, headings):
+    """Append every '#' line starting in content[start:stop]."""
+    if start == 0 and content.startswith('#'):
+        index = 0
+    else:
+        index = content.find('\n#', max(start - 1, 0), stop)
+        index = index + 1 if index != -1 else -1
+    while index != -1:
+        line_end = content.find('\n', index, stop)
+        line = content[index:line_end if line_end != -1 else stop]
+        rest = line.lstrip('#')
+        headings.append((index, rest.strip(), not rest or rest[0].isspace()))
+        if line_end == -1:
+            break
+        index = content.find('\n#', line_end, stop)
+        index = index + 1 if index != -1 else -1
+
+
+def tokenize(content):
+    """
+    Split markdown into headings and fenced code blocks in one forward pass.
+
+    Returns (headings, blocks) ordered by offset. headings holds (offset,
+    title, is_boundary) for '#' lines outside fences, where is_boundary means
+    the hashes are followed by whitespace. blocks holds (offset, language,
+    code) for closed fences; an unclosed fence is ignored.
+    """
+    headings = []
+    blocks = []
+    pos = 0
+    length = len(content)
+    while pos < length:
+        fence = _find_fence(content, pos)
+        _collect_headings(content, pos, fence if fence != -1 else length, headings)
+        if fence == -1:
+            break
+        line_end = content.find('\n', fence)
+        info = content[fence + len(FENCE):line_end if line_end != -1 else length]
+        if FENCE in info:
+            # Single-line block: ```code```
+            code = info[:info.index(FENCE)]
+            if code:
+                blocks.append((fence, None, code))
+            pos = fence + len(FENCE) + info.index(FENCE) + len(FENCE)
+            continue
+        close = content.find(FENCE, line_end + 1) if line_end != -1 else -1
+        if close == -1:
+            _collect_headings(content, fence + len(FENCE), length, headings)
+            break
+        blocks.append((fence, FENCE_LANGUAGES.get(info.strip().lower()), content[line_end + 1:close]))
+        pos = close + len(FENCE)
+    return headings, blocks
+
+
+def detect_language(content):
+    """Guess the language from keyword hints anywhere in the content."""
+    found = set()
+    for match in _LANGUAGE_HINT_PATTERN.finditer(content.lower()):
+        language = _HINT_LANGUAGE[match.group(0)]
+        if language == _LANGUAGE_PRIORITY[0]:
+            return language
+        found.add(language)
+    for language in _LANGUAGE_PRIORITY:
+        if language in found:
+            return language
+    return 'unknown'
+
+
+def _starts_with_keyword(stripped, keywords):
+    match = _LEADING_WORD.match(stripped)
+    if not match:
+        return False
+    word, next_char = match.groups()
+    return (word, next_char) in keywords or (word, '') in keywords
+
+
+def _has_assignment(stripped):
+    return '=' in stripped and not stripped.startswith('=')
+
+
+def is_code_line(line, language):
+    """Heuristic used when the notebook has no fenced code at all."""
+    stripped = line.strip()
+    if not stripped:
+        return False
+    if line.startswith(('    ', '\t')):
+        return True
+
+    if language == 'cpp':
+        return (_starts_with_keyword(stripped, LINE_KEYWORDS['cpp'])
+                or stripped.endswith((';', '{', '}'))
+                or _has_assignment(stripped)
+                or bool(_CALL_OR_DECL_LINE.match(stripped))
+                or '<<' in line or '>>' in line)
+    if language == 'python':
+        return (_starts_with_keyword(stripped, LINE_KEYWORDS['python'])
+                or _has_assignment(stripped)
+                or stripped.endswith(':')
+                or bool(_CALL_LINE.match(stripped))
+                or bool(_INDEX_LINE.match(stripped))
+                or stripped.startswith(('>>> ', '... ')))
+    if language == 'java':
+        return (_starts_with_keyword(stripped, LINE_KEYWORDS['java'])
+                or stripped.endswith((';', '{', '}'))
+                or _has_assignment(stripped))
+    return ('{' in line or '}' in line
+            or ('(' in line and ')' in line)
+            or ('[' in line and ']' in line)
+            or _has_assignment(stripped)
+            or stripped.endswith(';'))
+
+
+def _block_language(blocks):
+    for _, language, _ in blocks:
+        if language:
+            return language
+    return 'unknown'
+
+
+def _section_blocks(headings, blocks):
+    """Blocks under the first heading matching each SECTION_PATTERNS entry, by priority."""
+    for pattern in SECTION_PATTERNS:
+        for index, (start, title, _) in enumerate(headings):
+            if not pattern.match(title):
+                continue
+            end = next((offset for offset, _, is_boundary in headings[index + 1:] if is_boundary), None)
+            section = [block for block in blocks if block[0] > start and (end is None or block[0] < end)]
+            if section:
+                return section
+            # Only the first matching heading counts for a pattern
+            break
+    return []
+
+
+def _loose_code_lines(lines, language):
+    """Runs of code-like lines (with blank lines inside a run) from unfenced content."""
+    code_lines = []
+    current_block = []
+    in_code_block = False
+    for line in lines:
+        if is_code_line(line, language):
+            current_block.append(line)
+            in_code_block = True
+        elif in_code_block and not line.strip():
+            current_block.append(line)
+        elif in_code_block:
+            code_lines.extend(current_block)
+            current_block = []
+            in_code_block = False
+    code_lines.extend(current_block)
+    return code_lines
+
+
+def _is_potential_code(line):
+    return bool(line.strip()) and (
+        '{' in line or '}' in line
+        or ('(' in line and ')' in line)
+        or ('[' in line and ']' in line)
+        or '=' in line or ';' in line
+        or line.count(' ') > 3
+        or line.startswith(('    ', '\t')))
+
+
+def extract_implementation(content):
+    """
+    Pull the implementation code out of notebook markdown.
+
+    Tries, in order: fenced blocks under an Implementation/Code/Solution/Answer
+    heading, all substantial fenced blocks, code-like lines for the detected
+    language, and finally any code-looking lines. Returns (code, language).
+    """
+    if not content:
+        return '', 'unknown'
+
+    headings, blocks = tokenize(content)
+
+    chosen = _section_blocks(headings, blocks)
+    if not chosen and blocks:
+        chosen = [block for block in blocks if len(block[2].strip()) > SUBSTANTIAL_BLOCK_CHARS] or blocks
+    if chosen:
+        code = '\n\n'.join(block[2] for block in chosen).strip()
+        if code:
+            logger.debug("Extracted %d fenced code blocks", len(chosen))
+            return code, _block_language(chosen)
+
+    language = detect_language(content)
+    lines = content.split('\n')
+    code_lines = _loose_code_lines(lines, language)
+    if code_lines:
+        logger.debug("Extracted %d lines of %s-like code", len(code_lines), language)
+        return '\n'.join(code_lines).strip(), language
+
+    potential = [line for line in lines if _is_potential_code(line)]
+    if len(potential) >= MIN_LOOSE_CODE_LINES:
+        logger.debug("Using %d potential code lines", len(potential))
+        return '\n'.join(potential).strip(), language
+    return '', language
@@ -0,0 +1,129 @@
+"""
+Per-job deadlines for LLM calls.
+
+Every LLMJob has a time budget that starts when the job is created, or when
+an admin last retried it by hand; its length depends on the job type
+(LLM_JOB_DEADLINES). The job's Deadline is
+handed to the AI client or call_llm_api, and each provider request gets
+explicit timeouts cut down to whatever is left of it: a connect timeout, a
+read timeout for a whole blocking response, and a stream-idle timeout for the
+gap between two streamed chunks. Continuations and retries stop once the
+budget is spent instead of running until the stuck-job cutoff.
+"""
+import time
+
+from django.conf import settings
+
+# Seconds from LLMJob creation until its LLM calls are abandoned, per job type
+LLM_JOB_DEADLINES = getattr(settings, 'LLM_JOB_DEADLINES', {
+    'trainer_question_analysis': 900,
+    'review_colab': 1200,
+    'general_llm_request': 300,
+    'csv_pipeline': 1800,
+})
+LLM_DEFAULT_JOB_DEADLINE = getattr(settings, 'LLM_DEFAULT_JOB_DEADLINE', 900)
+LLM_CONNECT_TIMEOUT = getattr(settings, 'LLM_CONNECT_TIMEOUT', 10)
+# Longest wait for a complete non-streaming response
+LLM_READ_TIMEOUT = getattr(settings, 'LLM_READ_TIMEOUT', 600)
+# Longest silence between two chunks of a streaming response
+LLM_STREAM_IDLE_TIMEOUT = getattr(settings, 'LLM_STREAM_IDLE_TIMEOUT', 90)
+# Don't start a provider request with less than this left
+LLM_MIN_REQUEST_SECONDS = 1
+# The OpenAI and Anthropic SDKs retry failed requests this many times by default
+SDK_MAX_RETRIES = 2
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, expires_at, label='LLM job'):
+        # Wall-clock time (time.time()): the budget starts at LLMJob.created_at,
+        # possibly in another process
+        self.expires_at = expires_at
+        self.label = label
+
+    @classmethod
+    def after(cls, seconds, label='LLM job'):
+        return cls(time.time() + seconds, label)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self):
+        return self.remaining() < LLM_MIN_REQUEST_SECONDS
+
+    def check(self, what='LLM request'):
+        if self.expired():
+            raise DeadlineExceeded(f"{self.label} deadline exceeded; not starting {what}")
+
+    def __repr__(self):
+        return f'<Deadline {self.label}: {self.remaining():.0f}s left>'
+
+
+def job_deadline_seconds(job_type):
+    return LLM_JOB_DEADLINES.get(job_type, LLM_DEFAULT_JOB_DEADLINE)
+
+
+def job_deadline(job):
+    """Deadline of an LLMJob, counted from its creation or from input_data['deadline_from']."""
+    seconds = job_deadline_seconds(job.job_type)
+    start = (job.input_data or {}).get('deadline_from') or job.created_at.timestamp()
+    return Deadline(start + seconds, f'{job.job_type} job {job.pk} ({seconds}s budget)')
+
+
+def restart_job_deadline(job):
+    """Give a job a fresh budget from now, e.g. when an admin retries it long after it was created."""
+    job.input_data = dict(job.input_data or {}, deadline_from=time.time())
+
+
+def request_timeouts(deadline=None, streaming=False):
+    """
+    Keyword arguments for an SDK Timeout (openai.Timeout, anthropic.Timeout)
+    for one request. For a stream, read is the idle time between chunks; the
+    streaming loop checks the overall deadline itself. Raises DeadlineExceeded
+    when there's no time left to make the request.
+    """
+    read = LLM_STREAM_IDLE_TIMEOUT if streaming else LLM_READ_TIMEOUT
+    connect = LLM_CONNECT_TIMEOUT
+    if deadline is not None:
+        deadline.check()
+        remaining = deadline.remaining()
+        read = min(read, remaining)
+        connect = min(connect, remaining)
+    return {'connect': connect, 'read': read, 'write': connect, 'pool': connect}
+
+
+def request_retries(deadline, timeouts, default=SDK_MAX_RETRIES):
+    """SDK retries that still fit in the deadline, each attempt taking up to the full timeouts."""
+    if deadline is None:
+        return default
+    attempts = int(deadline.remaining() // (timeouts['connect'] + timeouts['read']))
+    return max(0, min(default, attempts - 1))
+
+
+def sdk_options(timeout_type, deadline=None):
+    """Client keyword arguments for the OpenAI and Anthropic SDKs, given the SDK's own Timeout class."""
+    timeouts = request_timeouts(deadline)
+    return {'timeout': timeout_type(**timeouts), 'max_retries': request_retries(deadline, timeouts)}
+
+
+def default_deadline(label):
+    """Deadline for LLM calls made outside an LLMJob, e.g. directly from a request or a pipeline."""
+    return Deadline.after(LLM_DEFAULT_JOB_DEADLINE, label)
+
+
+def request_seconds(deadline=None, streaming=False):
+    """Total timeout for SDKs that take a single number (Gemini's request_options)."""
+    if deadline is None:
+        return LLM_READ_TIMEOUT
+    deadline.check()
+    return deadline.remaining() if streaming else min(LLM_READ_TIMEOUT, deadline.remaining())
+
+
+def is_timeout(error):
+    """Whether an SDK, httpx or gRPC exception is a timeout."""
+    if isinstance(error, (TimeoutError, DeadlineExceeded)):
+        return True
+    return any('Timeout' in cls.__name__ or cls.__name__ == 'DeadlineExceeded' for cls in type(error).__mro__)
@@ -0,0 +1,117 @@
+import io
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+# Notebook content is keyed by its Drive version, so it can stay cached for a long time
+NOTEBOOK_CACHE_TIMEOUT = getattr(settings, 'COLAB_NOTEBOOK_CACHE_TIMEOUT', 60 * 60 * 24)
+NOTEBOOK_METADATA_FIELDS = 'id,name,modifiedTime,md5Checksum,version'
+
+_credentials = None
+_credentials_lock = threading.Lock()
+# httplib2 (used by googleapiclient) is not thread-safe, so each thread gets its own service
+_local = threading.local()
+
+
+def _get_credentials():
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                from google.oauth2 import service_account
+                _credentials = service_account.Credentials.from_service_account_file(
+                    settings.SERVICE_ACCOUNT_FILE, scopes=DRIVE_SCOPES)
+    return _credentials
+
+
+def service_account_available():
+    return os.path.exists(settings.SERVICE_ACCOUNT_FILE)
+
+
+def get_drive_service():
+    """
+    Return a Drive v3 service for the calling thread.
+
+    Credentials are loaded once per process and the service object is built
+    once per thread instead of on every request.
+    """
+    service = getattr(_local, 'drive_service', None)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = build('drive', 'v3', credentials=_get_credentials(), cache_discovery=False)
+        _local.drive_service = service
+    return service
+
+
+def get_file_metadata(file_id):
+    """Cheap metadata lookup used to validate cached notebook content."""
+    return get_drive_service().files().get(
+        fileId=file_id,
+        fields=NOTEBOOK_METADATA_FIELDS,
+        supportsAllDrives=True,
+    ).execute()
+
+
+def download_file(file_id):
+    """Download a Drive file and return its raw bytes."""
+    from googleapiclient.http import MediaIoBaseDownload
+    drive_request = get_drive_service().files().get_media(fileId=file_id, supportsAllDrives=True)
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, drive_request)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+    return fh.getvalue()
+
+
+def _cell_source(cell):
+    source = cell.get('source', '')
+    # nbformat stores sources either as a string or as a list of lines
+    return ''.join(source) if isinstance(source, list) else source
+
+
+def notebook_to_markdown(nb_json):
+    """Render markdown cells as-is and code cells as fenced python blocks."""
+    content_lines = []
+    for cell in nb_json.get('cells', []):
+        cell_type = cell.get('cell_type')
+        if cell_type == 'markdown':
+            content_lines.append(_cell_source(cell))
+        elif cell_type == 'code':
+            content_lines.append(f"```python\n{_cell_source(cell)}\n```")
+    return "\n\n".join(content_lines)
+
+
+def notebook_cache_key(file_id, metadata):
+    version = metadata.get('md5Checksum') or metadata.get('modifiedTime') or metadata.get('version')
+    return f"colab_notebook_{file_id}_{version}" if version else None
+
+
+def fetch_notebook_content(file_id):
+    """
+    Return {'content': markdown, 'name': ..., 'cached': bool} for a Colab notebook.
+
+    A metadata call decides whether the cached copy is still current; the full
+    notebook is only downloaded when the file changed on Drive.
+    """
+    metadata = get_file_metadata(file_id)
+    cache_key = notebook_cache_key(file_id, metadata)
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    raw = download_file(file_id)
+    nb_json = json.loads(raw)
+    entry = {
+        'content': notebook_to_markdown(nb_json),
+        'name': metadata.get('name'),
+        'modified_time': metadata.get('modifiedTime'),
+    }
+    if cache_key:
+        cache.set(cache_key, entry, timeout=NOTEBOOK_CACHE_TIMEOUT)
+    return dict(entry, cached=False)
@@ -0,0 +1,215 @@
+"""
+Hedged LLM requests.
+
+A client with a backup client (ProjectLLMModel.backup_model) sends its
+request as usual. If no first token has arrived once the model's usual
+time-to-first-token has passed (a high percentile of its recent calls), the
+same request also goes to the backup model. Until a process has seen enough
+calls of its own, the first-token latencies its LLMJobs recorded (from every
+process) fill in. Whichever starts
+answering first is kept and the other is cancelled: a streaming call stops
+reading and closes its connection, a blocking call finishes in the background
+and its answer is dropped. A budget keeps hedges to a fraction of requests,
+so a slow provider can't double the load on the other one.
+"""
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from coreproject import metrics
+from eval.models import LLMJob
+
+from .llm_usage import active_collectors, use_collectors
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGING = getattr(settings, 'LLM_HEDGING', True)
+# Hedge delay until a model has LLM_HEDGE_MIN_SAMPLES first-token latencies
+LLM_HEDGE_DEFAULT_DELAY = getattr(settings, 'LLM_HEDGE_DEFAULT_DELAY', 30)
+LLM_HEDGE_MIN_DELAY = getattr(settings, 'LLM_HEDGE_MIN_DELAY', 2)
+LLM_HEDGE_PERCENTILE = getattr(settings, 'LLM_HEDGE_PERCENTILE', 0.95)
+LLM_HEDGE_MIN_SAMPLES = 20
+# Recorded first-token latencies are read again after this many seconds
+LLM_HEDGE_HISTORY_TTL = getattr(settings, 'LLM_HEDGE_HISTORY_TTL', 300)
+# Each request earns RATIO hedge tokens up to BURST; a hedge spends one
+LLM_HEDGE_BUDGET_RATIO = getattr(settings, 'LLM_HEDGE_BUDGET_RATIO', 0.1)
+LLM_HEDGE_BUDGET_BURST = getattr(settings, 'LLM_HEDGE_BUDGET_BURST', 5)
+
+
+def recorded_first_tokens(model_name, limit):
+    """First-token latencies of model_name's latest LLMJobs, oldest first."""
+    recent = LLMJob.objects.filter(model__name=model_name, time_to_first_token__isnull=False).order_by(
+        '-completed_at').values_list('time_to_first_token', flat=True)[:limit]
+    return list(reversed(recent))
+
+
+class LatencyTracker:
+    """
+    Recent time-to-first-token samples per model. history(model_name, limit),
+    if given, returns recorded samples (oldest first) that stand in for this
+    process's own while it has fewer than LLM_HEDGE_MIN_SAMPLES.
+    """
+
+    def __init__(self, window=200, history=None):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = {}
+        self._history = history
+        # model name -> (read at, samples)
+        self._recorded = {}
+
+    def record(self, model_name, seconds):
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self._window)).append(seconds)
+
+    def threshold(self, model_name):
+        """Seconds without a first token after which model_name counts as slow."""
+        with self._lock:
+            samples = list(self._samples.get(model_name, ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            samples = (self._recorded_samples(model_name) + samples)[-self._window:]
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        samples.sort()
+        return max(LLM_HEDGE_MIN_DELAY, samples[int(LLM_HEDGE_PERCENTILE * (len(samples) - 1))])
+
+    def _recorded_samples(self, model_name):
+        if self._history is None:
+            return []
+        with self._lock:
+            read_at, samples = self._recorded.get(model_name, (None, []))
+        if read_at is not None and time.monotonic() - read_at < LLM_HEDGE_HISTORY_TTL:
+            return samples
+        try:
+            samples = self._history(model_name, self._window)
+        except DatabaseError as e:
+            logger.warning(f"Could not read recorded first-token latencies of {model_name}: {e}")
+        with self._lock:
+            self._recorded[model_name] = (time.monotonic(), samples)
+        return samples
+
+
+class HedgeBudget:
+    def __init__(self, ratio, burst):
+        self._lock = threading.Lock()
+        self._ratio = ratio
+        self._burst = burst
+        self._tokens = float(burst)
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._burst, self._tokens + self._ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HedgeStats:
+    """Per-process counts: hedgeable requests, hedges sent, backup wins, hedges refused by the budget."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'hedged': 0, 'backup_won': 0, 'budget_exhausted': 0}
+
+    def record(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+first_token_latency = LatencyTracker(history=recorded_first_tokens)
+budget = HedgeBudget(LLM_HEDGE_BUDGET_RATIO, LLM_HEDGE_BUDGET_BURST)
+stats = HedgeStats()
+metrics.expose_counts('llm_hedge_events_total', 'Hedgeable requests, hedges sent, backup wins and budget refusals',
+                      stats.snapshot, 'event')
+
+
+def run_hedged(primary, backup, messages, temperature=None, max_tokens=None):
+    """Get primary's response to messages, hedging to backup if primary is slow to start."""
+    budget.deposit()
+    stats.record('requests')
+    events = queue.Queue()
+    collectors = active_collectors()
+
+    def run(client, client_max_tokens):
+        client.on_first_token = lambda: events.put(('first_token', client, None))
+        with use_collectors(collectors):
+            try:
+                result = client._respond(messages, temperature, client_max_tokens)
+            except Exception as e:
+                result = {'status': 'error', 'error': str(e), 'response': ''}
+        events.put(('done', client, result))
+
+    _start(run, primary, max_tokens)
+
+    delay = first_token_latency.threshold(primary.model_name)
+    try:
+        kind, _, result = events.get(timeout=delay)
+    except queue.Empty:
+        pass
+    else:
+        if kind == 'done' and result.get('circuit_open'):
+            # Primary's provider is failing fast; the backup takes the request outright
+            logger.warning(f"{primary.model_name} circuit open; sending the request to {backup.model_name}")
+            return dict(backup._respond(messages, temperature, None), served_by=backup.model_name)
+        # Primary finished or started answering in time
+        return result if kind == 'done' else _wait_done(events, primary)
+
+    if not budget.withdraw():
+        stats.record('budget_exhausted')
+        logger.warning(f"No first token from {primary.model_name} after {delay:.1f}s; hedge budget exhausted")
+        return _wait_done(events, primary)
+
+    stats.record('hedged')
+    logger.warning(f"No first token from {primary.model_name} after {delay:.1f}s; hedging to {backup.model_name}")
+    # The backup uses its own token limit
+    _start(run, backup, None)
+
+    winner = None
+    running = {primary, backup}
+    failure = None
+    while running:
+        kind, client, result = events.get()
+        other = backup if client is primary else primary
+        if kind == 'first_token':
+            if winner is None:
+                winner = client
+                other.cancel()
+                running.discard(other)
+            continue
+        running.discard(client)
+        if winner not in (None, client):
+            continue
+        if result.get('status') == 'success' or winner is client:
+            if winner is None:
+                other.cancel()
+            if client is backup:
+                stats.record('backup_won')
+            return dict(result, hedged=True, served_by=client.model_name)
+        failure = result
+    return dict(failure, hedged=True)
+
+
+def _start(target, *args):
+    """A request thread that keeps the caller's contextvars, e.g. processor log channels."""
+    threading.Thread(target=contextvars.copy_context().run, args=(target, *args), daemon=True).start()
+
+
+def _wait_done(events, client):
+    while True:
+        kind, source, result = events.get()
+        if kind == 'done' and source is client:
+            return result
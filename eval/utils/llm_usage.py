@@ -0,0 +1,128 @@
+"""
+Token usage reported by LLM providers.
+
+Provider calls pass the usage block of each response to record_usage().
+Code that wants totals for a unit of work, such as one review job, wraps it
+in collect_usage() and reads the TokenUsage it yields afterwards. Cache
+read/write counts show how much of each prompt was served from the
+provider's prompt-prefix cache.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_add_lock = threading.Lock()
+
+
+@dataclass
+class TokenUsage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Prompt tokens read from / written to the provider's prefix cache
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    calls: int = 0
+
+    def add(self, other):
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_write_tokens += other.cache_write_tokens
+        self.calls += other.calls
+        return self
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _int(value):
+    return value if isinstance(value, int) else 0
+
+
+def usage_from_anthropic(usage):
+    """Anthropic input_tokens already exclude cached prompt tokens."""
+    if usage is None:
+        return None
+    return TokenUsage(
+        input_tokens=_int(getattr(usage, 'input_tokens', 0)),
+        output_tokens=_int(getattr(usage, 'output_tokens', 0)),
+        cache_read_tokens=_int(getattr(usage, 'cache_read_input_tokens', 0)),
+        cache_write_tokens=_int(getattr(usage, 'cache_creation_input_tokens', 0)),
+        calls=1,
+    )
+
+
+def usage_from_openai(usage):
+    """OpenAI prompt_tokens include the cached ones; split them out to match Anthropic."""
+    if usage is None:
+        return None
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = _int(getattr(details, 'cached_tokens', 0))
+    return TokenUsage(
+        input_tokens=max(0, _int(getattr(usage, 'prompt_tokens', 0)) - cached),
+        output_tokens=_int(getattr(usage, 'completion_tokens', 0)),
+        cache_read_tokens=cached,
+        calls=1,
+    )
+
+
+def usage_from_gemini(usage_metadata):
+    if usage_metadata is None:
+        return None
+    cached = _int(getattr(usage_metadata, 'cached_content_token_count', 0))
+    return TokenUsage(
+        input_tokens=max(0, _int(getattr(usage_metadata, 'prompt_token_count', 0)) - cached),
+        output_tokens=_int(getattr(usage_metadata, 'candidates_token_count', 0)),
+        cache_read_tokens=cached,
+        calls=1,
+    )
+
+
+def record_usage(usage, provider='', model=''):
+    """Add one response's TokenUsage to every active collect_usage() block in this thread."""
+    if usage is None:
+        return
+    if usage.cache_read_tokens or usage.cache_write_tokens:
+        logger.info(
+            f"{provider} {model}: {usage.cache_read_tokens} prompt tokens read from cache, "
+            f"{usage.cache_write_tokens} written, {usage.input_tokens} uncached")
+    collectors = getattr(_local, 'collectors', ())
+    if collectors:
+        # Hedged requests add to the same totals from two threads
+        with _add_lock:
+            for totals in collectors:
+                totals.add(usage)
+
+
+def active_collectors():
+    """The collect_usage() totals of this thread, to hand to worker threads via use_collectors()."""
+    return list(getattr(_local, 'collectors', ()))
+
+
+@contextmanager
+def use_collectors(collectors):
+    """Record this thread's usage into another thread's collect_usage() blocks."""
+    previous = getattr(_local, 'collectors', None)
+    _local.collectors = list(collectors)
+    try:
+        yield
+    finally:
+        _local.collectors = previous if previous is not None else []
+
+
+@contextmanager
+def collect_usage():
+    totals = TokenUsage()
+    collectors = getattr(_local, 'collectors', None)
+    if collectors is None:
+        collectors = _local.collectors = []
+    collectors.append(totals)
+    try:
+        yield totals
+    finally:
+        # By identity: TokenUsage compares by value, and blocks nest
+        collectors[:] = [c for c in collectors if c is not totals]
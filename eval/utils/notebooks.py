@@ -0,0 +1,68 @@
+"""
+Normalized notebook artifacts keyed by content hash.
+
+A notebook is hashed once when it is fetched and its implementation code is
+extracted once. Review jobs only carry the hash, so the Pub/Sub messages
+stay small and every model's job reuses the same extraction.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from eval.models import NotebookArtifact
+from eval.utils.code_extractor import extract_implementation
+
+ARTIFACT_CACHE_TIMEOUT = 60 * 60
+
+
+def notebook_content_hash(markdown):
+    return hashlib.sha256(markdown.encode('utf-8')).hexdigest()
+
+
+def _cache_key(content_hash):
+    return f"notebook_artifact_{content_hash}"
+
+
+def _to_dict(artifact):
+    return {
+        'content_hash': artifact.content_hash,
+        'markdown': artifact.markdown,
+        'implementation_code': artifact.implementation_code,
+        'language': artifact.language,
+    }
+
+
+def store_notebook_artifact(markdown):
+    """Return the artifact for markdown, extracting and saving it on first sight."""
+    content_hash = notebook_content_hash(markdown)
+    cached = cache.get(_cache_key(content_hash))
+    if cached is not None:
+        return cached
+
+    artifact = NotebookArtifact.objects.filter(content_hash=content_hash).first()
+    if artifact is None:
+        implementation_code, language = extract_implementation(markdown)
+        artifact, _ = NotebookArtifact.objects.get_or_create(
+            content_hash=content_hash,
+            defaults={
+                'markdown': markdown,
+                'implementation_code': implementation_code,
+                'language': language,
+            },
+        )
+    data = _to_dict(artifact)
+    cache.set(_cache_key(content_hash), data, timeout=ARTIFACT_CACHE_TIMEOUT)
+    return data
+
+
+def get_notebook_artifact(content_hash):
+    """Return the stored artifact for content_hash, or None if it was never stored."""
+    cached = cache.get(_cache_key(content_hash))
+    if cached is not None:
+        return cached
+    artifact = NotebookArtifact.objects.filter(content_hash=content_hash).first()
+    if artifact is None:
+        return None
+    data = _to_dict(artifact)
+    cache.set(_cache_key(content_hash), data, timeout=ARTIFACT_CACHE_TIMEOUT)
+    return data
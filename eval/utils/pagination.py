@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination.
+
+OFFSET pagination makes the database walk and discard every row before the
+requested page, so deep pages get slower the further you go. KeysetPaginator
+instead remembers the sort key of the last row it returned and asks for rows
+strictly after it, which an index on the ordering fields answers in constant
+time at any depth.
+
+Cursors are opaque URL-safe strings. Totals come from approximate_count(),
+which caches COUNT(*) per query for PAGINATION_COUNT_CACHE_TIMEOUT seconds.
+The ordering fields must be non-null and end with the primary key so the
+order is total.
+"""
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+PAGINATION_COUNT_CACHE_TIMEOUT = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def approximate_count(queryset, timeout=PAGINATION_COUNT_CACHE_TIMEOUT):
+    """COUNT(*) of queryset, cached per SQL statement for `timeout` seconds."""
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.sha256(f"{sql}|{params!r}".encode('utf-8')).hexdigest()
+    key = f"approx_count_{digest}"
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, timeout=timeout)
+    return total
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    # UUIDs, decimals, dates: their str() round-trips through Field.to_python()
+    return str(value)
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    number: int
+    per_page: int
+    total: int
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def total_pages(self):
+        return max(1, (self.total + self.per_page - 1) // self.per_page)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def as_context(self):
+        """Template/JSON-friendly summary of the page."""
+        return {
+            'current_page': self.number,
+            'total_pages': self.total_pages,
+            'total_records': self.total,
+            'has_previous': self.has_previous,
+            'has_next': self.has_next,
+            'previous_cursor': self.previous_cursor or '',
+            'next_cursor': self.next_cursor or '',
+        }
+
+
+class KeysetPaginator:
+    """
+    Paginate `queryset` by `ordering`, e.g. ('-updated_at', '-id').
+
+    page(cursor) returns a KeysetPage; pass its next_cursor/previous_cursor
+    back to move one page forward or backward. A missing or invalid cursor
+    returns the first page.
+    """
+
+    def __init__(self, queryset, ordering, per_page=10):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        opts = queryset.model._meta
+        self.model_fields = [opts.pk if name == 'pk' else opts.get_field(name) for name in self.fields]
+
+    def encode_cursor(self, obj, backwards, number):
+        values = [_encode_value(getattr(obj, field.attname)) for field in self.model_fields]
+        payload = json.dumps({'v': values, 'b': int(backwards), 'n': number}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            values = data['v']
+            if len(values) != len(self.model_fields):
+                raise InvalidCursor('Cursor does not match this ordering')
+            values = [field.to_python(value) for value, field in zip(values, self.model_fields)]
+            return values, bool(data.get('b')), max(1, int(data.get('n', 1)))
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            raise InvalidCursor(f'Malformed cursor: {e}')
+
+    def _after(self, values, backwards):
+        """Q selecting rows strictly after `values` in the (possibly reversed) ordering."""
+        condition = Q()
+        for index in reversed(range(len(self.fields))):
+            descending = self.descending[index] != backwards
+            lookup = f"{self.fields[index]}__{'lt' if descending else 'gt'}"
+            step = Q(**{lookup: values[index]})
+            if index < len(self.fields) - 1:
+                step |= Q(**{self.fields[index]: values[index]}) & condition
+            condition = step
+        return condition
+
+    def page(self, cursor=None):
+        values, backwards, number = None, False, 1
+        if cursor:
+            try:
+                values, backwards, number = self.decode_cursor(cursor)
+            except InvalidCursor:
+                values, backwards, number = None, False, 1
+
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if backwards:
+            # We came from a later page, so there is always a next one
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, values is not None
+        if backwards and not more:
+            # Walked back to the start; number the page from the beginning again
+            number = 1
+
+        return KeysetPage(
+            items=rows,
+            number=number,
+            per_page=self.per_page,
+            total=approximate_count(self.queryset),
+            next_cursor=self.encode_cursor(rows[-1], False, number + 1) if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], True, number - 1) if rows and has_previous else None,
+        )
@@ -0,0 +1,38 @@
+"""
+Compressed storage for LLM job results.
+
+Review outputs for grammar, plagiarism and the other criteria run to
+hundreds of KB of text. Kept inline in LLMJob.result_data they were read by
+every job scan, listing and admin page. Results larger than
+LLM_JOB_RESULT_INLINE_BYTES are now gzip-compressed into an LLMJobResult row
+and only decompressed by the endpoints that return them; small results stay
+inline so the common case costs no extra query.
+"""
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+LLM_JOB_RESULT_INLINE_BYTES = getattr(settings, 'LLM_JOB_RESULT_INLINE_BYTES', 4096)
+
+GZIP = 'gzip'
+# zstd would compress review text ~20% smaller, but zstandard isn't a dependency yet
+ENCODINGS = (GZIP,)
+
+
+def encode_result(result):
+    """(json_bytes, compressed_bytes) for a JSON-serializable result."""
+    raw = json.dumps(result, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    return raw, compressor.compress(raw) + compressor.flush()
+
+
+def decode_result(encoding, data):
+    if encoding != GZIP:
+        raise ValueError(f'Unknown result encoding: {encoding}')
+    return json.loads(zlib.decompress(bytes(data), 31).decode('utf-8'))
+
+
+def should_inline(raw):
+    return len(raw) <= LLM_JOB_RESULT_INLINE_BYTES
@@ -0,0 +1,102 @@
+"""
+Locks and counters shared by every process, kept in the database.
+
+The shared cache can't provide them on its default backend: FileBasedCache
+and DatabaseCache implement add() as a lookup followed by a write and incr()
+as a get followed by a set, so two processes can both win an add() or draw
+the same number. A row with a unique name can only be inserted once, and
+``UPDATE ... SET value = value + n`` is applied by one transaction at a time,
+on SQLite and PostgreSQL alike.
+
+Calls made inside an outer transaction only take effect for other processes
+once it commits; call these from autocommit code.
+"""
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from eval.models import SharedCounter, SharedLock
+
+# Expired locks are reused by name; ones whose name never comes back (their
+# holder died) are deleted after this long
+EXPIRED_LOCK_RETENTION = 60 * 60
+
+_purge_lock = threading.Lock()
+_next_purge = 0.0
+
+
+def acquire(name, ttl):
+    """A token holding the lock name for ttl seconds, or None while another holder has it."""
+    _purge_expired_locks()
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    # Take over a lock its holder let expire; of several takers only one matches the WHERE
+    if SharedLock.objects.filter(name=name, expires_at__lte=now).update(token=token, expires_at=expires_at):
+        return token
+    try:
+        with transaction.atomic():
+            SharedLock.objects.create(name=name, token=token, expires_at=expires_at)
+    except IntegrityError:
+        return None
+    return token
+
+
+def refresh(name, token, ttl):
+    """Extend a held lock by ttl seconds from now; False if it expired and was taken over."""
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    return bool(SharedLock.objects.filter(name=name, token=token).update(expires_at=expires_at))
+
+
+def release(name, token):
+    """Release a held lock; a lock taken over by another holder is left alone."""
+    SharedLock.objects.filter(name=name, token=token).delete()
+
+
+def holder(name):
+    """Token of the current holder of name, or None when nobody holds it."""
+    return SharedLock.objects.filter(name=name, expires_at__gt=timezone.now()).values_list(
+        'token', flat=True).first()
+
+
+def _purge_expired_locks():
+    global _next_purge
+    if time.monotonic() < _next_purge:
+        return
+    with _purge_lock:
+        if time.monotonic() < _next_purge:
+            return
+        _next_purge = time.monotonic() + EXPIRED_LOCK_RETENTION
+    SharedLock.objects.filter(expires_at__lt=timezone.now() - timedelta(seconds=EXPIRED_LOCK_RETENTION)).delete()
+
+
+def increment(name, amount=1):
+    """Add amount to the counter name (created at 0) and return its new value."""
+    counters = SharedCounter.objects.filter(name=name)
+    with transaction.atomic():
+        # The row stays locked until commit, so the value read back is this increment's
+        if not counters.update(value=F('value') + amount, updated_at=timezone.now()):
+            try:
+                with transaction.atomic():
+                    SharedCounter.objects.create(name=name, value=amount, updated_at=timezone.now())
+                return amount
+            except IntegrityError:
+                # Another process created it since the update
+                counters.update(value=F('value') + amount, updated_at=timezone.now())
+        return counters.values_list('value', flat=True).get()
+
+
+def counter_value(name):
+    """Current value of the counter name; 0 if it was never incremented."""
+    return SharedCounter.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+def purge_counters(prefix, idle_seconds):
+    """Delete counters named prefix... that nobody incremented for idle_seconds."""
+    SharedCounter.objects.filter(
+        name__startswith=prefix, updated_at__lt=timezone.now() - timedelta(seconds=idle_seconds)).delete()
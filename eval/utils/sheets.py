@@ -1,8 +1,11 @@
 import os
 import json
+import time
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from coreproject import metrics
+
 # Google Sheets settings
 SERVICE_ACCOUNT_FILE = os.path.join(os.path.dirname(__file__), '../../service_account.json')
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
@@ -11,6 +14,23 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
 SPREADSHEET_ID = '1H8DEeeH7GGoOknkM5t9eOBuEVbNZBvkA3EinokkuAfM'
 RANGE_NAME = 'prompts'  # Change if your sheet/tab has a different name
 
+sync_phase_seconds = metrics.Histogram(
+    'sync_phase_duration_seconds', 'Seconds spent in each phase of a task sheet sync', ['phase', 'mode'],
+    buckets=metrics.SLOW_BUCKETS)
+
+
+class SyncPhases:
+    """Times consecutive phases of one sync: mark(phase) records the time since the previous mark."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._last = time.monotonic()
+
+    def mark(self, phase):
+        now = time.monotonic()
+        sync_phase_seconds.observe(now - self._last, phase=phase, mode=self.mode)
+        self._last = now
+
 def fetch_trainer_tasks():
     """
     Fetches the trainer task assignments from the Google Sheet.
@@ -55,6 +75,8 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
     sync_details = ""
 
     import os
+    # fetch, upsert, delete and record (the history entry); a failure ends with 'failed'
+    phases = SyncPhases(config.sync_mode or "prompt_in_sheet")
     try:
         print("DEBUG: sync_trainer_tasks running as UID:", os.getuid(), "EUID:", os.geteuid())
         print("DEBUG: Database path:", os.path.abspath(config._meta.get_field('project').model._meta.app_config.path))
@@ -71,6 +93,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
             rows = worksheet.get_all_values()
             headers = rows[0]
             data_rows = rows[1:]
+            phases.mark('fetch')
 
             primary_key = config.primary_key_column or "question_id"
             mapping = config.column_mapping or {}
@@ -126,6 +149,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
                     created_count += 1
                 else:
                     updated_count += 1
+            phases.mark('upsert')
             # Delete tasks not in the sheet for this project
             if selected_project:
                 filter_kwargs = {"project": selected_project}
@@ -133,6 +157,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
                 to_delete = TrainerTask.objects.filter(**filter_kwargs).exclude(**{primary_key + "__in": list(sheet_keys)})
                 deleted_count = to_delete.count()
                 to_delete.delete()
+                phases.mark('delete')
             sync_summary = f"{created_count} created, {updated_count} updated, {deleted_count} deleted (custom sync)"
         else:
             # Use the service account json if available
@@ -145,6 +170,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
             rows = worksheet.get_all_values()
             headers = rows[0]
             data_rows = rows[1:]
+            phases.mark('fetch')
 
             # Config-driven fields
             primary_key = config.primary_key_column or "question_id"
@@ -245,6 +271,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
                     created_count += 1
                 else:
                     updated_count += 1
+            phases.mark('upsert')
 
             # Delete tasks not in the sheet for this project
             if selected_project:
@@ -253,6 +280,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
                 to_delete = TrainerTask.objects.filter(**filter_kwargs).exclude(**{primary_key + "__in": list(sheet_keys)})
                 deleted_count = to_delete.count()
                 to_delete.delete()
+                phases.mark('delete')
             sync_summary = f"{created_count} created, {updated_count} updated, {deleted_count} deleted"
     except Exception as e:
         import traceback
@@ -262,6 +290,7 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
         sync_status = "failure"
         sync_summary = "Sync failed"
         sync_details = f"{str(e)}\nTraceback:\n{tb}"
+        phases.mark('failed')
     # Log sync history
     TaskSyncHistory.objects.create(
         config=config,
@@ -276,4 +305,5 @@ def sync_trainer_tasks(config, selected_project=None, sync_type="auto", synced_b
     )
     config.last_synced = timezone.now()
     config.save()
+    phases.mark('record')
     return sync_status, sync_summary, sync_details, created_count, updated_count, deleted_count
@@ -0,0 +1,214 @@
+"""
+Single-flight coalescing for identical LLM calls.
+
+When the same request (same model, messages and parameters) is already in
+flight, later callers wait for it and share its result instead of paying for
+another provider call. Threads of one process wait on an in-process event;
+other processes see the leader's lock and poll the shared cache for its
+result. The lock is a database row (eval.utils.shared_locks): the cache's
+add() is not atomic on the default file backend, so two processes could
+both lead. The leader keeps its lock alive with a heartbeat, so if it dies the
+lock expires within LLM_SINGLE_FLIGHT_LOCK_TTL and a waiter takes over; if
+it fails without publishing, a waiter takes over at once. Waiters give up
+when the caller's deadline (or LLM_SINGLE_FLIGHT_MAX_WAIT) runs out and
+make the call themselves.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from coreproject import metrics
+
+from . import shared_locks
+
+logger = logging.getLogger(__name__)
+
+LLM_SINGLE_FLIGHT = getattr(settings, 'LLM_SINGLE_FLIGHT', True)
+# Lifetime of the shared lock without a heartbeat from its leader
+LLM_SINGLE_FLIGHT_LOCK_TTL = getattr(settings, 'LLM_SINGLE_FLIGHT_LOCK_TTL', 30)
+# Longest a caller without a deadline (e.g. a web request) waits for another's call
+LLM_SINGLE_FLIGHT_MAX_WAIT = getattr(settings, 'LLM_SINGLE_FLIGHT_MAX_WAIT', 60)
+# How long a finished result stays readable for waiters in other processes
+LLM_SINGLE_FLIGHT_RESULT_TTL = getattr(settings, 'LLM_SINGLE_FLIGHT_RESULT_TTL', 60)
+LLM_SINGLE_FLIGHT_POLL_INTERVAL = 0.5
+
+_MISSING = object()
+_TIMED_OUT = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightStats:
+    """Per-process counts of calls made (leaders) and calls that shared another's result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'leaders': 0, 'coalesced_local': 0, 'coalesced_shared': 0, 'gave_up': 0}
+
+    def record(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+stats = SingleFlightStats()
+metrics.expose_counts('llm_single_flight_calls_total',
+                      'LLM calls made (leaders), calls that shared a result and calls that gave up waiting',
+                      stats.snapshot, 'role')
+
+_lock = threading.Lock()
+_calls = {}
+
+
+def request_key(*parts):
+    """Hash of the normalized request; dict keys are sorted so equal requests match."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def do(key, fn, publish=None, deadline=None):
+    """
+    Run fn() once for all concurrent callers with the same key and return its
+    result to each of them. publish(result) gives the value handed to waiters
+    in other processes (it must be picklable for the cache), or None to keep
+    the result in this process; by default the result itself is published.
+    A caller waits for another's call until its deadline (eval.utils.deadlines),
+    or LLM_SINGLE_FLIGHT_MAX_WAIT seconds without one, then calls fn() itself.
+    """
+    if not LLM_SINGLE_FLIGHT:
+        return fn()
+
+    wait_until = time.monotonic() + (deadline.remaining() if deadline is not None else LLM_SINGLE_FLIGHT_MAX_WAIT)
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        logger.info(f"Waiting for identical in-flight LLM call {key[:12]}")
+        if not call.done.wait(max(0.0, wait_until - time.monotonic())):
+            stats.record('gave_up')
+            logger.warning(f"Gave up waiting for in-flight LLM call {key[:12]}; calling directly")
+            return fn()
+        stats.record('coalesced_local')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _run_shared(key, fn, publish, wait_until)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def _run_shared(key, fn, publish, wait_until):
+    lock_name = f'llm_flight_{key}'
+    result_key = f'llm_flight_result_{key}'
+    while True:
+        try:
+            token = shared_locks.acquire(lock_name, LLM_SINGLE_FLIGHT_LOCK_TTL)
+        except Exception as e:
+            # Coalescing is an optimization; never fail the call over it
+            logger.warning(f"Single-flight lock unavailable ({e}); calling directly")
+            return fn()
+
+        if token is not None:
+            stats.record('leaders')
+            stop_heartbeat = threading.Event()
+            threading.Thread(target=_heartbeat, args=(lock_name, token, stop_heartbeat),
+                             name='single-flight-heartbeat', daemon=True).start()
+            try:
+                result = fn()
+            except BaseException:
+                stop_heartbeat.set()
+                _release(lock_name, token)
+                raise
+            stop_heartbeat.set()
+            published = result if publish is None else publish(result)
+            try:
+                if published is not None:
+                    cache.set(result_key, (token, published), timeout=LLM_SINGLE_FLIGHT_RESULT_TTL)
+            except Exception as e:
+                logger.warning(f"Could not publish single-flight result: {e}")
+            _release(lock_name, token)
+            return result
+
+        try:
+            result = _wait_for_leader(lock_name, result_key, wait_until)
+        except Exception as e:
+            logger.warning(f"Single-flight lock unavailable ({e}); calling directly")
+            return fn()
+        if result is _TIMED_OUT:
+            stats.record('gave_up')
+            logger.warning(f"Gave up waiting for LLM call in another process ({key[:12]}); calling directly")
+            return fn()
+        if result is not _MISSING:
+            stats.record('coalesced_shared')
+            return result
+        # The leader finished without publishing a result, or died; try to lead
+
+
+def _heartbeat(lock_name, token, stop):
+    """Keep the leader's lock from expiring while its call runs."""
+    try:
+        while not stop.wait(LLM_SINGLE_FLIGHT_LOCK_TTL / 3):
+            try:
+                if not shared_locks.refresh(lock_name, token, LLM_SINGLE_FLIGHT_LOCK_TTL):
+                    # Expired and taken over; the new leader refreshes its own
+                    return
+            except Exception as e:
+                logger.warning(f"Could not refresh single-flight lock: {e}")
+    finally:
+        connection.close()
+
+
+def _release(lock_name, token):
+    try:
+        shared_locks.release(lock_name, token)
+    except Exception as e:
+        logger.warning(f"Could not release single-flight lock: {e}")
+
+
+def _wait_for_leader(lock_name, result_key, wait_until):
+    """
+    The result published under the current lock holder's token, _MISSING once
+    the lock is gone, or _TIMED_OUT at wait_until (time.monotonic()).
+    """
+    leader_token = shared_locks.holder(lock_name)
+    logger.info(f"Waiting for identical LLM call in another process ({lock_name[-12:]})")
+    while leader_token is not None:
+        published = cache.get(result_key)
+        if published is not None and published[0] == leader_token:
+            return published[1]
+        left = wait_until - time.monotonic()
+        if left <= 0:
+            return _TIMED_OUT
+        time.sleep(min(LLM_SINGLE_FLIGHT_POLL_INTERVAL, left))
+        if shared_locks.holder(lock_name) != leader_token:
+            # Released (or taken over): the result may have landed just before
+            published = cache.get(result_key)
+            if published is not None and published[0] == leader_token:
+                return published[1]
+            return _MISSING
+    return _MISSING
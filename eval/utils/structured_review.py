@@ -0,0 +1,150 @@
+"""
+Combined Colab review: every enabled criterion in one structured request.
+
+The default review sends the notebook once per criterion. Projects with
+review_mode = 'combined' send it once, ask for a JSON object with one field
+per enabled criterion, validate it against the schema and split it back into
+the result keys the separate review produces, so the frontend and stored
+results are identical in both modes.
+"""
+import json
+import re
+
+import jsonschema
+
+from eval.api import call_llm_api, is_error_reply
+
+# Criterion name -> (result key, what to ask for)
+CRITERIA = {
+    "Grammar Check": (
+        "grammar",
+        "Grammar and language issues in the notebook content. List all errors and suggest corrections. "
+        "If there are no issues, say 'No grammar issues found.'",
+    ),
+    "Code Style Check": (
+        "code_style",
+        "Style, formatting and coding conventions of the code: indentation, naming, comments and readability. "
+        "Suggest improvements if needed. If the style is good, say 'Code style is good.'",
+    ),
+    "Logic Validation": (
+        "logic_validation",
+        "Logical correctness and algorithmic soundness of the code: logical errors, edge cases and potential bugs. "
+        "If the logic is sound, say 'Logic is correct.'",
+    ),
+    "Performance Analysis": (
+        "performance_analysis",
+        "Time and space complexity of the code and performance improvements. "
+        "If performance is good, say 'Performance is acceptable.'",
+    ),
+    "Security Review": (
+        "security_review",
+        "Security vulnerabilities in the code: input validation, injection and other risks. "
+        "If the code is secure, say 'No security issues found.'",
+    ),
+}
+
+PLAGIARISM = "Plagiarism Check"
+PLAGIARISM_INSTRUCTIONS = (
+    "plagiarism_score: integer 0-100, the likelihood the code was copied "
+    "(0-20 highly original, 21-40 mostly original, 41-60 mixed, 61-80 likely copied segments, 81-100 high likelihood). "
+    "plagiarism_result: your analysis of originality, common patterns vs. copied solutions, naming and structure."
+)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+class InvalidStructuredReview(ValueError):
+    pass
+
+
+class StructuredReviewFailed(Exception):
+    pass
+
+
+def review_schema(criteria_names, include_plagiarism):
+    """JSON schema with one required string field per criterion (strict-mode compatible)."""
+    properties = {}
+    if include_plagiarism:
+        properties["plagiarism_score"] = {"type": "integer"}
+        properties["plagiarism_result"] = {"type": "string"}
+    for name in criteria_names:
+        if name in CRITERIA:
+            properties[CRITERIA[name][0]] = {"type": "string"}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def review_context(colab_content, implementation_code):
+    """
+    The notebook part of every review prompt. It is sent ahead of the
+    criterion instructions, identical for every request about the same
+    notebook, so providers can serve it from their prompt-prefix cache.
+    """
+    return (
+        f"Notebook Content:\n{colab_content}\n\n"
+        f"Implementation Code:\n{implementation_code or '[No code found]'}"
+    )
+
+
+def review_prompt(criteria_names, include_plagiarism):
+    fields = [f"- {CRITERIA[name][0]}: {CRITERIA[name][1]}" for name in criteria_names if name in CRITERIA]
+    if include_plagiarism:
+        fields.append(f"- {PLAGIARISM_INSTRUCTIONS}")
+    return (
+        "You are an expert reviewer of Colab notebooks. Review the notebook above on each of these criteria "
+        "and answer with a single JSON object containing exactly these fields:\n"
+        + "\n".join(fields)
+        + "\n\nRespond with the JSON object only, without markdown fences or commentary."
+    )
+
+
+def parse_review(text, schema):
+    """Decode and validate the model's JSON answer."""
+    try:
+        data = json.loads(_FENCE.sub("", (text or "").strip()))
+        jsonschema.validate(data, schema)
+    except (json.JSONDecodeError, jsonschema.ValidationError) as e:
+        raise InvalidStructuredReview(str(e).splitlines()[0]) from e
+    score = data.get("plagiarism_score")
+    if score is not None and not 0 <= score <= 100:
+        raise InvalidStructuredReview(f"plagiarism_score {score} is outside 0-100")
+    return data
+
+
+def run_combined_review(model, enabled_criteria_names, colab_content, implementation_code, deadline=None):
+    """
+    Review every enabled criterion with one request and return the same result
+    keys as the per-criterion review. Raises InvalidStructuredReview when the
+    model's answer doesn't match the schema, StructuredReviewFailed when the
+    provider call itself failed.
+    """
+    enabled = [name for name in CRITERIA if name in enabled_criteria_names]
+    include_plagiarism = PLAGIARISM in enabled_criteria_names and bool(implementation_code.strip())
+
+    result = {}
+    if enabled or include_plagiarism:
+        schema = review_schema(enabled, include_plagiarism)
+        prompt = review_prompt(enabled, include_plagiarism)
+        context = review_context(colab_content, implementation_code)
+        reply = call_llm_api(model, prompt, 1, response_schema=schema, prefix=context, deadline=deadline)[0]
+        if is_error_reply(reply):
+            # Not a format problem: a request per criterion would fail the same way
+            raise StructuredReviewFailed(reply)
+        result.update(parse_review(reply, schema))
+
+    if "Grammar Check" not in enabled:
+        result["grammar"] = "Grammar check disabled for this project."
+    if PLAGIARISM not in enabled_criteria_names:
+        result["plagiarism_result"] = "Plagiarism check disabled for this project."
+        result["plagiarism_score"] = None
+    elif not include_plagiarism:
+        result["plagiarism_result"] = "No implementation code found to analyze for plagiarism."
+        result["plagiarism_score"] = 0
+    for name, (key, _) in CRITERIA.items():
+        if name != "Grammar Check" and name not in enabled:
+            result[key] = f"{name} disabled for this project."
+    return result
@@ -0,0 +1,114 @@
+"""
+Token, latency and cost accounting for LLM work.
+
+usage_stats() turns what a unit of work reported (its TokenUsage, stop
+reason, time to first token and total LLM latency) into LLMUsageStats field
+values, priced with the model's per-million-token prices. The caller stores
+them on its record (LLMJob, ModelEvaluationHistory, AnalysisResult) and adds
+them to the LLMUsageDaily totals with add_daily_usage(), which
+llm_usage_report and the admin read per model, project and day.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .llm_usage import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# Anthropic bills prompt-cache writes at 1.25x the input price
+LLM_CACHE_WRITE_PRICE_FACTOR = Decimal(str(getattr(settings, 'LLM_CACHE_WRITE_PRICE_FACTOR', 1.25)))
+
+_MILLION = Decimal(1_000_000)
+_TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens')
+_LOOKUP = object()
+
+
+def model_prices(model_name):
+    """(input, output, cached input) USD per million tokens of an LLMModel, or None if it has no prices."""
+    from eval.models import LLMModel
+
+    prices = LLMModel.objects.filter(name=model_name).values_list(
+        'input_token_price', 'output_token_price', 'cached_input_token_price').first()
+    if not prices or prices[0] is None or prices[1] is None:
+        return None
+    input_price, output_price, cached_price = prices
+    return input_price, output_price, cached_price if cached_price is not None else input_price
+
+
+def cost_of(usage, prices):
+    if usage is None or prices is None:
+        return None
+    input_price, output_price, cached_price = prices
+    cost = (
+        usage.input_tokens * input_price
+        + usage.cache_write_tokens * input_price * LLM_CACHE_WRITE_PRICE_FACTOR
+        + usage.cache_read_tokens * cached_price
+        + usage.output_tokens * output_price
+    ) / _MILLION
+    return cost.quantize(Decimal('0.000001'))
+
+
+def usage_stats(usage, model_name, stop_reason='', time_to_first_token=None, latency=None, prices=_LOOKUP):
+    """
+    LLMUsageStats field values. usage is a TokenUsage or its as_dict() (as in
+    client results), or None when the provider reported none, e.g. for a
+    coalesced call whose tokens were counted by the caller that made it.
+    Pass model_prices() as prices when pricing many records of one model.
+    """
+    if isinstance(usage, dict):
+        usage = TokenUsage(**usage)
+    stats = {
+        'stop_reason': (stop_reason or '')[:50],
+        'time_to_first_token': round(time_to_first_token, 3) if time_to_first_token is not None else None,
+        'llm_latency': round(latency, 3) if latency is not None else None,
+        'llm_calls': usage.calls if usage else None,
+        'llm_cost': cost_of(usage, model_prices(model_name) if prices is _LOOKUP else prices) if usage else None,
+    }
+    for name in _TOKEN_FIELDS:
+        stats[name] = getattr(usage, name) if usage else None
+    return stats
+
+
+def merge_usage_stats(stats_list):
+    """Sum several usage_stats() results, e.g. the files of one pipeline run."""
+    totals = {name: 0 for name in _TOKEN_FIELDS + ('llm_calls',)}
+    totals.update(llm_latency=0.0, llm_cost=None)
+    for stats in stats_list:
+        for name in _TOKEN_FIELDS + ('llm_calls',):
+            totals[name] += stats.get(name) or 0
+        totals['llm_latency'] += stats.get('llm_latency') or 0
+        if stats.get('llm_cost') is not None:
+            totals['llm_cost'] = (totals['llm_cost'] or 0) + stats['llm_cost']
+    return totals
+
+
+def add_daily_usage(stats, model_name, source, provider='', project_id=None, records=1, errors=0):
+    """Add usage_stats() (or merged stats of several records) to today's LLMUsageDaily totals."""
+    from eval.models import LLMUsageDaily
+
+    increments = {
+        'records': records,
+        'errors': errors,
+        'llm_latency': stats.get('llm_latency') or 0,
+        'llm_cost': stats.get('llm_cost') or 0,
+    }
+    for name in _TOKEN_FIELDS + ('llm_calls',):
+        increments[name] = stats.get(name) or 0
+    key = {
+        'date': timezone.localdate(),
+        'model_name': model_name[:255],
+        'source': source,
+        'project_id': project_id,
+    }
+    try:
+        updated = LLMUsageDaily.objects.filter(**key).update(
+            **{name: F(name) + value for name, value in increments.items()})
+        if not updated:
+            LLMUsageDaily.objects.create(provider=provider or '', **key, **increments)
+    except Exception as e:
+        # Accounting must never fail the work it accounts for
+        logger.warning(f"Could not add LLM usage for {model_name} to the daily totals: {e}")
@@ -0,0 +1,140 @@
+"""
+Write coalescing for high-frequency activity updates.
+
+Heartbeats and interaction counters used to hit SQLite with one write each,
+competing for the database lock with the LLM job workers. Updates are now
+merged in memory per session and written by a background thread in a single
+transaction every ACTIVITY_FLUSH_INTERVAL seconds. At most one interval of
+heartbeat data is lost if the process dies.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FLUSH_INTERVAL = getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 5)
+# Remember this many verified open sessions so heartbeats skip the existence query
+OPEN_SESSION_CACHE_SIZE = 10000
+
+
+class ActivityWriteBuffer:
+    """Merge UserActivitySession updates in memory and flush them in batches."""
+
+    def __init__(self, interval=ACTIVITY_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending = {}
+        self._open_sessions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='activity-write-buffer', daemon=True)
+                    self._thread.start()
+
+    def _entry(self, session_id):
+        return self._pending.setdefault(str(session_id), ({}, {}))
+
+    def set_fields(self, session_id, **fields):
+        """Queue absolute field values; the latest value wins."""
+        with self._lock:
+            self._entry(session_id)[0].update(fields)
+        self._ensure_started()
+
+    def increment(self, session_id, **counters):
+        """Queue counter increments; they are summed until the next flush."""
+        with self._lock:
+            increments = self._entry(session_id)[1]
+            for field, amount in counters.items():
+                increments[field] = increments.get(field, 0) + amount
+        self._ensure_started()
+
+    def remember_open(self, user_id, session_id):
+        with self._lock:
+            if len(self._open_sessions) >= OPEN_SESSION_CACHE_SIZE:
+                self._open_sessions.clear()
+            self._open_sessions.add((user_id, str(session_id)))
+
+    def forget_open(self, user_id, session_id):
+        with self._lock:
+            self._open_sessions.discard((user_id, str(session_id)))
+
+    def is_open(self, user_id, session_id):
+        """True if the session is known to be open; queries the database once per session."""
+        with self._lock:
+            if (user_id, str(session_id)) in self._open_sessions:
+                return True
+        from eval.models import UserActivitySession
+        exists = UserActivitySession.objects.filter(
+            user_id=user_id, session_id=session_id, session_end__isnull=True).exists()
+        if exists:
+            self.remember_open(user_id, session_id)
+        return exists
+
+    def take(self, session_id):
+        """Remove and return the pending (fields, increments) for one session."""
+        with self._lock:
+            return self._pending.pop(str(session_id), ({}, {}))
+
+    @staticmethod
+    def as_update(fields, increments):
+        updates = dict(fields)
+        for field, amount in increments.items():
+            # Increments queued after an absolute value apply on top of it
+            updates[field] = updates[field] + amount if field in updates else F(field) + amount
+        return updates
+
+    def flush(self):
+        """Write every pending update in one transaction; returns the number of sessions written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        from eval.models import UserActivitySession
+        try:
+            with transaction.atomic():
+                for session_id, (fields, increments) in pending.items():
+                    UserActivitySession.objects.filter(pk=session_id, session_end__isnull=True).update(
+                        **self.as_update(fields, increments))
+        except Exception as e:
+            logger.error(f"Activity flush failed, retrying next interval: {str(e)}")
+            self._requeue(pending)
+            return 0
+        return len(pending)
+
+    def _requeue(self, pending):
+        with self._lock:
+            for session_id, (fields, increments) in pending.items():
+                current_fields, current_increments = self._entry(session_id)
+                # Values queued after the failed flush are newer and win
+                current_fields.update({k: v for k, v in fields.items() if k not in current_fields})
+                for field, amount in increments.items():
+                    current_increments[field] = current_increments.get(field, 0) + amount
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+activity_buffer = ActivityWriteBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        activity_buffer.flush()
+    except Exception:
+        pass
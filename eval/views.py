@@ -3,12 +3,13 @@ from django.shortcuts import render, redirect
 from django.core.files.storage import FileSystemStorage
 from django.contrib import messages
 from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import F
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.conf import settings
 from openai import OpenAI
 from datetime import datetime
-from .models import Validation, SystemMessage, StreamAndSubject, UserPreference
+from .models import Validation, UserPreference
 from .utils.sheets import fetch_trainer_tasks
 import requests
 from bs4 import BeautifulSoup
@@ -19,33 +20,26 @@ import json, re, os
 from .models import Coherence
 import time
 import concurrent.futures
-import threading
 import uuid
-import queue
-import random
 from .models import ModelEvaluationHistory
 from django.utils import timezone
 from django.contrib.auth.models import User
 from .utils import logger
+from .roles import invalidate_user_role, resolve_user_role
+from . import catalog, eval_sessions
+from .utils.write_buffer import activity_buffer
+from .utils.pagination import KeysetPaginator
+from .utils.export import EXPORT_CHUNK_SIZE, buffered, export_options, json_envelope, streaming_export
+from .utils.usage_accounting import add_daily_usage, usage_stats
 
 # Helper function to get user role
 def get_user_role(user):
     """
     Get the role for a given user.
     Returns 'admin', 'pod_lead', or 'trainer'.
-    Matches the logic in the user_group context processor.
+    Memoized per request and cached briefly across requests (see eval.roles).
     """
-    if not user.is_authenticated:
-        return None
-
-    if user.is_superuser or user.is_staff or user.groups.filter(name='admin').exists():
-        return 'admin'
-    elif user.groups.filter(name='pod_lead').exists():
-        return 'pod_lead'
-    elif user.groups.filter(name='trainer').exists():
-        return 'trainer'
-    else:
-        return None
+    return resolve_user_role(user)
 
 # Decorator to restrict view access based on user role
 def role_required(roles):
@@ -66,8 +60,6 @@ def role_required(roles):
 
 
 # Store model evaluation results
-model_results = {}
-model_results_queues = {}
 
 def is_not_trainer(user):
     """
@@ -259,26 +251,19 @@ def trainer_question_analysis(request, project_id, question_id):
             else:
                 error = "Task not found for this project and question ID."
         # Fetch system messages based on user preference (stream/subject)
-        preferred_streams = []
-        try:
-            prefs = request.user.preference
-            preferred_streams = prefs.streams_and_subjects.all()
-        except Exception:
-            preferred_streams = []
+        preferred_streams = catalog.preferred_stream_ids(request.user)
         if preferred_streams:
-            system_messages = SystemMessage.objects.filter(category__in=preferred_streams).order_by('name')
+            system_messages = catalog.system_messages_for_streams(preferred_streams)
         else:
             # Default to "Coding" stream if exists, else all
-            system_messages = SystemMessage.objects.filter(category__name__icontains="coding").order_by('name') or SystemMessage.objects.all().order_by('name')
+            system_messages = catalog.coding_system_messages()
         # Fetch project-tied LLM models for this project
         from .models import ProjectLLMModel
         project_llm_models = ProjectLLMModel.objects.filter(project_id=project_id, is_active=True).select_related('llm_model')
         if project_llm_models.exists():
             llm_models = project_llm_models.filter(is_active=True).order_by('llm_model__name')
         else:
-            llm_models = LLMModel.objects.filter(is_active=True, is_default=True).order_by('name')
-            if not llm_models.exists():
-                llm_models = LLMModel.objects.filter(is_active=True).order_by('name')
+            llm_models = catalog.default_llm_models()
 
         # Construct WebSocket URL
         websocket_scheme = 'wss' if request.is_secure() else 'ws'
@@ -312,6 +297,7 @@ def trainer_dashboard(request):
    
     from .models import TrainerTask, UserActivitySession, UserProductivityInsight, LLMJob
     from datetime import datetime, timedelta
+    from django.db.models import Count
     from django.utils import timezone
     from .models import Project
     user = request.user
@@ -360,25 +346,27 @@ def trainer_dashboard(request):
         return False
  
 
-    # Get all tasks for the selected project, then filter for exact developer match
+    # Match the distinct developer names of the project once, then filter the tasks in SQL
     if selected_project_id:
-        all_tasks = TrainerTask.objects.filter(project__id=selected_project_id).order_by('-updated_at')
+        project_tasks = TrainerTask.objects.filter(project__id=selected_project_id)
+        developers = set(
+            project_tasks.exclude(developer__isnull=True).exclude(developer='')
+            .values_list('developer', flat=True).distinct()
+        )
         if is_admin and selected_trainer:
             # Admin: filter by selected trainer if provided (try user match, fallback to substring)
             selected_user = User.objects.filter(username=selected_trainer).first()
             if selected_user:
-                filtered_tasks = [task for task in all_tasks if task.developer and is_exact_match(task.developer, selected_user)]
+                matching_developers = [dev for dev in developers if is_exact_match(dev, selected_user)]
             else:
-                filtered_tasks = [task for task in all_tasks if task.developer]
+                matching_developers = list(developers)
         else:
-            filtered_tasks = [task for task in all_tasks if is_exact_match(task.developer, request.user)]
+            matching_developers = [dev for dev in developers if is_exact_match(dev, request.user)]
+        filtered_tasks = project_tasks.filter(developer__in=matching_developers)
 
-        logger.log(f"DEBUG: Found {len(filtered_tasks)} tasks after admin/user filtering")
-        if filtered_tasks:
-            sample_developers = [task.developer for task in filtered_tasks[:3]]
-            logger.log(f"DEBUG: Sample matching developers: {sample_developers}, {str(filtered_tasks)}")
+        logger.log(f"DEBUG: Matched developers after admin/user filtering: {matching_developers[:3]}")
     else:
-        filtered_tasks = []
+        filtered_tasks = TrainerTask.objects.none()
         all_trainers = []
     
     # Calculate privacy-first productivity statistics
@@ -398,6 +386,15 @@ def trainer_dashboard(request):
         created_at__date__range=[week_start, week_end]
     )
     
+    # Compute traditional task stats by status (using 'completed' field) - keep for compatibility
+    status_counts = {}
+    learning_velocity = 0
+    for completed_value, count in filtered_tasks.values_list('completed').annotate(count=Count('id')).order_by():
+        status = (completed_value or 'Unknown').strip()
+        status_counts[status] = status_counts.get(status, 0) + count
+        if completed_value and completed_value.lower() in ['completed', 'done']:
+            learning_velocity += count
+
     # Calculate trainer-focused statistics
     total_focus_time = sum(session.focus_time_minutes for session in this_week_sessions)
     total_sessions = this_week_sessions.count()
@@ -419,31 +416,14 @@ def trainer_dashboard(request):
         'focus_time_minutes': total_focus_time,
         'deep_analysis_sessions': analysis_sessions,
         'llm_experiments': llm_experiments,
-        'learning_velocity': len([task for task in filtered_tasks if task.completed and task.completed.lower() in ['completed', 'done']]),
+        'learning_velocity': learning_velocity,
         'avg_session_length': f"{int(avg_session_length)}m" if avg_session_length > 0 else "0m",
         'modal_playground_usage': modal_sessions,
         'total_sessions': total_sessions
     }
     
-    # Compute traditional task stats by status (using 'completed' field) - keep for compatibility
-    status_counts = {}
-    for task in filtered_tasks:
-        status = (task.completed or 'Unknown').strip()
-        status_counts[status] = status_counts.get(status, 0) + 1
-
-    # Pagination
-    page_size = 10
-    try:
-        page = int(request.GET.get('page', 1))
-        if page < 1:
-            page = 1
-    except ValueError:
-        page = 1
-    total_tasks = len(filtered_tasks)
-    total_pages = (total_tasks + page_size - 1) // page_size
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_tasks = filtered_tasks[start:end]
+    # Keyset pagination: every page costs the same regardless of depth
+    task_page = KeysetPaginator(filtered_tasks, ('-updated_at', '-id'), per_page=10).page(request.GET.get('cursor'))
 
     # Dynamic headers based on TaskSyncConfig
     config = None
@@ -474,22 +454,8 @@ def trainer_dashboard(request):
             field_types[field] = 'text'
             field_labels[field] = field.replace('_', ' ').title()
 
-    # Compute visible page numbers for pagination (show first, last, current, neighbors, with ellipsis)
-    visible_page_numbers = []
-    for p in range(1, total_pages + 1):
-        if (
-            p == 1 or
-            p == total_pages or
-            (page - 2 <= p <= page + 2)
-        ):
-            visible_page_numbers.append(p)
-        elif p == 2 and page > 4:
-            visible_page_numbers.append("...")
-        elif p == total_pages - 1 and page < total_pages - 3:
-            visible_page_numbers.append("...")
-
     context = {
-        'tasks': paginated_tasks,
+        'tasks': task_page.items,
         'user': user,
         'stats': status_counts,
         'productivity_stats': productivity_stats,  # New productivity insights
@@ -501,16 +467,7 @@ def trainer_dashboard(request):
         'all_trainers': all_trainers,
         'selected_trainer': selected_trainer,
         'has_admin_role': is_admin,
-        'pagination': {
-            'current_page': page,
-            'total_pages': total_pages,
-            'has_previous': page > 1,
-            'has_next': page < total_pages,
-            'previous_page': page - 1 if page > 1 else 1,
-            'next_page': page + 1 if page < total_tasks else total_pages,
-            'total_records': total_tasks,
-        },
-        'visible_page_numbers': visible_page_numbers,
+        'pagination': task_page.as_context(),
     }
     return render(request, 'dashboard_trainer.html', context)
     
@@ -654,7 +611,6 @@ def reviewer_dashboard(request):
                         'next_page': 1,
                         'total_records': 0,
                     },
-                    'visible_page_numbers': [],
                     'database_error': True,
                 })
     # Filter by project for stats/trainers/table
@@ -798,37 +754,12 @@ def reviewer_dashboard(request):
         config_headers = ["question_id", "problem_link"]
     headers = config_headers
 
-    # Pagination for table
-    page_size = 10
-    try:
-        page = int(request.GET.get('page', 1))
-        if page < 1:
-            page = 1
-    except ValueError:
-        page = 1
-    total_tasks_table = tasks_for_table.count()
-    total_pages = (total_tasks_table + page_size - 1) // page_size
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_tasks = tasks_for_table.order_by('-updated_at')[start:end]
+    # Keyset pagination for table
+    task_page = KeysetPaginator(tasks_for_table, ('-updated_at', '-id'), per_page=10).page(request.GET.get('cursor'))
 
     # For project dropdown
     projects = Project.objects.filter(is_active=True).order_by('name')
 
-    # Compute visible page numbers for pagination (show first, last, current, neighbors, with ellipsis)
-    visible_page_numbers = []
-    for p in range(1, total_pages + 1):
-        if (
-            p == 1 or
-            p == total_pages or
-            (page - 2 <= p <= page + 2)
-        ):
-            visible_page_numbers.append(p)
-        elif p == 2 and page > 4:
-            visible_page_numbers.append("...")
-        elif p == total_pages - 1 and page < total_pages - 3:
-            visible_page_numbers.append("...")
-
     # Use the same flexible system as trainer dashboard
     field_types = {}
     field_labels = {}
@@ -845,7 +776,7 @@ def reviewer_dashboard(request):
             field_labels[field] = field.replace('_', ' ').title()
 
     context = {
-        'tasks': paginated_tasks,  # Use the actual task objects, not processed data
+        'tasks': task_page.items,  # Use the actual task objects, not processed data
         'headers': headers,
         'field_types': field_types,
         'field_labels': field_labels,
@@ -863,16 +794,7 @@ def reviewer_dashboard(request):
             'completed': completed,
         },
         'productivity_stats': reviewer_productivity_stats,  # New reviewer productivity insights
-        'pagination': {
-            'current_page': page,
-            'total_pages': total_pages,
-            'has_previous': page > 1,
-            'has_next': page < total_pages,
-            'previous_page': page - 1 if page > 1 else 1,
-            'next_page': page + 1 if page < total_pages else total_pages,
-            'total_records': total_tasks_table,
-        },
-        'visible_page_numbers': visible_page_numbers,
+        'pagination': task_page.as_context(),
     }
     return render(request, 'dashboard_reviewer.html', context)
 
@@ -1122,34 +1044,14 @@ def task_sync_config_view(request):
         except Project.DoesNotExist:
             pass  # Invalid project ID, show all results
     
-    page_size = 10
-    try:
-        page = int(request.GET.get('history_page', 1))
-        if page < 1:
-            page = 1
-    except ValueError:
-        page = 1
-    total_history = history_qs.count()
-    total_history_pages = (total_history + page_size - 1) // page_size
-    start = (page - 1) * page_size
-    end = start + page_size
-    history = history_qs[start:end]
-    history_page_numbers = list(range(1, total_history_pages + 1))
+    history_page = KeysetPaginator(history_qs, ('-timestamp', '-id'), per_page=10).page(request.GET.get('history_cursor'))
 
     context = {
         "config": config,
         "message": message,
-        "history": history,
+        "history": history_page.items,
         "sync_configs": sync_configs,  # Add sync configurations to context
-        "history_pagination": {
-            "current_page": page,
-            "total_pages": total_history_pages,
-            "has_previous": page > 1,
-            "has_next": page < total_history_pages,
-            "previous_page": page - 1 if page > 1 else 1,
-            "next_page": page + 1 if page < total_history_pages else total_history_pages,
-        },
-        "history_page_numbers": history_page_numbers,
+        "history_pagination": history_page.as_context(),
         "projects": projects,
         "selected_project_id": selected_project_id,
         "selected_project_filter": selected_project_filter,
@@ -1806,20 +1708,12 @@ def perform_logical_analysis(request):
 
 @login_required
 def model_evaluation(request):
-    llm_models = LLMModel.objects.all().order_by('name')
-    user = request.user
-    try:
-        prefs = user.preference
-        preferred_streams = prefs.streams_and_subjects.all()
-        system_messages = SystemMessage.objects.filter(category__in=preferred_streams).order_by('name')
-    except UserPreference.DoesNotExist:
-        system_messages = SystemMessage.objects.none()
-        preferred_streams = StreamAndSubject.objects.none()
+    preferred_stream_ids = catalog.preferred_stream_ids(request.user)
     return render(request, 'model_eval.html', {
-        'llm_models': llm_models,
-        'default_system_messages': system_messages,
-        'streams_and_subjects': StreamAndSubject.objects.all().order_by('name'),
-        'preferred_streams': preferred_streams,
+        'llm_models': catalog.llm_models(),
+        'default_system_messages': catalog.system_messages_for_streams(preferred_stream_ids),
+        'streams_and_subjects': catalog.streams_and_subjects(),
+        'preferred_streams': [stream for stream in catalog.streams_and_subjects() if stream.id in preferred_stream_ids],
     })
 
 def evaluate_model_async(model_id, manual_prompt, system_message, session_id, username):
@@ -1836,8 +1730,8 @@ def evaluate_model_async(model_id, manual_prompt, system_message, session_id, us
                 'timing': 0,
                 'time_taken': 0
             }
-            model_results_queues[session_id].put(result)
-            logger.log(f"Added inactive result for {model.name} to queue")
+            eval_sessions.add_result(session_id, result)
+            logger.log(f"Added inactive result for {model.name} to session")
             return result
 
         start_time = time.time()
@@ -1854,6 +1748,10 @@ def evaluate_model_async(model_id, manual_prompt, system_message, session_id, us
 
             result = client.get_response(messages, temperature=model.temperature)
             elapsed_time = round(time.time() - start_time, 2)
+            stats = usage_stats(result.get('usage'), model.name, result.get('stop_reason'),
+                                result.get('time_to_first_token'), result.get('latency'))
+            add_daily_usage(stats, model.name, 'evaluation', model.provider,
+                            errors=0 if result['status'] == 'success' else 1)
 
             if result['status'] == 'success':
                 result = {
@@ -1879,10 +1777,12 @@ def evaluate_model_async(model_id, manual_prompt, system_message, session_id, us
                     prompt=manual_prompt,
                     system_instructions=system_message,
                     temperature=model.temperature if model.temperature is not None else 0.7,
-                    max_tokens=2048,  # Default value
+                    # The limit the client actually requested
+                    max_tokens=client._get_effective_max_tokens(),
                     evaluation_metrics={'timing': elapsed_time, 'status': 'success'},
                     response=result['response'],
-                    username=username
+                    username=username,
+                    **stats
                 )
                 logger.log(f"Automatically saved evaluation for {model.name} to history")
             except Exception as save_error:
@@ -1908,9 +1808,9 @@ def evaluate_model_async(model_id, manual_prompt, system_message, session_id, us
             'time_taken': 0
         }
     
-    # Add result to the queue
-    model_results_queues[session_id].put(result)
-    logger.log(f"Added result for {result['model_name']} to queue, status: {result['status']}")
+    # Add result to the session
+    eval_sessions.add_result(session_id, result)
+    logger.log(f"Added result for {result['model_name']} to session, status: {result['status']}")
     
     # Return the result
     return result
@@ -1932,11 +1832,8 @@ def evaluate_models(request):
         # Generate a unique session ID for this evaluation
         session_id = str(uuid.uuid4())
         
-        # Create a queue for this session
-        model_results_queues[session_id] = queue.Queue()
-        
-        # Initialize the results array for this session
-        model_results[session_id] = []
+        # Initialize the shared results list for this session
+        eval_sessions.start(session_id)
         
         # Store selected models in the session for later use
         request.session['selected_models'] = models
@@ -1967,116 +1864,41 @@ def evaluate_models(request):
 def get_model_results(request, session_id):
     """Get the results of model evaluation for a specific session."""
     try:
-        # Only log once per 10 requests or on important events
-        should_log = random.random() < 0.1  # Log roughly 10% of requests
-        
-        if should_log:
-            logger.log(f"Getting results for session: {session_id}")
-        
-        # Initialize the results array for this session if it doesn't exist
-        if session_id not in model_results:
-            model_results[session_id] = []
-            logger.log(f"Initialized empty results array for session: {session_id}")
-        
         # Get the last seen index from the query parameters
         last_seen_index = int(request.GET.get('last_seen', '0'))
         
-        # Check if there are any new results in the queue
-        new_result = None
-        try:
-            # Get only one result at a time from the queue to ensure immediate display
-            if session_id in model_results_queues and not model_results_queues[session_id].empty():
-                new_result = model_results_queues[session_id].get_nowait()
-                
-                # Make sure evaluation_metrics is present in the result
-                if 'evaluation_metrics' not in new_result and hasattr(new_result, 'get'):
-                    new_result['evaluation_metrics'] = new_result.get('metrics', {})
-                
-                model_results[session_id].append(new_result)
-                logger.log(f"Added new result for model: {new_result['model_name']}")
-                logger.log(f"Result data: {new_result}")
-                
-                # Return the new result immediately
-                current_index = len(model_results[session_id])
-                completed = len(model_results[session_id])
-                total = request.session.get('selected_models', [])
-                total_models = len(total)
-                
-                logger.log(f"Returning 1 new result (total completed: {completed}, queue size: {model_results_queues[session_id].qsize() if session_id in model_results_queues else 0})")
-                
-                # Find active threads for this session to determine which models are still processing
-                processing_models = []
-                active_threads = [t for t in threading.enumerate() if t.name.startswith(f"eval-{session_id}")]
-                
-                if not active_threads and completed < total_models:
-                    # If no active threads but not all models completed, some may have failed silently
-                    logger.log(f"Warning: No active threads but only {completed}/{total_models} completed")
-                
-                return JsonResponse({
-                    'results': [new_result],
-                    'completed': completed,
-                    'total': total_models,
-                    'processing': processing_models,
-                    'current_index': current_index,
-                    'has_more': True  # Always check for more results
-                })
-        except queue.Empty:
-            # Queue is empty, continue to check for previously processed results
-            pass
-        except Exception as e:
-            logger.log(f"Error getting results from queue: {str(e)}")
-            # We'll try returning previously processed results instead
-        
-        # If there's no new result from the queue, check if there are any results
-        # that the client hasn't seen yet (based on last_seen_index)
-        if last_seen_index < len(model_results[session_id]):
-            # Return just the next unseen result
-            next_result = model_results[session_id][last_seen_index]
+        results = eval_sessions.results(session_id) or []
+        completed = len(results)
+        total_models = len(request.session.get('selected_models', []))
+        
+        # Return just the next unseen result so each one is displayed immediately
+        if last_seen_index < completed:
+            next_result = results[last_seen_index]
             
             # Make sure evaluation_metrics is present in the result
-            if 'evaluation_metrics' not in next_result and hasattr(next_result, 'get'):
+            if 'evaluation_metrics' not in next_result:
                 next_result['evaluation_metrics'] = next_result.get('metrics', {})
             
             current_index = last_seen_index + 1
-            
-            completed = len(model_results[session_id])
-            total = request.session.get('selected_models', [])
-            total_models = len(total)
-            
-            if should_log:
-                logger.log(f"Returning 1 previously processed result (total completed: {completed})")
-                logger.log(f"Result data: {next_result}")
-            
             return JsonResponse({
                 'results': [next_result],
                 'completed': completed,
                 'total': total_models,
                 'processing': [],
                 'current_index': current_index,
-                'has_more': current_index < len(model_results[session_id]) or (session_id in model_results_queues and not model_results_queues[session_id].empty())
+                # Keep polling while other models are still running
+                'has_more': completed < total_models or current_index < completed
             })
         
-        # If there are no new results, return an empty list
-        completed = len(model_results[session_id])
-        total = request.session.get('selected_models', [])
-        total_models = len(total)
-        
-        # Check if there are any active threads for this session
-        active_threads = [t for t in threading.enumerate() if t.name.startswith(f"eval-{session_id}")]
-        has_more = len(active_threads) > 0 or (session_id in model_results_queues and not model_results_queues[session_id].empty())
-        
-        if should_log and (has_more or completed < total_models):
-            logger.log(f"No new results to return (total completed: {completed}, active threads: {len(active_threads)})")
-        
-        # Return a special response code for the "no results yet" case
+        # Nothing new yet; a 204 would make the page start a second poller
         return JsonResponse({
             'results': [],
             'completed': completed,
             'total': total_models,
             'processing': [],
             'current_index': last_seen_index,
-            'has_more': has_more
-        }, status=204 if not has_more and completed == 0 else 200)  # Use 204 for "No Content Yet"
+            'has_more': completed < total_models or last_seen_index < completed
+        })
         
     except Exception as e:
         logger.log(f"Error in get_model_results: {str(e)}")
@@ -2086,70 +1908,84 @@ def get_model_results(request, session_id):
 @login_required
 @user_passes_test(is_not_trainer)
 def reports(request):
-    # Get page number from query parameters, default to 1
-    page = request.GET.get('page', 1)
-    try:
-        page = int(page)
-        if page < 1:
-            page = 1
-    except ValueError:
-        page = 1
-    
-    # Set pagination parameters
-    items_per_page = 100
-    start_index = (page - 1) * items_per_page
-    end_index = start_index + items_per_page
-    
     # Get the analytics reports from the database, filtered by user
-    all_reports = AnalysisResult.objects.filter(user=request.user).order_by('-timestamp')
+    all_reports = AnalysisResult.objects.filter(user=request.user).select_related('model', 'prompt')
     
     # Get unique models for filter dropdown
     unique_models = AnalysisResult.objects.filter(user=request.user).values_list('model__name', flat=True).distinct()
     
-    # Calculate total pages
-    total_reports = all_reports.count()
-    total_pages = (total_reports + items_per_page - 1) // items_per_page  # Ceiling division
-    
-    # Get the reports for the current page
-    reports = all_reports[start_index:end_index]
-    
-    # Prepare pagination context
-    pagination = {
-        'current_page': page,
-        'total_pages': total_pages,
-        'has_previous': page > 1,
-        'has_next': page < total_pages,
-        'previous_page': page - 1 if page > 1 else 1,
-        'next_page': page + 1 if page < total_pages else total_pages,
-        'total_records': total_reports
-    }
+    # Keyset pagination, 100 reports per page
+    report_page = KeysetPaginator(all_reports, ('-timestamp', '-id'), per_page=100).page(request.GET.get('cursor'))
 
     return render(request, 'reports.html', {
-        'reports': reports,
-        'pagination': pagination,
+        'reports': report_page.items,
+        'pagination': report_page.as_context(),
         'unique_models': unique_models
     })
 
+REPORT_EXPORT_FIELDS = ['id', 'file_name', 'model', 'prompt', 'analysis', 'timestamp']
+EVALUATION_HISTORY_EXPORT_FIELDS = [
+    'id', 'model_name', 'prompt', 'system_instructions', 'temperature', 'max_tokens', 'evaluation_metrics',
+    'response', 'formatted_response', 'is_edited', 'edit_history', 'created_at',
+]
+
+
+def _report_rows(user):
+    """Report dicts for user, newest first, with model/prompt names joined in SQL."""
+    reports = AnalysisResult.objects.filter(user=user).order_by('-timestamp').values(
+        'id', 'file_name', 'analysis', 'timestamp', model_name=F('model__name'), prompt_name=F('prompt__name'))
+    for report in reports.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'id': report['id'],
+            'file_name': report['file_name'],
+            'model': report['model_name'] or 'Unknown',
+            'prompt': report['prompt_name'] or 'No prompt available',
+            'analysis': report['analysis'],
+            'timestamp': report['timestamp'].isoformat(),
+        }
+
+
 # API endpoint to get all reports data for export
 @login_required
 @user_passes_test(is_not_trainer)
 def api_all_reports(request):
-    # Get all reports for the current user
-    all_reports = AnalysisResult.objects.filter(user=request.user).order_by('-timestamp')
-    
-    # Convert to a list of dictionaries
-    reports_data = []
-    for report in all_reports:
-        reports_data.append({
-            'id': report.id,
-            'file_name': report.file_name,
-            'model': report.model.name if report.model else 'Unknown',
-            'prompt': report.prompt.name if report.prompt else 'No prompt available',
-            'analysis': report.analysis,
-            'timestamp': report.timestamp.isoformat()
-        })
-    
-    return JsonResponse({'reports': reports_data})
+    # Same {"reports": [...]} body as before, streamed instead of built in memory
+    response = StreamingHttpResponse(
+        buffered(json_envelope('reports', _report_rows(request.user))), content_type='application/json')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@user_passes_test(is_not_trainer)
+@require_http_methods(["GET"])
+def export_reports(request):
+    """Download every report of the user as NDJSON or CSV: ?format=ndjson|csv&gzip=1"""
+    fmt, compress = export_options(request)
+    if fmt is None:
+        return JsonResponse({'error': 'format must be ndjson or csv'}, status=400)
+    return streaming_export(_report_rows(request.user), REPORT_EXPORT_FIELDS, fmt, 'reports', compress)
+
+
+@login_required
+@require_http_methods(["GET"])
+def export_evaluation_history(request):
+    """Download the user's model evaluation history as NDJSON or CSV: ?format=ndjson|csv&gzip=1"""
+    fmt, compress = export_options(request)
+    if fmt is None:
+        return JsonResponse({'error': 'format must be ndjson or csv'}, status=400)
+
+    history = ModelEvaluationHistory.objects.filter(
+        username=request.user, is_active=True).order_by('-created_at').values(
+        'evaluation_id', *EVALUATION_HISTORY_EXPORT_FIELDS[1:])
+
+    def rows():
+        for item in history.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            item['id'] = str(item.pop('evaluation_id'))
+            item['created_at'] = item['created_at'].isoformat()
+            yield item
+
+    return streaming_export(rows(), EVALUATION_HISTORY_EXPORT_FIELDS, fmt, 'evaluation_history', compress)
 
 @require_http_methods(["POST"])
 def save_to_history(request):
@@ -2415,17 +2251,6 @@ def save_edited_response(request):
         # Get the current session ID from the request
         session_id = request.session.get('current_session_id')
         
-        # If no session ID in the session, try to get it from the model_results keys
-        if not session_id and model_results:
-            # Use the most recent session ID (assuming it's the current one)
-            session_id = list(model_results.keys())[-1]
-            logger.log(f"Using most recent session ID: {session_id}")
-            # Store it in the session for future use
-            request.session['current_session_id'] = session_id
-        
-        # Debug information
-        logger.log(f"Available sessions: {list(model_results.keys())}")
-        
         # First, try to find and update the record in the database
         db_updated = False
         
@@ -2477,52 +2302,8 @@ def save_edited_response(request):
             logger.log(f"Error updating database: {str(db_error)}")
             # Continue with in-memory updates even if DB update fails
         
-        # Now update the in-memory model_results as well
-        memory_updated = False
-        
-        # Try to find the result by response_id directly
-        if response_id and response_id in model_results:
-            logger.log(f"Found result by response_id: {response_id}")
-            model_results[response_id]['response'] = edited_content
-            memory_updated = True
-        
-        # Try to find the result in the session by model_id
-        if not memory_updated and session_id and session_id in model_results:
-            logger.log(f"Checking session {session_id} with {len(model_results[session_id])} results")
-            
-            # Check if model_results[session_id] is a list or a dict
-            if isinstance(model_results[session_id], list):
-                for i, result in enumerate(model_results[session_id]):
-                    logger.log(f"Comparing model_id: {result.get('model_id')} with {model_id}")
-                    if str(result.get('model_id')) == str(model_id) or result.get('model_name') == model_id:
-                        logger.log(f"Found match at index {i}")
-                        model_results[session_id][i]['response'] = edited_content
-                        memory_updated = True
-                        break
-            elif isinstance(model_results[session_id], dict):
-                # If it's a dict, update directly
-                if str(model_results[session_id].get('model_id')) == str(model_id) or model_results[session_id].get('model_name') == model_id:
-                    model_results[session_id]['response'] = edited_content
-                    memory_updated = True
-        
-        # If we still haven't found it, try searching all sessions
-        if not memory_updated:
-            for sess_id, results in model_results.items():
-                logger.log(f"Searching session {sess_id}")
-                if isinstance(results, list):
-                    for i, result in enumerate(results):
-                        if str(result.get('model_id')) == str(model_id) or result.get('model_name') == model_id:
-                            logger.log(f"Found match in session {sess_id} at index {i}")
-                            model_results[sess_id][i]['response'] = edited_content
-                            memory_updated = True
-                            break
-                    if memory_updated:
-                        break
-                elif isinstance(results, dict):
-                    if str(results.get('model_id')) == str(model_id) or results.get('model_name') == model_id:
-                        model_results[sess_id]['response'] = edited_content
-                        memory_updated = True
-                        break
+        # Now update the session results as well
+        memory_updated = bool(session_id) and eval_sessions.update_response(session_id, model_id, edited_content)
         
         # Last resort: create a new entry in the current session and database
         if not memory_updated and not db_updated and session_id:
@@ -2534,21 +2315,12 @@ def save_edited_response(request):
                 'status': 'success'
             }
             
-            if isinstance(model_results.get(session_id, []), list):
-                model_results[session_id].append(new_result)
-            else:
-                model_results[session_id] = [new_result]
+            eval_sessions.add_result(session_id, new_result)
             
             # Also create a new database entry
             try:
                 # Get the prompt from the form if available
                 prompt_text = request.POST.get('manual_prompt', '')
-                if not prompt_text:
-                    # Try to get it from an existing result
-                    for sess_id, results in model_results.items():
-                        if isinstance(results, list) and results:
-                            # Use the first result's prompt if available
-                            break
                 
                 # Create new history entry
                 new_entry = ModelEvaluationHistory.objects.create(
@@ -2756,27 +2528,16 @@ def review_question(request, question_id):
         logger.log(f"DEBUG: review_question - Criteria {i+1}: {criteria.name}")
     
     # Fetch system messages based on user preference (stream/subject)
-    preferred_streams = []
-    try:
-        prefs = request.user.preference
-        preferred_streams = prefs.streams_and_subjects.all()
-        logger.log(f"DEBUG: User {request.user.username} has {preferred_streams.count()} preferred streams")
-    except Exception as e:
-        preferred_streams = []
-        logger.log(f"DEBUG: No user preferences found: {e}")
+    preferred_streams = catalog.preferred_stream_ids(request.user)
+    logger.log(f"DEBUG: User {request.user.username} has {len(preferred_streams)} preferred streams")
     
     if preferred_streams:
-        system_messages = SystemMessage.objects.filter(category__in=preferred_streams).order_by('name')
-        logger.log(f"DEBUG: Found {system_messages.count()} system messages for preferred streams")
+        system_messages = catalog.system_messages_for_streams(preferred_streams)
+        logger.log(f"DEBUG: Found {len(system_messages)} system messages for preferred streams")
     else:
         # Default to "Coding" stream if exists, else all
-        coding_messages = SystemMessage.objects.filter(category__name__icontains="coding").order_by('name')
-        if coding_messages.exists():
-            system_messages = coding_messages
-            logger.log(f"DEBUG: Using {system_messages.count()} coding-related system messages")
-        else:
-            system_messages = SystemMessage.objects.all().order_by('name')
-            logger.log(f"DEBUG: Using all {system_messages.count()} system messages")
+        system_messages = catalog.coding_system_messages()
+        logger.log(f"DEBUG: Using {len(system_messages)} coding-related (or all) system messages")
     
     # Fetch project-tied LLM models if project exists, else global
     from .models import ProjectLLMModel
@@ -2785,12 +2546,10 @@ def review_question(request, question_id):
         if project_llm_models.exists():
             llm_models = project_llm_models.filter(is_active=True).order_by('llm_model__name')
         else:
-            llm_models = LLMModel.objects.filter(is_active=True, is_default=True).order_by('name')
-            if not llm_models.exists():
-                llm_models = LLMModel.objects.filter(is_active=True).order_by('name')
+            llm_models = catalog.default_llm_models()
     else:
-        llm_models = LLMModel.objects.filter(is_active=True).order_by('name')
-    logger.log(f"DEBUG: Found {llm_models.count()} active LLM models (project-tied or global)")
+        llm_models = catalog.active_llm_models()
+    logger.log(f"DEBUG: Found {len(llm_models)} active LLM models (project-tied or global)")
     
     # Debug: Print first few system messages
     for i, sm in enumerate(system_messages[:3]):
@@ -2813,7 +2572,7 @@ def review_question(request, question_id):
 
 @require_GET
 def get_llm_models(request):
-    models = LLMModel.objects.filter(is_active=True).order_by('name')
+    models = catalog.active_llm_models()
     data = [
         {"id": model.id, "name": model.name, "description": model.description or ""}
         for model in models
@@ -2832,7 +2591,7 @@ def modal_playground(request):
     from .models import StreamAndSubject, SystemMessage, LLMModel
 
     # Get all streams/subjects for dropdowns
-    streams_and_subjects = StreamAndSubject.objects.all().order_by('name')
+    streams_and_subjects = catalog.streams_and_subjects()
 
     # Get selected stream/subject from GET params
     selected_stream_id = request.GET.get('stream')
@@ -2846,7 +2605,7 @@ def modal_playground(request):
         system_messages = system_messages.filter(category_id=selected_subject_id)
 
     # Get all active LLM models
-    llm_models = LLMModel.objects.filter(is_active=True).order_by('name')
+    llm_models = catalog.active_llm_models()
 
     context = {
         "streams_and_subjects": streams_and_subjects,
@@ -2921,6 +2680,7 @@ def activity_start(request):
             focus_time_minutes=0,
             page_interactions=0
         )
+        activity_buffer.remember_open(request.user.id, session.session_id)
         
         return JsonResponse({
             'success': True,
@@ -2961,28 +2721,22 @@ def activity_update(request):
         if not session_id:
             return JsonResponse({'success': False, 'error': 'Missing session_id'})
         
-        # Update existing session
-        try:
-            session = UserActivitySession.objects.get(
-                user=request.user,
-                session_id=session_id,
-                session_end__isnull=True  # Only update active sessions
-            )
-            
-            session.focus_time_minutes = focus_time_minutes
-            session.interactions = interactions
-            session.is_active = is_active
-            session.last_activity = timezone.now()
-            session.save()
-            
-            return JsonResponse({'success': True})
-            
-        except UserActivitySession.DoesNotExist:
+        # Only active sessions are updated; the write itself is batched by the activity buffer
+        if not activity_buffer.is_open(request.user.id, session_id):
             return JsonResponse({
                 'success': False,
                 'error': 'Session not found or already ended'
             })
         
+        activity_buffer.set_fields(
+            session_id,
+            focus_time_minutes=focus_time_minutes,
+            page_interactions=interactions,
+            is_active=is_active,
+        )
+        
+        return JsonResponse({'success': True})
+        
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -3024,11 +2778,12 @@ def activity_end(request):
                 session_end__isnull=True  # Only end active sessions
             )
             
-            session.focus_time_minutes = focus_time_minutes
-            session.interactions = interactions
-            session.session_end = timezone.now()
-            session.is_active = False
-            session.save()
+            # Apply whatever the buffer still holds for this session together with the end
+            fields, increments = activity_buffer.take(session_id)
+            fields.update(focus_time_minutes=focus_time_minutes, page_interactions=interactions)
+            UserActivitySession.objects.filter(pk=session.pk).update(**activity_buffer.as_update(fields, increments))
+            session.end_session()
+            activity_buffer.forget_open(request.user.id, session_id)
             
             return JsonResponse({'success': True})
             
@@ -3342,6 +3097,7 @@ def update_user_role(request):
         
         # Add user to the new group
         user.groups.add(new_group)
+        invalidate_user_role([user.id], user)
         
         return JsonResponse({
             'success': True,
@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import AnalysisResult, LLMModel, Prompt
 
 class AnalysisResultAdmin(admin.ModelAdmin):
-    readonly_fields = ('timestamp', 'file_name', 'analysis', 'model', 'prompt')
+    readonly_fields = ('timestamp', 'file_name', 'analysis', 'model', 'prompt') + AnalysisResult.USAGE_FIELDS
     list_display = ('file_name', 'user','analysis','model', 'timestamp')
     list_filter = ('user', 'model', 'prompt')
     search_fields = ('file_name', 'analysis')
@@ -77,13 +77,14 @@ def convert_ipynb_to_py(ipynb_path, output_folder):
         return None
     return None
 
-def main(csv_file, request):
-    """Main function to download and convert notebooks."""
-    creds = Credentials.from_service_account_file("service_account.json", scopes=SCOPES)
-    service = build("drive", "v3", credentials=creds)
-    output_folder = f"./processor/download_container/{request.user.username}"
-
-
+def get_drive_service():
+    """Build a read-only Google Drive service from the project service account."""
+    from django.conf import settings
+    creds = Credentials.from_service_account_file(settings.SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    return build("drive", "v3", credentials=creds)
+
+def iter_colab_file_ids(csv_file):
+    """Yield the Drive file id of every Colab link in the CSV's 'ColabLinks' column."""
     with open(csv_file, "r", encoding="utf-8", newline="") as f:
         reader = csv.reader(f)
         header = next(reader, None)
@@ -100,11 +101,17 @@ def main(csv_file, request):
 
             file_id = extract_file_id(row[colab_links_index])
             if file_id:
-                try:
-                    ipynb_path = download_colab_notebook(file_id, service, output_folder)
-                    py_path = convert_ipynb_to_py(ipynb_path, output_folder)
-                except Exception as e:
-                    log_message(f"Error in download: {str(e)}")
-                    raise
+                yield file_id
 
+def main(csv_file, request):
+    """Main function to download and convert notebooks."""
+    service = get_drive_service()
+    output_folder = f"./processor/download_container/{request.user.username}"
 
+    for file_id in iter_colab_file_ids(csv_file):
+        try:
+            ipynb_path = download_colab_notebook(file_id, service, output_folder)
+            py_path = convert_ipynb_to_py(ipynb_path, output_folder)
+        except Exception as e:
+            log_message(f"Error in download: {str(e)}")
+            raise
@@ -1,13 +1,228 @@
+"""
+Log bus for the processor pages, kept in the shared cache.
+
+Messages are published to named channels (one per user and one per pipeline
+run) instead of a single global queue. Each process buffers what it publishes
+and every LOG_FLUSH_INTERVAL seconds writes each channel's new lines as one
+batch: one cache entry, numbered by the channel's counter in the database
+(eval.utils.shared_locks), which unlike the file cache's incr() never hands
+two processes the same number. The last LOG_BUFFER_BATCHES batches can be
+read back, so any number of listeners in any worker process can read the same
+stream and a reconnecting browser can replay what it missed from its
+Last-Event-ID, which is the number of the last batch it received.
+"""
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
 from datetime import datetime
-import queue
 
-log_queue = queue.Queue()
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from eval.utils import shared_locks
+
+logger = logging.getLogger(__name__)
+
+# Batches kept per channel for replay
+LOG_BUFFER_BATCHES = 200
+# Channels nobody has written to for this long expire
+LOG_CHANNEL_IDLE_SECONDS = 60 * 60
+# How often a process writes the lines it buffered
+LOG_FLUSH_INTERVAL = 0.25
+# How often a waiting listener checks its channel for new events
+LOG_POLL_INTERVAL = 0.5
+# A numbered batch still missing after later ones have been there this long
+# was lost (its process died between numbering and writing it); skip it
+LOG_LOST_BATCH_SECONDS = 10
+GLOBAL_CHANNEL = 'global'
+_COUNTER_PREFIX = 'processor_log:'
+
+_log_channels = contextvars.ContextVar('processor_log_channels', default=())
+# Lines published by this process and not yet written, by channel name
+_pending = {}
+_pending_lock = threading.Lock()
+_flusher_pid = None
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def run_channel(run_id):
+    return f"run:{run_id}"
+
+
+class LogChannel:
+    """Numbered batches of events of one channel in the shared cache; readers poll for new ones."""
+
+    def __init__(self, name):
+        self.name = name
+        self._counter = f'{_COUNTER_PREFIX}{name}'
+
+    def _batch_key(self, batch_id):
+        return f'processor_log:{self.name}:{batch_id}'
+
+    @property
+    def last_id(self):
+        try:
+            return shared_locks.counter_value(self._counter)
+        except Exception:
+            return 0
+
+    def publish(self, event):
+        """Queue event for this process's next write of the channel."""
+        with _pending_lock:
+            _pending.setdefault(self.name, []).append(event)
+        _start_flusher()
+
+    def write(self, events):
+        """Store events as the channel's next batch; returns its number."""
+        batch_id = shared_locks.increment(self._counter)
+        cache.set(self._batch_key(batch_id), {
+            'written_at': time.time(),
+            'events': [dict(event, id=batch_id) for event in events],
+        }, timeout=LOG_CHANNEL_IDLE_SECONDS)
+        return batch_id
+
+    def since(self, last_id):
+        """Events newer than last_id; everything still buffered if last_id fell out of the buffer."""
+        newest = self.last_id
+        if last_id >= newest:
+            return []
+        batch_ids = range(max(last_id + 1, newest - LOG_BUFFER_BATCHES + 1), newest + 1)
+        try:
+            found = cache.get_many([self._batch_key(i) for i in batch_ids])
+        except Exception:
+            return []
+        events = []
+        lost_before = time.time() - LOG_LOST_BATCH_SECONDS
+        for position, batch_id in enumerate(batch_ids):
+            batch = found.get(self._batch_key(batch_id))
+            if batch is None:
+                later = [found.get(self._batch_key(i)) for i in batch_ids[position + 1:]]
+                if any(b is not None and b['written_at'] < lost_before for b in later):
+                    continue
+                # Numbered but not written yet; stop so it isn't skipped
+                break
+            events.extend(batch['events'])
+        return events
+
+    def wait(self, last_id, timeout):
+        """Block the calling thread until an event newer than last_id exists or timeout expires."""
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.since(last_id)
+            if events or time.monotonic() >= deadline:
+                return events
+            time.sleep(min(LOG_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def _since_in_worker_thread(self, last_id):
+        # No request cycle closes the DB connections of sync_to_async's threads
+        close_old_connections()
+        return self.since(last_id)
+
+    async def wait_async(self, last_id, timeout):
+        """Same as wait() but sleeps on the event loop instead of a thread."""
+        since = sync_to_async(self._since_in_worker_thread, thread_sensitive=False)
+        deadline = time.monotonic() + timeout
+        while True:
+            events = await since(last_id)
+            if events or time.monotonic() >= deadline:
+                return events
+            await asyncio.sleep(min(LOG_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+
+class LogBus:
+    """Channels by name; the events live in the shared cache, so any process may publish or read."""
+
+    def channel(self, name):
+        return LogChannel(name)
+
+    def publish(self, names, event):
+        for name in names:
+            self.channel(name).publish(event)
+
+
+log_bus = LogBus()
+
+
+def flush():
+    """Write the lines this process buffered, one batch per channel."""
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    for name, events in pending.items():
+        try:
+            LogChannel(name).write(events)
+        except Exception as e:
+            # Logging must never break the work being logged
+            logger.warning(f"Could not write {len(events)} log lines to {name}: {e}")
+
+
+def _flush_loop():
+    next_purge = time.monotonic() + LOG_CHANNEL_IDLE_SECONDS
+    while True:
+        time.sleep(LOG_FLUSH_INTERVAL)
+        close_old_connections()
+        flush()
+        if time.monotonic() >= next_purge:
+            next_purge = time.monotonic() + LOG_CHANNEL_IDLE_SECONDS
+            try:
+                shared_locks.purge_counters(_COUNTER_PREFIX, LOG_CHANNEL_IDLE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Could not purge idle log channels: {e}")
+
+
+def _start_flusher():
+    """Start this process's writer thread on first use; a forked worker starts its own."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _pending_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='processor-log-flush', daemon=True).start()
+    atexit.register(flush)
+
+
+@contextlib.contextmanager
+def log_context(user_id=None, run_id=None):
+    """Route log_message calls made inside the block to the given user and/or run channels."""
+    names = list(_log_channels.get())
+    if user_id is not None:
+        names.append(user_channel(user_id))
+    if run_id is not None:
+        names.append(run_channel(run_id))
+    token = _log_channels.set(tuple(dict.fromkeys(names)))
+    try:
+        yield
+    finally:
+        _log_channels.reset(token)
+
+
+def user_log_channel(view_func):
+    """View decorator: messages logged while handling the request go to the user's channel."""
+    @functools.wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        user_id = request.user.id if request.user.is_authenticated else None
+        with log_context(user_id=user_id):
+            return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
 
 def log_message(message):
     if not message:
         return
-        
-    log_queue.put({
+
+    log_bus.publish(_log_channels.get() or (GLOBAL_CHANNEL,), {
         'message': str(message),  # Ensure message is a string
         'timestamp': datetime.now().strftime('%H:%M:%S'),
         'type': 'log'
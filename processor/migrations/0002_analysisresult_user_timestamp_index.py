@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 13:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processor', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['user', 'timestamp'], name='processor_a_user_id_af3dc9_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processor', '0002_analysisresult_user_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='cache_read_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='cache_write_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Prompt tokens not served from cache', null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='llm_calls',
+            field=models.PositiveIntegerField(blank=True, help_text='Provider requests, incl. continuations', null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='llm_cost',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='USD', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='llm_latency',
+            field=models.FloatField(blank=True, help_text='Seconds spent waiting for the LLM', null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='output_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='stop_reason',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='time_to_first_token',
+            field=models.FloatField(blank=True, help_text='Seconds', null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from eval.models import LLMUsageStats
+
 class LLMModel(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True)
@@ -20,7 +22,7 @@ class Prompt(models.Model):
     def __str__(self):
         return self.name
 
-class AnalysisResult(models.Model):
+class AnalysisResult(LLMUsageStats):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
     file_name = models.CharField(max_length=255)
@@ -30,3 +32,8 @@ class AnalysisResult(models.Model):
 
     def __str__(self):
         return f"{self.file_name} - {self.timestamp}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp']),
+        ]
@@ -0,0 +1,410 @@
+# processor/pipeline.py
+"""
+Staged CSV -> download -> convert -> evaluate -> persist pipeline.
+
+Every stage runs in its own thread and hands work to the next one through a
+bounded queue, so a notebook moves on as soon as it is ready instead of
+waiting for the whole CSV to be downloaded first. Progress is tracked per
+file on a PipelineJob which the upload page polls.
+
+The web worker that receives the upload only records the run as an LLMJob
+(job type PIPELINE_JOB_TYPE, with the CSV in its input_data) and publishes
+it to Pub/Sub; a process_llm_jobs worker runs it. A run therefore survives
+web worker restarts, and pending or failed runs are republished and retried
+by auto_job_processor like every other LLMJob. The running worker writes the
+run's state to the shared cache every few seconds for the upload page, and
+the final state is kept on the LLMJob.
+"""
+import contextvars
+import copy
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from eval.models import LLMJob
+from eval.utils.deadlines import job_deadline
+from eval.utils.llm_usage import collect_usage
+from eval.utils.pubsub import publish_message
+from eval.utils.usage_accounting import add_daily_usage, merge_usage_stats, model_prices, usage_stats
+
+from .converter import convert_file_to_json
+from .download import (
+    convert_ipynb_to_py,
+    download_colab_notebook,
+    get_drive_service,
+    iter_colab_file_ids,
+)
+from .logger import log_context, log_message
+from .models import AnalysisResult, LLMModel, Prompt
+
+# Items allowed to wait between two stages before the producer blocks
+PIPELINE_QUEUE_SIZE = getattr(settings, 'PROCESSOR_PIPELINE_QUEUE_SIZE', 4)
+# Concurrent LLM calls per pipeline run
+PIPELINE_EVALUATION_WORKERS = getattr(settings, 'PROCESSOR_PIPELINE_EVALUATION_WORKERS', 2)
+# Finished jobs are kept around this long so the page can fetch the final state
+PIPELINE_JOB_TTL = 60 * 60
+# A running job writes its state to the cache this often...
+PIPELINE_SAVE_INTERVAL = 2
+# ...so a state older than this belongs to a run whose worker exited
+PIPELINE_STALE_SECONDS = 60
+# LLMJob.job_type of a pipeline run
+PIPELINE_JOB_TYPE = 'csv_pipeline'
+
+_STOP = object()
+
+
+def _state_key(job_id):
+    return f'pipeline_job_{job_id}'
+
+
+class PipelineJob:
+    """State of one background CSV run, shared between the stage threads and the status view."""
+
+    def __init__(self, job_id, user, model, prompt, upload_filename):
+        self.job_id = job_id
+        self.user = user
+        self.model = model
+        self.prompt = prompt
+        self.upload_filename = upload_filename
+        self.status = 'pending'
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.files = {}
+        self.results = []
+        self._lock = threading.Lock()
+
+    def update_file(self, file_name, stage, status, details=None):
+        with self._lock:
+            entry = self.files.setdefault(file_name, {'file_name': file_name})
+            entry['stage'] = stage
+            entry['status'] = status
+            entry['details'] = details
+            entry['timestamp'] = datetime.now().strftime('%H:%M:%S')
+        log_message(f"[{stage}] {file_name}: {status}" + (f" - {details}" if details else ""))
+
+    def rename_file(self, old_name, new_name):
+        with self._lock:
+            entry = self.files.pop(old_name, None)
+            if entry is not None:
+                entry['file_name'] = new_name
+                self.files[new_name] = entry
+
+    def add_result(self, file_name, analysis):
+        with self._lock:
+            self.results.append({'file_name': file_name, 'analysis': analysis})
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    def save(self):
+        """Write the current state where get_pipeline_job() in any process reads it."""
+        state = dict(self.to_dict(), user_id=self.user.id, saved_at=time.time())
+        try:
+            cache.set(_state_key(self.job_id), state, timeout=PIPELINE_JOB_TTL)
+        except Exception as e:
+            log_message(f"Could not save progress of pipeline run {self.job_id}: {e}")
+
+    def to_dict(self):
+        with self._lock:
+            files = [dict(entry) for entry in self.files.values()]
+            results = list(self.results)
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'error': self.error,
+            'upload_filename': self.upload_filename,
+            'model': self.model.name,
+            'prompt': self.prompt.name,
+            'files': files,
+            'total_files': len(files),
+            'completed_files': sum(1 for f in files if f['status'] == 'Completed'),
+            'failed_files': sum(1 for f in files if f['status'] == 'Failed'),
+            'results': results,
+            'is_complete': self.is_finished,
+        }
+
+
+def _job_state(llm_job):
+    """State of a run that no worker is saving, built from its LLMJob."""
+    return {
+        'job_id': str(llm_job.job_id),
+        'status': llm_job.status,
+        'error': llm_job.error_message,
+        'upload_filename': llm_job.input_data.get('upload_filename'),
+        'files': [],
+        'total_files': 0,
+        'completed_files': 0,
+        'failed_files': 0,
+        'results': [],
+        'is_complete': llm_job.is_complete,
+        'user_id': llm_job.user_id,
+    }
+
+
+def get_pipeline_job(job_id):
+    """
+    State of a run (PipelineJob.to_dict() plus 'user_id'), or None if there is
+    no such run. It comes from the worker's last save while that is recent,
+    otherwise from the run's LLMJob.
+    """
+    state = cache.get(_state_key(job_id))
+    if state and (state['is_complete'] or time.time() - state['saved_at'] <= PIPELINE_STALE_SECONDS):
+        return state
+    try:
+        llm_job = LLMJob.objects.filter(job_id=job_id, job_type=PIPELINE_JOB_TYPE).first()
+    except ValidationError:
+        return None
+    if llm_job is None:
+        return None
+    if llm_job.status == 'completed':
+        return llm_job.result
+    if llm_job.status == 'failed' and state:
+        # Keep the per-file progress the run got to
+        return dict(state, status='failed', is_complete=True, error=llm_job.error_message)
+    if llm_job.status == 'processing' and state:
+        # The worker stopped saving; auto_job_processor fails the stuck job, and may retry it
+        return dict(state, status='interrupted')
+    return _job_state(llm_job)
+
+
+def _thread(target, *args, **kwargs):
+    """A stage thread that keeps the caller's log channels (contextvars don't cross threads)."""
+    return threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(target, *args),
+        kwargs=kwargs,
+        daemon=True,
+    )
+
+
+def _run_stage(job, stage, handle, inbox, outbox=None, upstream=1, downstream=1):
+    """
+    Pull items from inbox until every upstream producer has sent _STOP.
+
+    A failing item is marked on the job and skipped so one bad notebook never
+    stalls the rest of the run. Downstream always receives its _STOP markers.
+    """
+    remaining = upstream
+    try:
+        while remaining:
+            item = inbox.get()
+            if item is _STOP:
+                remaining -= 1
+                continue
+            try:
+                output = handle(item)
+            except Exception as e:
+                job.update_file(item['file_name'], stage, 'Failed', str(e))
+                continue
+            if output is not None and outbox is not None:
+                outbox.put(output)
+    finally:
+        close_old_connections()
+        if outbox is not None:
+            for _ in range(downstream):
+                outbox.put(_STOP)
+
+
+def _download_stage(job, csv_path, output_folder, outbox, downstream=1):
+    """Producer: download each notebook listed in the CSV and turn it into a .py file."""
+    try:
+        service = get_drive_service()
+        for file_id in iter_colab_file_ids(csv_path):
+            job.update_file(file_id, 'Google Drive Download', 'Processing')
+            try:
+                ipynb_path = download_colab_notebook(file_id, service, output_folder)
+                py_path = convert_ipynb_to_py(ipynb_path, output_folder)
+                if not py_path:
+                    raise ValueError(f"Could not convert {os.path.basename(ipynb_path)} to Python")
+            except Exception as e:
+                job.update_file(file_id, 'Google Drive Download', 'Failed', str(e))
+                continue
+            # From here on the file is tracked under its notebook name
+            file_name = os.path.basename(py_path)
+            job.rename_file(file_id, file_name)
+            job.update_file(file_name, 'Google Drive Download', 'Queued', 'Downloaded, waiting for conversion')
+            # Blocks while the converter is behind, which bounds memory and disk use
+            outbox.put({'file_name': file_name, 'py_path': py_path})
+    except Exception as e:
+        job.error = f"Download stage failed: {str(e)}"
+        log_message(job.error)
+    finally:
+        close_old_connections()
+        for _ in range(downstream):
+            outbox.put(_STOP)
+
+
+def _convert(job):
+    def handle(item):
+        job.update_file(item['file_name'], 'File Conversion', 'Processing')
+        json_output_path = os.path.splitext(item['py_path'])[0] + '.json'
+        result = convert_file_to_json(item['py_path'], json_output_path)
+        if not result:
+            raise ValueError('Conversion to JSON produced no result')
+        return {'file_name': item['file_name'], 'result': result}
+    return handle
+
+
+def _evaluate(job, api_key, deadline):
+    from .utils import evaluate_with_llm
+
+    def handle(item):
+        job.update_file(item['file_name'], 'LLM Analysis', 'Processing')
+        details = {}
+        started = time.monotonic()
+        with collect_usage() as usage:
+            # evaluate_with_llm rewrites model.name for Fireworks models, keep the shared instance intact
+            analysis = evaluate_with_llm(
+                item['result'], api_key, copy.copy(job.model), job.prompt, details, deadline=deadline)
+        return {
+            'file_name': item['file_name'],
+            'analysis': analysis,
+            'usage': usage if usage.calls else None,
+            'stop_reason': details.get('stop_reason'),
+            'latency': time.monotonic() - started,
+        }
+    return handle
+
+
+def _persist_stage(job, inbox, upstream):
+    """Collect evaluated files and write them with a single bulk_create once the run drains."""
+    pending = []
+    prices = model_prices(job.model.name)
+
+    def handle(item):
+        stats = usage_stats(item['usage'], job.model.name, item['stop_reason'], latency=item['latency'], prices=prices)
+        pending.append(AnalysisResult(
+            user=job.user,
+            file_name=item['file_name'],
+            analysis=item['analysis'],
+            model=job.model,
+            prompt=job.prompt,
+            **stats
+        ))
+        job.add_result(item['file_name'], item['analysis'])
+        job.update_file(item['file_name'], 'LLM Analysis', 'Completed')
+
+    _run_stage(job, 'Save Results', handle, inbox, upstream=upstream)
+    try:
+        if pending:
+            AnalysisResult.objects.bulk_create(pending)
+            log_message(f"Saved {len(pending)} analysis results")
+            totals = merge_usage_stats([{name: getattr(r, name) for name in r.USAGE_FIELDS} for r in pending])
+            errors = sum(1 for r in pending if r.analysis.startswith("LLM evaluation error"))
+            add_daily_usage(totals, job.model.name, 'analysis', records=len(pending), errors=errors)
+    finally:
+        close_old_connections()
+
+
+def run_pipeline(job, csv_path, api_key, deadline=None):
+    """
+    Run every stage of the pipeline for job and block until all of them finish.
+    LLM requests stop once deadline (an eval.utils.deadlines.Deadline) is spent.
+    """
+    job.status = 'processing'
+    output_folder = os.path.join(settings.BASE_DIR, 'processor', 'download_container', job.user.username)
+    os.makedirs(output_folder, exist_ok=True)
+
+    workers = max(1, PIPELINE_EVALUATION_WORKERS)
+    convert_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    evaluate_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    persist_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    threads = [
+        _thread(_download_stage, job, csv_path, output_folder, convert_queue),
+        _thread(_run_stage, job, 'File Conversion', _convert(job), convert_queue, evaluate_queue, downstream=workers),
+    ]
+    evaluate = _evaluate(job, api_key, deadline)
+    for _ in range(workers):
+        threads.append(_thread(_run_stage, job, 'LLM Analysis', evaluate, evaluate_queue, persist_queue))
+    threads.append(_thread(_persist_stage, job, persist_queue, workers))
+
+    log_message(f"Starting pipeline for {job.upload_filename} with {workers} evaluation workers")
+    try:
+        for thread in threads:
+            thread.name = f"pipeline-{job.job_id}"
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(PIPELINE_SAVE_INTERVAL)
+                job.save()
+        job.status = 'failed' if job.error else 'completed'
+        log_message(f"CSV processing {job.status}: {len(job.results)} of {len(job.files)} files analysed")
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        log_message(f"Error in CSV pipeline: {str(e)}")
+    finally:
+        job.finished_at = time.time()
+        job.save()
+        try:
+            os.remove(csv_path)
+        except OSError:
+            pass
+        close_old_connections()
+    return job
+
+
+def start_pipeline(csv_text, user, model, prompt, upload_filename):
+    """
+    Record a run of the CSV csv_text as an LLMJob and queue it for a
+    process_llm_jobs worker. Returns the LLMJob; its job_id identifies the run.
+    """
+    input_data = {
+        'csv_text': csv_text,
+        'upload_filename': upload_filename,
+        'processor_model_id': model.id,
+        'prompt_id': prompt.id,
+    }
+    llm_job = LLMJob.objects.create(job_type=PIPELINE_JOB_TYPE, user=user, input_data=input_data)
+    # The worker reads the CSV from the job, not from the message
+    if not publish_message({'type': PIPELINE_JOB_TYPE, 'job_id': str(llm_job.job_id), 'user_id': user.id}):
+        # Still pending, so auto_job_processor publishes it again
+        log_message(f"Could not queue pipeline run {llm_job.job_id} yet; it will be retried")
+    return llm_job
+
+
+def process_pipeline_job(data):
+    """process_llm_jobs handler: run the pipeline of the LLMJob data['job_id'] in this worker."""
+    job_id = data.get('job_id')
+    # Only one delivery of the message runs it; a redelivery of a running or finished run is dropped
+    if not LLMJob.objects.filter(job_id=job_id, status='pending').update(
+            status='processing', started_at=timezone.now()):
+        print(f"Pipeline run {job_id} is not pending")
+        return
+    llm_job = LLMJob.objects.select_related('user').get(job_id=job_id)
+
+    input_data = llm_job.input_data
+    # Messages from the run go to the uploader's channel and to the run's own channel
+    with log_context(user_id=llm_job.user_id, run_id=job_id):
+        try:
+            job = PipelineJob(
+                job_id,
+                llm_job.user,
+                LLMModel.objects.get(id=input_data['processor_model_id']),
+                Prompt.objects.get(id=input_data['prompt_id']),
+                input_data.get('upload_filename'),
+            )
+            # The stages read the CSV from a file; run_pipeline removes it when done
+            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.csv', encoding='utf-8') as tmp:
+                tmp.write(input_data['csv_text'])
+            run_pipeline(job, tmp.name, settings.OPENAI_API_KEY, deadline=job_deadline(llm_job))
+        except Exception as e:
+            log_message(f"Error in CSV pipeline: {str(e)}")
+            llm_job.mark_failed(str(e))
+            return
+    if job.status == 'completed':
+        llm_job.mark_completed(dict(job.to_dict(), user_id=job.user.id))
+    else:
+        llm_job.mark_failed(job.error or 'The pipeline run failed')
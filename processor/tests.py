@@ -1,3 +1,76 @@
-from django.test import TestCase
+import os
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from eval.models import LLMJob
+from processor import logger, pipeline
+from processor.models import LLMModel, Prompt
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+# The tests flush explicitly, in the test's transaction
+@mock.patch.object(logger, '_start_flusher', lambda: None)
+class LogChannelTests(TestCase):
+    def test_lines_are_written_in_batches_and_replayed(self):
+        with logger.log_context(run_id='test-run'):
+            logger.log_message('first')
+            logger.log_message('second')
+        logger.flush()
+        channel = logger.log_bus.channel(logger.run_channel('test-run'))
+        self.assertEqual(channel.last_id, 1)
+        logger.log_message('elsewhere')
+        with logger.log_context(run_id='test-run'):
+            logger.log_message('third')
+        logger.flush()
+        self.assertEqual([event['message'] for event in channel.since(0)], ['first', 'second', 'third'])
+        self.assertEqual([(event['message'], event['id']) for event in channel.since(1)], [('third', 2)])
+
+    def test_a_batch_not_written_yet_holds_back_later_ones(self):
+        channel = logger.log_bus.channel('held-back')
+        channel.write([{'message': 'one'}])
+        # Another process numbered batch 2 but has not written it yet
+        logger.shared_locks.increment(channel._counter)
+        channel.write([{'message': 'three'}])
+        self.assertEqual([event['message'] for event in channel.since(0)], ['one'])
+        cache.set(channel._batch_key(3), dict(cache.get(channel._batch_key(3)), written_at=0))
+        self.assertEqual([event['message'] for event in channel.since(0)], ['one', 'three'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   OPENAI_API_KEY='test-key')
+@mock.patch.object(logger, '_start_flusher', lambda: None)
+class PipelineJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader')
+        self.llm_job = LLMJob.objects.create(job_type=pipeline.PIPELINE_JOB_TYPE, user=self.user, input_data={
+            'csv_text': 'colab_link\n', 'upload_filename': 'links.csv',
+            'processor_model_id': LLMModel.objects.create(name='gpt-4o-mini').id,
+            'prompt_id': Prompt.objects.create(name='coherence', instructions='', system_message='').id,
+        })
+        self.job_id = str(self.llm_job.job_id)
+
+    def test_status_of_a_queued_run_comes_from_its_job(self):
+        state = pipeline.get_pipeline_job(self.job_id)
+        self.assertEqual((state['status'], state['is_complete'], state['user_id']), ('pending', False, self.user.id))
+        self.llm_job.mark_failed('no worker')
+        state = pipeline.get_pipeline_job(self.job_id)
+        self.assertEqual((state['status'], state['is_complete'], state['error']), ('failed', True, 'no worker'))
+        self.assertIsNone(pipeline.get_pipeline_job('not-a-uuid'))
+
+    def test_a_redelivered_message_does_not_run_the_pipeline_again(self):
+        def run(job, csv_path, api_key, deadline=None):
+            job.status = 'completed'
+            os.remove(csv_path)
+
+        with mock.patch.object(pipeline, 'run_pipeline', side_effect=run) as run_pipeline:
+            pipeline.process_pipeline_job({'job_id': self.job_id})
+            pipeline.process_pipeline_job({'job_id': self.job_id})
+        self.assertEqual(run_pipeline.call_count, 1)
+        self.llm_job.refresh_from_db()
+        self.assertEqual(self.llm_job.status, 'completed')
+        cache.clear()
+        # The final state outlives the worker's cache entry
+        self.assertEqual(pipeline.get_pipeline_job(self.job_id)['upload_filename'], 'links.csv')
@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path('upload/', views.upload_csv, name='upload_csv'),
     path('logs/', views.get_logs, name='get_logs'),
+    path('jobs/<str:job_id>/status/', views.pipeline_status, name='pipeline_status'),
 ]
\ No newline at end of file
@@ -2,132 +2,75 @@
 import os
 import csv
 import json
-import tempfile
 import sqlite3
 from django.contrib.auth.models import User, Group, Permission
-from .download import main as download_notebooks
-from .converter import convert_file_to_json
-from openai import OpenAI
+from .pipeline import start_pipeline
+from openai import OpenAI, Timeout
 from fireworks.client import Fireworks
 from .logger import log_message
 from .models import Prompt, LLMModel
 from django.conf import settings
+from eval.utils import deadlines
+from eval.utils.llm_usage import record_usage, usage_from_openai
 
 
-def process_csv_and_evaluate(csv_file, openai_api_key, model, prompt, request):
-    analysis_results = []
-    processing_steps = []
+def process_csv_and_evaluate(csv_file, model, prompt, request):
+    """
+    Queue the staged download/convert/evaluate pipeline for the uploaded CSV;
+    a process_llm_jobs worker runs it. Returns the run's LLMJob so the caller
+    can report progress.
+    """
     upload_filename = csv_file.name  # save the original filename
 
     try:
         log_message("Starting CSV processing...")
-        
-        # Save uploaded CSV to a temporary file with filename info
-        processing_steps.append({
-            "title": "CSV Upload",
-            "status": "Processing",
-            "details": "Saving uploaded CSV file",
-            "filename": upload_filename  # use consistent key
-        })
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp:
-            for chunk in csv_file.chunks():
-                tmp.write(chunk)
-            tmp_path = tmp.name
-            
-        processing_steps[-1]["status"] = "Complete"
-        log_message("Reading CSV file...")
 
-        try:
-            # Download notebooks from Google Drive
-            processing_steps.append({
-                "title": "Google Drive Download",
-                "status": "Processing",
-                "details": "Downloading notebooks from Google Drive",
-                "filename": upload_filename
-            })
-            download_notebooks(tmp_path, request)
-            processing_steps[-1]["status"] = "Complete"
-            # Process downloaded Python files
-            download_dir = os.path.join("./processor/download_container", request.user.username)
-            
-            # Create user-specific directory if it doesn't exist
-            os.makedirs(download_dir, exist_ok=True)
-            for py_filename in os.listdir(download_dir):
-                if py_filename.endswith('.py'):
-                    processing_steps.append({
-                        "title": "File Conversion",
-                        "filename": py_filename,  # changed key here
-                        "status": "Processing",
-                        "details": "Converting Python file to JSON format"
-                    })
-                    
-                    file_path = os.path.join(download_dir, py_filename)
-                    json_output_path = os.path.join(download_dir, f"{os.path.splitext(py_filename)[0]}.json")
-                    
-                    # Convert Python file to JSON
-                    result = convert_file_to_json(file_path, json_output_path)
-                    processing_steps[-1]["status"] = "Complete"
-                    
-                    if result:
-                        processing_steps.append({
-                            "title": "LLM Analysis",
-                            "filename": py_filename,  # changed key here
-                            "status": "Processing",
-                            "details": "Analyzing with OpenAI or DeepSeek"
-                        })
-                        
-                        # Analyze with the appropriate LLM
-                        analysis = evaluate_with_llm(result, openai_api_key, model, prompt)
-                        analysis_results.append({
-                            "file_name": py_filename,
-                            "analysis": analysis
-                        })
-                        processing_steps[-1]["status"] = "Complete"
+        log_message("Reading CSV file...")
+        # The CSV travels with the job, the worker may run on another host
+        csv_text = b''.join(csv_file.chunks()).decode('utf-8-sig')
+        return start_pipeline(csv_text, request.user, model, prompt, upload_filename)
 
-        finally:
-            # Cleanup
-            processing_steps.append({
-                "title": "Cleanup",
-                "status": "Processing",
-                "details": "Removing temporary files",
-                "filename": upload_filename
-            })
-            os.remove(tmp_path)
-            processing_steps[-1]["status"] = "Complete"
-            
-        log_message("CSV processing completed")
-        return analysis_results, processing_steps
-        
     except Exception as e:
         log_message(f"Error in process_csv_and_evaluate: {str(e)}")
         raise
 
-def evaluate_with_llm(json_result, openai_api_key, model, prompt):
+def evaluate_with_llm(json_result, openai_api_key, model, prompt, details=None, deadline=None):
+    """
+    Ask the model whether the reasoning sections of json_result follow on from
+    each other. The response's token usage goes to any active collect_usage()
+    block; details, if given, receives its 'stop_reason'. The request gets
+    explicit timeouts, cut down to what is left of deadline (by default
+    LLM_DEFAULT_JOB_DEADLINE from now).
+    """
+    if deadline is None:
+        deadline = deadlines.default_deadline('LLM evaluation')
+    timeouts = deadlines.request_timeouts(deadline)
+
     # Default to OpenAI client
     client = OpenAI(
         api_key=openai_api_key,
-        base_url=getattr(settings, "OPENAI_API_URL", "https://api.openai.com/v1")
+        base_url=getattr(settings, "OPENAI_API_URL", "https://api.openai.com/v1"),
+        **deadlines.sdk_options(Timeout, deadline)
     )
     
     # Handle DeepSeek models
     if 'deepseek' in model.name.lower():
-        from django.conf import settings
         deepseek_key = settings.DEEPSEEK_API_KEY.strip("'\"")
         client = OpenAI(
             api_key=deepseek_key,
-            base_url=settings.DEEPSEEK_API_URL
+            base_url=settings.DEEPSEEK_API_URL,
+            **deadlines.sdk_options(Timeout, deadline)
         )
         log_message(f"DeepSeek client initialized with base URL: {settings.DEEPSEEK_API_URL}")
 
     # Handle LLaMA models with Fireworks
     if 'llama' in model.name.lower():
-        from django.conf import settings
         try:
-            client = Fireworks(api_key=settings.FIREWORKS_API, base_url=settings.FIREWORKS_API_URL)
+            client = Fireworks(api_key=settings.FIREWORKS_API, base_url=settings.FIREWORKS_API_URL,
+                               timeout=timeouts["read"])
             log_message(f"Fireworks client initialized with base URL: {settings.FIREWORKS_API_URL}")
         except TypeError:
-            client = Fireworks(api_key=settings.FIREWORKS_API)
+            client = Fireworks(api_key=settings.FIREWORKS_API, timeout=timeouts["read"])
             log_message(f"Fireworks client initialized with default base URL (FIREWORKS_API_URL not supported by client)")
         # Use the confirmed working model name
         model.name = "accounts/fireworks/models/" + model.name 
@@ -163,6 +106,9 @@ def evaluate_with_llm(json_result, openai_api_key, model, prompt):
             params["temperature"] = model.temperature
         
         response = client.chat.completions.create(**params)
+        record_usage(usage_from_openai(getattr(response, 'usage', None)), 'openai', model.name)
+        if details is not None:
+            details['stop_reason'] = response.choices[0].finish_reason
         return response.choices[0].message.content.strip()
     except Exception as e:
         log_message(f"LLM evaluation error: {str(e)}")
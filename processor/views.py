@@ -1,19 +1,20 @@
 from django.shortcuts import render, redirect
 from django.conf import settings
 from django.contrib import messages
-from django.http import StreamingHttpResponse, HttpResponseRedirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse, HttpResponseRedirect
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 import json
-import queue
 from .forms import CSVUploadForm
 from .utils import process_csv_and_evaluate
-from .logger import log_queue, log_message
+from .logger import log_bus, log_message, run_channel, user_channel, user_log_channel
 from openai import OpenAI
 import os
 import shutil
-from .models import AnalysisResult
+from .pipeline import get_pipeline_job
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 
 class ProcessingStep:
     def __init__(self, title, status, details=None, filename=None):
@@ -22,39 +23,90 @@ class ProcessingStep:
         self.details = details
         self.filename = filename  # Make sure this is set when creating steps
 
+# Heartbeat comment interval; keeps proxies from closing idle streams
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 1000
+# Under WSGI a stream must not pin a sync worker: it sends what is buffered and
+# ends, and EventSource reconnects after this long with its Last-Event-ID
+SSE_WSGI_RETRY_MS = 2000
+
+
+def _sse_events(events):
+    """
+    Events as SSE messages. Events of one batch share its number, which is
+    sent with the batch's last event only, so a browser that reconnects
+    mid-batch replays the whole batch instead of skipping its rest.
+    """
+    for position, event in enumerate(events):
+        last_of_batch = position + 1 == len(events) or events[position + 1]['id'] != event['id']
+        id_field = f"id: {event['id']}\n" if last_of_batch else ''
+        yield f"{id_field}data: {json.dumps(event)}\n\n"
+
+
 @csrf_exempt
 def get_logs(request):
+    """
+    Server-sent log stream for the current user, or for one pipeline run with ?run=<job_id>.
+
+    Channels live in the shared cache, so every listener in every worker reads
+    the same messages. Under ASGI the stream stays open and waits on the event
+    loop; under WSGI each request returns what is new and the browser
+    reconnects from its Last-Event-ID, i.e. it polls.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponse('Authentication required', status=401)
+
+    run_id = request.GET.get('run')
+    if run_id:
+        job = get_pipeline_job(run_id)
+        if job is None or (job['user_id'] != request.user.id and not request.user.is_staff):
+            return HttpResponse('Run not found', status=404)
+        channel = log_bus.channel(run_channel(run_id))
+    else:
+        channel = log_bus.channel(user_channel(request.user.id))
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    except (TypeError, ValueError):
+        # A run is replayed from its start, a user stream starts live
+        last_id = 0 if run_id else channel.last_id
+    if last_id > channel.last_id:
+        # The buffer was reset (e.g. server restart) since the client last saw it
+        last_id = 0
+
     def event_stream():
-        print("Starting event stream") # Debug print
+        yield f"retry: {SSE_WSGI_RETRY_MS}\n\n"
+        events = channel.since(last_id)
+        yield from _sse_events(events)
+        if not events:
+            # An id without data moves the browser's Last-Event-ID without firing
+            # a message, so the next request resumes here instead of going live
+            yield f"id: {last_id}\n\n"
+
+    async def async_event_stream():
+        nonlocal last_id
+        yield f"retry: {SSE_RETRY_MS}\n\n"
         while True:
-            try:
-                # Shorter timeout to be more responsive
-                log_data = log_queue.get(timeout=0.5)
-                if log_data and 'message' in log_data and 'timestamp' in log_data:
-                    print(f"Sending log: {log_data}") # Debug print
-                    yield f"data: {json.dumps(log_data)}\n\n"
-                    # Flush the output buffer
-                    if hasattr(response, 'flush'):
-                        response.flush()
-            except queue.Empty:
-                # Send heartbeat more frequently
-                yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
-                if hasattr(response, 'flush'):
-                    response.flush()
+            events = await channel.wait_async(last_id, SSE_HEARTBEAT_SECONDS)
+            for message in _sse_events(events):
+                yield message
+            if events:
+                last_id = events[-1]['id']
+            if not events:
+                yield ": heartbeat\n\n"
 
-    response = StreamingHttpResponse(
-        event_stream(),
-        content_type='text/event-stream'
-    )
+    stream = async_event_stream() if isinstance(request, ASGIRequest) else event_stream()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'
-    response['Access-Control-Allow-Origin'] = '*'  # For development only
     return response
 
 @login_required
+@user_log_channel
 def upload_csv(request):
     analysis_results = []
     processing_steps = []
+    job_id = None
     if request.method == 'POST':
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
@@ -86,30 +138,15 @@ def upload_csv(request):
                     else:
                         log_message(f"Using OpenAI model: {model.name}")
                     
-                    analysis_results, processing_steps = process_csv_and_evaluate(
+                    pipeline_job = process_csv_and_evaluate(
                         csv_file, 
-                        settings.OPENAI_API_KEY,
                         model,
                         prompt,
                         request
                     )
-                    
-                    if analysis_results:
-                        log_message("✅ Processing completed successfully!")
-                        messages.success(request, 'Files processed successfully!')
-
-                        # Save results to the database
-                        for result in analysis_results:
-                            AnalysisResult.objects.create(
-                                user=request.user,
-                                file_name=result['file_name'],
-                                analysis=result['analysis'],
-                                model=model,
-                                prompt=prompt
-                            )
-                    else:
-                        log_message("⚠️ No results were generated")
-                        messages.warning(request, 'No results were generated from the processing.')
+                    job_id = str(pipeline_job.job_id)
+                    log_message(f"Processing queued (job {job_id})")
+                    messages.info(request, 'Processing started. Progress for each file is shown below.')
                 except Exception as e:
                     error_msg = f'Error processing file: {str(e)}'
                     log_message(f"❌ Error: {error_msg}")
@@ -130,9 +167,20 @@ def upload_csv(request):
         'form': form, 
         'results': analysis_results,
         'processing_steps': processing_steps,
+        'job_id': job_id,
         'has_temp_files': bool(files_in_temp_dir)
     })
 
+@login_required
+def pipeline_status(request, job_id):
+    """Per-file progress of a background CSV pipeline run, polled by the upload page."""
+    job = get_pipeline_job(job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': f'Job {job_id} not found'}, status=404)
+    if job['user_id'] != request.user.id and not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    return JsonResponse({'success': True, **{k: v for k, v in job.items() if k not in ('user_id', 'saved_at')}})
+
 def delete_create_temp_files(request):
     # Delete temporary files
     temp_dir = os.path.join(settings.BASE_DIR, 'processor', 'download_container', request.user.username)
@@ -13,6 +13,7 @@ import logging
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coreproject.settings")
 django.setup()
 
+from coreproject import metrics
 from eval.models import TaskSyncConfig
 from eval.utils.sheets import sync_trainer_tasks
 
@@ -27,6 +28,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger('SyncDaemon')
 
+# Prometheus metrics on this port (0 = off); phases of each sync are timed in eval.utils.sheets
+METRICS_PORT = int(os.environ.get('METRICS_PORT') or 0)
+
+sync_seconds = metrics.Histogram(
+    'sync_duration_seconds', 'Seconds a whole sync took, by project and status', ['project', 'status'],
+    buckets=metrics.SLOW_BUCKETS)
+sync_workers = metrics.Gauge('sync_workers', 'Live sync worker threads')
+
 class ConfigSyncWorker(threading.Thread):
     """
     Individual worker thread for each sync configuration.
@@ -107,6 +116,7 @@ class ConfigSyncWorker(threading.Thread):
             )
             
             duration = time.time() - start_time
+            sync_seconds.observe(duration, project=project_name, status=status)
             logger.info(f"Sync completed for config {self.config_id} (Project: {project_name}) "
                        f"in {duration:.2f}s - Status: {status}, Summary: {summary}")
             
@@ -115,6 +125,7 @@ class ConfigSyncWorker(threading.Thread):
                 
         except Exception as e:
             duration = time.time() - start_time
+            sync_seconds.observe(duration, project=project_name, status='error')
             logger.error(f"Sync failed for config {self.config_id} (Project: {project_name}) "
                         f"after {duration:.2f}s: {e}", exc_info=True)
 
@@ -133,6 +144,8 @@ class SyncDaemonManager:
     def start(self):
         """Start the sync daemon manager"""
         logger.info("Starting TaskSyncConfig multi-threaded auto-sync daemon...")
+        if METRICS_PORT:
+            metrics.serve(METRICS_PORT)
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -217,6 +230,7 @@ class SyncDaemonManager:
     def _log_status(self):
         """Log current daemon status"""
         active_workers = len([w for w in self.workers.values() if w.is_alive()])
+        sync_workers.set(active_workers)
         logger.info(f"Daemon status: {active_workers} active workers for configs: "
                    f"{list(self.workers.keys())}")
     
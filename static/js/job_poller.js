@@ -0,0 +1,112 @@
+/**
+ * Job Status Poller
+ * Watches many LLM jobs with a single loop against the batch status endpoint
+ * instead of one polling timer per job. The server says how long it may
+ * long-poll (X-Long-Poll-Timeout); when it doesn't, the loop polls every
+ * POLL_INTERVAL_MS and unchanged answers are a cheap 304.
+ */
+
+window.JobStatusPoller = (function() {
+    const ENDPOINT = '/api/llm/jobs/status/';
+    const POLL_INTERVAL_MS = 3000;
+    const MAX_BATCH = 100;
+    const RETRY_DELAY_MS = 2000;
+
+    // handle -> { jobId, callback, last }
+    let watchers = new Map();
+    let nextHandle = 1;
+    let etag = null;
+    // Seconds the server will hold a request open; learned from its replies
+    let waitSeconds = 0;
+    let running = false;
+    let controller = null;
+
+    function watchedJobIds() {
+        return Array.from(new Set(Array.from(watchers.values()).map(w => w.jobId))).slice(0, MAX_BATCH);
+    }
+
+    /**
+     * Call callback(statusData) whenever the job's status changes. statusData has
+     * the same shape as /api/llm/jobs/<id>/status/. Completed or failed jobs are
+     * unwatched automatically after their final callback.
+     * @returns {number} handle for unwatch()
+     */
+    function watch(jobId, callback) {
+        const handle = nextHandle++;
+        watchers.set(handle, { jobId: String(jobId), callback });
+        restart();
+        return handle;
+    }
+
+    function unwatch(handle) {
+        if (watchers.delete(handle) && watchers.size === 0 && controller) {
+            controller.abort();
+        }
+    }
+
+    function restart() {
+        // A new job id changes the request, so the pending long-poll is stale
+        etag = null;
+        if (controller) {
+            controller.abort();
+        }
+        if (!running) {
+            running = true;
+            setTimeout(loop, 0);
+        }
+    }
+
+    function dispatch(jobs) {
+        watchers.forEach((watcher, handle) => {
+            const statusData = jobs[watcher.jobId];
+            if (!statusData) return;
+            const serialized = JSON.stringify(statusData);
+            if (watcher.last === serialized) return;
+            watcher.last = serialized;
+            if (statusData.is_complete || !statusData.success) {
+                watchers.delete(handle);
+            }
+            try {
+                watcher.callback(statusData);
+            } catch (error) {
+                console.error('[JobStatusPoller] Callback error:', error);
+            }
+        });
+    }
+
+    async function loop() {
+        while (watchers.size > 0) {
+            const ids = watchedJobIds();
+            controller = new AbortController();
+            const headers = {};
+            if (etag) headers['If-None-Match'] = etag;
+            try {
+                const response = await fetch(
+                    `${ENDPOINT}?ids=${encodeURIComponent(ids.join(','))}&wait=${etag ? waitSeconds : 0}`,
+                    { headers, signal: controller.signal, credentials: 'same-origin' }
+                );
+                waitSeconds = parseFloat(response.headers.get('X-Long-Poll-Timeout')) || 0;
+                if (response.status !== 304) {
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    etag = response.headers.get('ETag');
+                    const data = await response.json();
+                    if (data.success) dispatch(data.jobs || {});
+                }
+                if (!waitSeconds && watchers.size > 0) {
+                    await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+                }
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.warn('[JobStatusPoller] Poll failed, retrying:', error);
+                    await new Promise(resolve => setTimeout(resolve, RETRY_DELAY_MS));
+                }
+            } finally {
+                controller = null;
+            }
+        }
+        running = false;
+        etag = null;
+    }
+
+    return { watch, unwatch };
+})();
@@ -13,6 +13,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
   let colabRawContent = "";
   let colabMarkdown = "";
+  let colabContentHash = null;
 
   // Temperature slider functionality
   if (temperatureSlider && temperatureValue) {
@@ -133,6 +134,7 @@ document.addEventListener("DOMContentLoaded", function () {
       .then((data) => {
         if (data.success && data.content) {
           colabRawContent = data.content;
+          colabContentHash = data.content_hash || null;
           // Use marked.js to render markdown
           colabMarkdown = window.marked ? window.marked.parse(colabRawContent) : colabRawContent;
           colabContentContainer.innerHTML = colabMarkdown;
@@ -145,6 +147,7 @@ document.addEventListener("DOMContentLoaded", function () {
           colabStatus.className = "ms-2 text-danger";
           // Clear content and validate
           colabRawContent = "";
+          colabContentHash = null;
           validateRequirements();
         }
       })
@@ -153,6 +156,7 @@ document.addEventListener("DOMContentLoaded", function () {
         colabStatus.className = "ms-2 text-danger";
         // Clear content and validate
         colabRawContent = "";
+        colabContentHash = null;
         validateRequirements();
       });
   });
@@ -182,7 +186,7 @@ document.addEventListener("DOMContentLoaded", function () {
     runReviewBtn.textContent = "Submitting jobs...";
 
     // Clear any existing polling intervals
-    activePollingIntervals.forEach(interval => clearInterval(interval));
+    activePollingIntervals.forEach(handle => JobStatusPoller.unwatch(handle));
     activePollingIntervals = [];
 
     // Register this analysis session with the global process manager
@@ -248,7 +252,8 @@ document.addEventListener("DOMContentLoaded", function () {
             job_type: 'review_colab',
             model_id: modelId,
             input_data: {
-              colab_content: colabRawContent,
+              // The server already holds the notebook under this hash; the text is only a fallback
+              ...(colabContentHash ? { content_hash: colabContentHash } : { colab_content: colabRawContent }),
               additional_context: additionalContext || null,
               temperature: temperature
             },
@@ -321,14 +326,12 @@ document.addEventListener("DOMContentLoaded", function () {
   });
 
   function startPollingForReviewJob(jobId, modelId, modelName, placeholder) {
-    const pollInterval = setInterval(async () => {
+    const pollInterval = JobStatusPoller.watch(jobId, async (statusData) => {
       try {
-        const response = await fetch(`/api/llm/jobs/${jobId}/status/`);
-        const statusData = await response.json();
         
         if (statusData.success && statusData.is_complete) {
           // Job is complete, clear the interval
-          clearInterval(pollInterval);
+          JobStatusPoller.unwatch(pollInterval);
           activePollingIntervals = activePollingIntervals.filter(i => i !== pollInterval);
           
           if (statusData.status === 'completed') {
@@ -551,7 +554,7 @@ document.addEventListener("DOMContentLoaded", function () {
           }
         } else {
           // Error getting status
-          clearInterval(pollInterval);
+          JobStatusPoller.unwatch(pollInterval);
           activePollingIntervals = activePollingIntervals.filter(i => i !== pollInterval);
           if (placeholder && placeholder.parentNode) {
             placeholder.innerHTML = `
@@ -582,7 +585,7 @@ document.addEventListener("DOMContentLoaded", function () {
         
       } catch (error) {
         console.error('Polling error:', error);
-        clearInterval(pollInterval);
+        JobStatusPoller.unwatch(pollInterval);
         activePollingIntervals = activePollingIntervals.filter(i => i !== pollInterval);
         if (placeholder && placeholder.parentNode) {
           placeholder.innerHTML = `
@@ -610,7 +613,7 @@ document.addEventListener("DOMContentLoaded", function () {
         }
         checkAllReviewJobsComplete();
       }
-    }, 2000); // Poll every 2 seconds
+    });
     
     activePollingIntervals.push(pollInterval);
   }